@@ -0,0 +1,615 @@
+#-*- coding:utf-8 -*-
+
+'''
+目的：
+    社区发现，直接从EdgeTable的整数编码创建igraph.Graph，
+    社区发现方法为注册的函数，不再拼接字符串后eval，也不再经过pygraphistry转换
+
+方法：
+    * EdgeTable转为igraph.Graph - to_igraph
+    * 注册社区发现方法 - register_method
+    * 已注册的方法 - list_methods
+    * 社区发现 - detect_communities
+    * 不依赖igraph的Louvain/Leiden（numpy, CSR） - louvain
+    * 社区划分结果转为节点编码的社区编号 - membership_codes
+    * 模块度 - modularity
+    * 模块度的增量更新（移动节点） - ModularityTracker
+
+数据：
+    METHODS: dict, 方法名 -> func(table, weight, **kwargs)，返回按节点编码排列的社区编号
+    LEGACY_METHODS: dict, NetworkUnity.community_detect原来的use_method编号 -> 方法名
+
+使用：
+    table = EdgeTable.from_edgedata(edgedata, attr='Weight', directed=False)
+    cluster_result, info = detect_communities(table, method='multilevel', weight='Weight')
+
+louvain:
+    在CSR邻接矩阵上优化模块度（支持有向，加权），不需要igraph，
+    有向图的模块度（Leicht & Newman）：
+        Q = 1/M * sum_ij [A_ij - gamma * kout_i * kin_j / M] * delta(c_i, c_j)，M为边权重的和
+    无向图把每条边看作两条方向相反的边（A对称），与通常的无向模块度一致。
+    节点i从社区a移到b的增益为 g(b) - g(a)，其中
+        g(c) = w(i, c) / M - gamma * (kout_i * Tin_c + kin_i * Tout_c) / M^2
+        w(i, c)为i与c中其他节点之间两个方向的边权重，Tin_c, Tout_c为不含i时社区的入度和，出度和。
+    每一轮对所有节点向量化地计算到相邻社区的增益，同时移动；
+    为了避免同时移动引起的振荡，两个单节点社区之间只向编号小的移动，
+    并且模块度不增加时只移动随机的一部分节点（比例减半），直到只移动增益最大的节点。
+    refine=True时，在每一层聚合之前增加Leiden的细化步骤：社区内从单节点开始合并，
+    只合并与社区连接充分(well-connected)的节点和子社区，按细化后的子社区聚合，
+    同时移动时不移入被移空的子社区；返回最后一层细化后的划分，保证每个社区都是连通的。
+    同时移动的节点过多时随机选择一部分移动，seed默认固定，结果可以重复。
+
+备注：
+    * 2026.10 - 从NetworkUnity.community_detect中分离出来
+              - 增加numpy实现的Louvain/Leiden，注册为'numpy_louvain', 'numpy_leiden'
+              - 增加基于边数组的模块度计算，NetworkUnity.modularity 不再经过pygraphistry和igraph
+              - 增加ModularityTracker，移动节点时按节点的边增量更新模块度
+
+'''
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+
+METHODS = {}
+
+# community_detect 原来的 use_method 编号
+LEGACY_METHODS = {
+    0: 'fastgreedy',
+    1: 'infomap',
+    2: 'leading_eigenvector',  # 原来为leading_eigenvector_naive，igraph 0.10 以后已删除
+    3: 'leading_eigenvector',
+    4: 'label_propagation',
+    5: 'multilevel',
+    6: 'optimal_modularity',
+    7: 'edge_betweenness',
+    8: 'spinglass',
+}
+
+
+def register_method(name):
+    '''
+    注册社区发现方法的装饰器
+    func(table, weight, **kwargs) -> ndarray, 按节点编码排列的社区编号
+    '''
+    def _register(func):
+        METHODS[name] = func
+        return func
+    return _register
+
+
+def list_methods():
+    '''
+    :return: list, 已注册的方法名
+    '''
+    return list(METHODS.keys())
+
+
+def to_igraph(table, weight=None):
+    '''
+    EdgeTable转为igraph.Graph，节点编号即EdgeTable的节点编码，不需要再识别节点
+    :param table: EdgeTable
+    :param weight: None 或 属性名，保存为边的'weight'属性
+    :return: igraph.Graph
+    '''
+    import igraph
+
+    edges = np.column_stack([table.source, table.target])
+    graph = igraph.Graph(n=table.number_of_nodes(), edges=edges.tolist(), directed=table.directed)
+    if weight is not None:
+        graph.es['weight'] = table.attrs[weight].tolist()
+    return graph
+
+
+def _igraph_method(name, call):
+    '''注册igraph的方法，call(graph, weights) -> VertexClustering'''
+    def _method(table, weight=None, **kwargs):
+        graph = to_igraph(table, weight=weight)
+        weights = None if weight is None else 'weight'
+        return np.asarray(call(graph, weights, **kwargs).membership)
+    register_method(name)(_method)
+
+
+_igraph_method('fastgreedy',
+               lambda g, w, **kw: g.community_fastgreedy(weights=w, **kw).as_clustering())
+_igraph_method('infomap',
+               lambda g, w, trials=10, **kw: g.community_infomap(edge_weights=w, trials=trials, **kw))
+_igraph_method('leading_eigenvector',
+               lambda g, w, clusters=10, **kw: g.community_leading_eigenvector(clusters=clusters,
+                                                                               weights=w, **kw))
+_igraph_method('label_propagation',
+               lambda g, w, **kw: g.community_label_propagation(weights=w, **kw))
+_igraph_method('multilevel',
+               lambda g, w, **kw: g.community_multilevel(weights=w, **kw))
+_igraph_method('leiden',
+               lambda g, w, objective_function='modularity', **kw:
+               g.community_leiden(objective_function=objective_function, weights=w, **kw))
+_igraph_method('optimal_modularity',
+               lambda g, w, **kw: g.community_optimal_modularity(weights=w, **kw))
+_igraph_method('edge_betweenness',
+               lambda g, w, **kw: g.community_edge_betweenness(weights=w, **kw).as_clustering())
+_igraph_method('spinglass',
+               lambda g, w, **kw: g.community_spinglass(weights=w, **kw))
+_igraph_method('walktrap',
+               lambda g, w, **kw: g.community_walktrap(weights=w, **kw).as_clustering())
+
+
+# ------------------- numpy实现的Louvain/Leiden --------------------------
+
+def _partition_quality(row, col, data, membership, kout, kin, total, resolution):
+    '''邻接矩阵为COO(row, col, data)时，划分membership的模块度'''
+    inner = data[membership[row] == membership[col]].sum()
+    num_nodes = len(membership)
+    total_out = np.bincount(membership, weights=kout, minlength=num_nodes)
+    total_in = np.bincount(membership, weights=kin, minlength=num_nodes)
+    return inner / total - resolution * np.dot(total_out, total_in) / total ** 2
+
+
+def _gather_rows(indptr, rows):
+    '''CSR中若干行的元素的位置'''
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return offsets + np.arange(lengths.sum())
+
+
+def _move_nodes(row, col, data, membership, kout, kin, total, resolution, rng,
+                parent=None, tol=1e-12, max_sweeps=1000):
+    '''
+    局部移动，返回新的划分（社区编号在[0, 节点数)之间）
+    每一轮只计算邻居移动过的节点（与Leiden的节点队列相同），
+    模块度和社区的度和按移动的节点增量更新，后面的轮次只与移动的节点的度相关
+
+    :param row, col, data: 邻接矩阵的COO形式（包括自环）
+    :param membership: 初始划分
+    :param kout, kin: 出度和入度（加权）
+    :param total: 边权重的和M
+    :param parent: None 或 Leiden细化时节点所在的社区，
+        此时只有单节点的子社区可以移动，只能移到同一社区内与社区连接充分的子社区
+    :return: ndarray
+    '''
+    num_nodes = len(membership)
+    membership = membership.copy()
+
+    # 节点之间两个方向的边（不含自环），w(i, c)按这些边累加，按行排列（CSR）
+    off_diagonal = row != col
+    pair_row = np.concatenate([row[off_diagonal], col[off_diagonal]])
+    pair_col = np.concatenate([col[off_diagonal], row[off_diagonal]])
+    pair_weight = np.concatenate([data[off_diagonal], data[off_diagonal]])
+    if parent is not None:
+        same_parent = parent[pair_row] == parent[pair_col]
+        pair_row, pair_col, pair_weight = (pair_row[same_parent], pair_col[same_parent],
+                                           pair_weight[same_parent])
+    pairs = sp.csr_matrix((pair_weight, (pair_row, pair_col)), shape=(num_nodes, num_nodes))
+    pairs.sum_duplicates()
+    indptr, pair_col, pair_weight = pairs.indptr, pairs.indices, pairs.data
+    pair_row = np.repeat(np.arange(num_nodes), np.diff(indptr))
+
+    size = np.bincount(membership, minlength=num_nodes)
+    total_out = np.bincount(membership, weights=kout, minlength=num_nodes)
+    total_in = np.bincount(membership, weights=kin, minlength=num_nodes)
+    inner = data[~off_diagonal].sum() + 0.5 * pair_weight[membership[pair_row] ==
+                                                          membership[pair_col]].sum()
+    null = np.dot(total_out, total_in)
+    quality = inner / total - resolution * null / total ** 2
+
+    if parent is not None:
+        # 连接充分：w(v, S-v) >= gamma * d_v * (D_S - d_v) / (2M)，子社区同理
+        degree = kout + kin
+        parent_degree = np.bincount(parent, weights=degree, minlength=num_nodes)
+        node_weight = np.bincount(pair_row, weights=pair_weight, minlength=num_nodes)
+        node_connected = node_weight >= resolution * degree * (parent_degree[parent] - degree) / (2 * total)
+        community_degree = np.bincount(membership, weights=degree, minlength=num_nodes)
+        community_weight = np.bincount(membership[pair_row], minlength=num_nodes,
+                                       weights=pair_weight * (membership[pair_row] != membership[pair_col]))
+
+    fraction = 1.0
+    active = np.ones(num_nodes, dtype=bool)
+    moved_flag = np.zeros(num_nodes, dtype=bool)
+    for _ in range(max_sweeps):
+        if parent is not None:
+            active &= size[membership] == 1
+        nodes = np.flatnonzero(active)
+        if len(nodes) < 1:
+            break
+
+        # w(i, c)：节点 x 相邻社区
+        positions = _gather_rows(indptr, nodes)
+        links = sp.csr_matrix((pair_weight[positions],
+                               (pair_row[positions], membership[pair_col[positions]])),
+                              shape=(num_nodes, num_nodes))
+        links.sum_duplicates()
+        node = np.repeat(np.arange(num_nodes), np.diff(links.indptr))
+        target, weight = links.indices, links.data
+        own = membership[node]
+        is_own = target == own
+
+        gain = weight / total - resolution * (
+            kout[node] * (total_in[target] - np.where(is_own, kin[node], 0)) +
+            kin[node] * (total_out[target] - np.where(is_own, kout[node], 0))) / total ** 2
+        own_weight = np.zeros(num_nodes)
+        own_weight[node[is_own]] = weight[is_own]
+        stay = own_weight / total - resolution * (
+            kout * (total_in[membership] - kin) + kin * (total_out[membership] - kout)) / total ** 2
+        delta = gain - stay[node]
+
+        valid = ~is_own & (delta > tol)
+        # 两个单节点社区之间只向编号小的移动，避免互相交换
+        valid &= ~((size[own] == 1) & (size[target] == 1) & (target > own))
+        if parent is not None:
+            community_connected = community_weight >= resolution * community_degree * (
+                parent_degree - community_degree) / (2 * total)
+            valid &= node_connected[node] & community_connected[target]
+
+        best = np.flatnonzero(valid)
+        if len(best) < 1:
+            break
+        best = best[np.lexsort((-delta[best], node[best]))]
+        best = best[np.r_[True, node[best][1:] != node[best][:-1]]]
+        movers, targets = node[best], target[best]
+
+        while True:
+            if fraction * len(movers) < 1:
+                # 只移动增益最大的节点，模块度一定增加
+                chosen = np.array([np.argmax(delta[best])])
+            elif fraction < 1:
+                chosen = np.flatnonzero(rng.random_sample(len(movers)) < fraction)
+            else:
+                chosen = np.arange(len(movers))
+            if parent is not None:
+                # 细化时移动的都是单节点的子社区，不移到同时被移空的子社区，
+                # 否则移入的几个节点只通过移走的节点相连，子社区不连通
+                chosen = chosen[~np.isin(targets[chosen], membership[movers[chosen]])]
+            moved_nodes, old, new = movers[chosen], membership[movers[chosen]], targets[chosen]
+
+            # 受影响的有序节点对：移动的节点的边，以及反方向（另一端没有移动时）
+            moved_flag[moved_nodes] = True
+            positions = _gather_rows(indptr, moved_nodes)
+            pair_i, pair_j, pair_w = pair_row[positions], pair_col[positions], pair_weight[positions]
+            back = ~moved_flag[pair_j]
+            moved_flag[moved_nodes] = False
+            pair_i, pair_j = np.concatenate([pair_i, pair_j[back]]), np.concatenate([pair_j, pair_i[back]])
+            pair_w = np.concatenate([pair_w, pair_w[back]])
+
+            moved = membership.copy()
+            moved[moved_nodes] = new
+            moved_inner = inner + 0.5 * np.dot(pair_w, (moved[pair_i] == moved[pair_j]).astype(np.float64) -
+                                               (membership[pair_i] == membership[pair_j]))
+            moved_out, moved_in = total_out.copy(), total_in.copy()
+            np.subtract.at(moved_out, old, kout[moved_nodes])
+            np.add.at(moved_out, new, kout[moved_nodes])
+            np.subtract.at(moved_in, old, kin[moved_nodes])
+            np.add.at(moved_in, new, kin[moved_nodes])
+            moved_null = np.dot(moved_out, moved_in)
+            moved_quality = moved_inner / total - resolution * moved_null / total ** 2
+            if moved_quality > quality + tol or len(chosen) == 1:
+                break
+            fraction /= 2
+
+        if moved_quality <= quality + tol:
+            break
+
+        np.subtract.at(size, old, 1)
+        np.add.at(size, new, 1)
+        if parent is not None:
+            np.subtract.at(community_degree, old, degree[moved_nodes])
+            np.add.at(community_degree, new, degree[moved_nodes])
+            np.subtract.at(community_weight, membership[pair_i],
+                           pair_w * (membership[pair_i] != membership[pair_j]))
+            np.add.at(community_weight, moved[pair_i], pair_w * (moved[pair_i] != moved[pair_j]))
+        membership, quality = moved, moved_quality
+        inner, total_out, total_in = moved_inner, moved_out, moved_in
+        fraction = min(1.0, fraction * 2)
+
+        active = np.zeros(num_nodes, dtype=bool)
+        active[movers] = True
+        active[pair_j] = True
+
+    return membership
+
+
+def louvain(table, weight=None, refine=False, resolution=1.0, seed=0, max_levels=32, tol=1e-12):
+    '''
+    多层Louvain（refine=True时为Leiden），只依赖numpy和scipy，见文件开头的说明
+
+    :param table: EdgeTable，有向或无向
+    :param weight: None 或 边权重的属性名
+    :param refine: 是否在聚合前进行Leiden的细化
+    :param resolution: 分辨率gamma，越大社区越小
+    :param seed: 随机种子（同时移动的节点过多时，随机选择一部分移动），默认固定为0，结果可以重复；
+                 None时每次运行的结果可能不同
+    :param max_levels: 最多聚合的层数
+    :param tol: 模块度增加小于tol时停止
+    :return: ndarray, 按节点编码排列的社区编号（按第一次出现的顺序编号），
+             refine=True时为最后一层细化后的划分，每个社区都是连通的
+    '''
+    import graph_metrics
+
+    rng = np.random.RandomState(seed)
+    adjacency = graph_metrics.csr_adjacency(table, weight=weight)
+    node_map = np.arange(table.number_of_nodes())
+    membership = np.arange(table.number_of_nodes())
+    refined = membership
+
+    for _ in range(max_levels):
+        num_nodes = adjacency.shape[0]
+        coo = adjacency.tocoo()
+        row, col, data = coo.row, coo.col, coo.data
+        total = data.sum()
+        if total <= 0:
+            break
+        kout = np.bincount(row, weights=data, minlength=num_nodes)
+        kin = np.bincount(col, weights=data, minlength=num_nodes)
+
+        membership = _move_nodes(row, col, data, membership, kout, kin, total, resolution, rng,
+                                 tol=tol)
+        if refine:
+            refined = _move_nodes(row, col, data, np.arange(num_nodes), kout, kin, total,
+                                  resolution, rng, parent=membership, tol=tol)
+        else:
+            refined = membership
+
+        codes, uniques = pd.factorize(refined)
+        if len(uniques) == num_nodes:
+            break
+
+        # 按（细化后的）社区聚合，社区内的边成为自环，下一层的初始划分为节点所在的社区
+        adjacency = sp.csr_matrix((data, (codes[row], codes[col])), shape=(len(uniques),) * 2)
+        adjacency.sum_duplicates()
+        node_map = codes[node_map]
+        aggregated = np.empty(len(uniques), dtype=np.int64)
+        aggregated[codes] = membership
+        membership = pd.factorize(aggregated)[0]
+        refined = np.arange(len(uniques))
+
+    # Leiden返回细化后的划分：每个子社区都由相连的节点合并而来，一定是连通的
+    return pd.factorize((refined if refine else membership)[node_map])[0]
+
+
+register_method('numpy_louvain')(
+    lambda table, weight=None, **kwargs: louvain(table, weight=weight, **kwargs))
+register_method('numpy_leiden')(
+    lambda table, weight=None, **kwargs: louvain(table, weight=weight, refine=True, **kwargs))
+
+
+def membership_codes(table, cluster_result):
+    '''
+    社区划分结果按EdgeTable的节点编码对齐，社区重新编码为0,1,2...
+    :param table: EdgeTable
+    :param cluster_result: DataFrame, ['Id','modularity_class']，gephi导出的['id','modularity_class']也可以
+    :return: ndarray, 按节点编码排列的社区编号
+    '''
+    id_column = 'Id' if 'Id' in cluster_result.columns else 'id'
+    ids = pd.Index(cluster_result[id_column])
+    if not ids.is_unique:
+        raise ValueError('cluster_result中的节点id有重复')
+    position = ids.get_indexer(table.nodes)
+    if (position < 0).any():
+        missing = table.nodes[position < 0]
+        raise ValueError('{}个节点不在cluster_result中，例如：{}'.format(len(missing), list(missing[:5])))
+    classes = pd.factorize(cluster_result['modularity_class'])[0]
+    return classes[position]
+
+
+def modularity(table, membership, weight=None, resolution=1.0):
+    '''
+    模块度，在边数组上用bincount按社区累加，与igraph(以及gephi)的结果一致
+        有向图：Q = sum_c [L_c / m - Kout_c * Kin_c / m^2]
+        无向图：Q = sum_c [L_c / m - (K_c / 2m)^2]，自环的度记2次
+    L_c为社区内部边的权重和，m为所有边的权重和，重复的边重复计算
+
+    :param table: EdgeTable
+    :param membership: ndarray, 按节点编码排列的社区编号，见membership_codes
+    :param weight: None 或 边权重的属性名
+    :param resolution: 分辨率gamma
+    :return: float
+    '''
+    membership = np.asarray(membership)
+    weights = np.ones(len(table)) if weight is None else np.asarray(table.attrs[weight], dtype=np.float64)
+    total = weights.sum()
+    if total <= 0:
+        return 0.0
+
+    num_classes = membership.max() + 1 if len(membership) > 0 else 0
+    source_class, target_class = membership[table.source], membership[table.target]
+    inner = weights[source_class == target_class].sum()
+    out_total = np.bincount(source_class, weights=weights, minlength=num_classes)
+    in_total = np.bincount(target_class, weights=weights, minlength=num_classes)
+    if table.directed:
+        null = np.dot(out_total, in_total) / total ** 2
+    else:
+        null = np.sum((out_total + in_total) ** 2) / (4 * total ** 2)
+    return inner / total - resolution * null
+
+
+class ModularityTracker():
+    '''
+    模块度的增量更新：保存每个社区内部边的权重和，以及度（出度，入度）的和，
+    移动一个节点只需要遍历它的边，O(deg)，用于交互式调整社区划分或局部搜索
+
+    使用：
+        tracker = ModularityTracker(table, cluster_result, weight='Weight')
+        tracker.delta(node, new_class)  # 移动后模块度的变化，不修改划分
+        tracker.move(node, new_class)   # 移动节点，返回新的模块度
+        tracker.modularity              # 当前的模块度，与modularity()一致
+        tracker.cluster_result()        # ['Id','modularity_class']
+    '''
+
+    def __init__(self, table, cluster_result, weight=None, resolution=1.0):
+        '''
+        :param table: EdgeTable
+        :param cluster_result: DataFrame, ['Id','modularity_class']，网络中的节点必须都在其中
+        :param weight: None 或 边权重的属性名
+        :param resolution: 分辨率gamma
+        '''
+        self.table = table
+        self.resolution = resolution
+        self.directed = table.directed
+        self.weights = (np.ones(len(table)) if weight is None
+                        else np.asarray(table.attrs[weight], dtype=np.float64))
+        self.total = self.weights.sum()
+        self.indptr, self.incident = table.incidence()
+
+        self.membership = membership_codes(table, cluster_result)
+        self.labels = list(pd.unique(cluster_result['modularity_class']))
+        self.label_codes = {label: code for code, label in enumerate(self.labels)}
+
+        num_nodes = table.number_of_nodes()
+        self.kout = np.bincount(table.source, weights=self.weights, minlength=num_nodes)
+        self.kin = np.bincount(table.target, weights=self.weights, minlength=num_nodes)
+        self.self_loops = np.bincount(table.source, minlength=num_nodes,
+                                      weights=self.weights * (table.source == table.target))
+
+        num_classes = len(self.labels)
+        source_class = self.membership[table.source]
+        target_class = self.membership[table.target]
+        self.inner = np.bincount(source_class, minlength=num_classes,
+                                 weights=self.weights * (source_class == target_class))
+        self.out_total = np.bincount(self.membership, weights=self.kout, minlength=num_classes)
+        self.in_total = np.bincount(self.membership, weights=self.kin, minlength=num_classes)
+        self.inner_sum = self.inner.sum()
+        self.null_sum = self._null(self.out_total, self.in_total).sum()
+
+    def _null(self, out_total, in_total):
+        '''每个社区的零模型项（乘以 m^2 之前）'''
+        if self.directed:
+            return out_total * in_total
+        return (out_total + in_total) ** 2 / 4.0
+
+    @property
+    def modularity(self):
+        if self.total <= 0:
+            return 0.0
+        return self.inner_sum / self.total - self.resolution * self.null_sum / self.total ** 2
+
+    def _node_code(self, node):
+        code = self.table.nodes.get_indexer([node])[0]
+        if code < 0:
+            raise ValueError('节点{}不在网络中'.format(node))
+        return code
+
+    def _class_code(self, label):
+        '''社区的编码，新的社区追加到最后'''
+        if label not in self.label_codes:
+            self.label_codes[label] = len(self.labels)
+            self.labels.append(label)
+            self.inner = np.append(self.inner, 0.0)
+            self.out_total = np.append(self.out_total, 0.0)
+            self.in_total = np.append(self.in_total, 0.0)
+        return self.label_codes[label]
+
+    def _change(self, code, old, new):
+        '''
+        节点code从社区old移到new（None为新的空社区）时，
+        与两个社区之间的权重，以及内部权重和，零模型项的变化
+        '''
+        edges = self.incident[self.indptr[code]:self.indptr[code + 1]]
+        source, target = self.table.source[edges], self.table.target[edges]
+        others = np.where(source == code, target, source)
+        weights = self.weights[edges] * (source != target)
+        classes = self.membership[others]
+        loop = self.self_loops[code]
+        to_old = weights[classes == old].sum() + loop
+        to_new = loop if new is None else weights[classes == new].sum() + loop
+
+        kout, kin = self.kout[code], self.kin[code]
+        old_out, old_in = self.out_total[old], self.in_total[old]
+        new_out, new_in = (0.0, 0.0) if new is None else (self.out_total[new], self.in_total[new])
+        null_change = (self._null(old_out - kout, old_in - kin) + self._null(new_out + kout, new_in + kin) -
+                       self._null(old_out, old_in) - self._null(new_out, new_in))
+        return to_old, to_new, to_new - to_old, null_change
+
+    def delta(self, node, new_class):
+        '''
+        :param node: 节点id
+        :param new_class: 新的社区（可以是新的社区编号）
+        :return: 移动后模块度的变化，不修改当前的划分
+        '''
+        code = self._node_code(node)
+        old = self.membership[code]
+        new = self.label_codes.get(new_class)
+        if new == old or self.total <= 0:
+            return 0.0
+        _, _, inner_change, null_change = self._change(code, old, new)
+        return inner_change / self.total - self.resolution * null_change / self.total ** 2
+
+    def move(self, node, new_class):
+        '''
+        移动节点到新的社区，O(deg)
+        :param node: 节点id
+        :param new_class: 新的社区（可以是新的社区编号）
+        :return: 移动后的模块度
+        '''
+        code = self._node_code(node)
+        old = self.membership[code]
+        new = self._class_code(new_class)
+        if new == old:
+            return self.modularity
+
+        to_old, to_new, inner_change, null_change = self._change(code, old, new)
+        self.inner[old] -= to_old
+        self.inner[new] += to_new
+        self.out_total[old] -= self.kout[code]
+        self.in_total[old] -= self.kin[code]
+        self.out_total[new] += self.kout[code]
+        self.in_total[new] += self.kin[code]
+        self.inner_sum += inner_change
+        self.null_sum += null_change
+        self.membership[code] = new
+        return self.modularity
+
+    def cluster_result(self):
+        '''
+        :return: DataFrame, ['Id','modularity_class']，社区为原来的编号
+        '''
+        labels = pd.Index(self.labels).take(self.membership)
+        return pd.DataFrame({'Id': self.table.nodes, 'modularity_class': labels},
+                            columns=['Id', 'modularity_class'])
+
+
+def detect_communities(table, method='multilevel', weight=None, **kwargs):
+    '''
+    :param table: EdgeTable
+    :param method: 方法名(见list_methods()) 或 community_detect原来的编号(见LEGACY_METHODS)
+    :param weight: None 或 属性名，是否使用边的权重
+    :param kwargs: 传给社区发现方法的参数，例如 trials=10
+    :return: (cluster_result, membership)
+        cluster_result: DataFrame, ['Id','modularity_class']
+        membership: ndarray, 按节点编码排列的社区编号
+    '''
+    name = LEGACY_METHODS.get(method, method)
+    if name not in METHODS:
+        raise ValueError('未知的社区发现方法：{}，可用的方法：{}'.format(method, list_methods()))
+
+    membership = METHODS[name](table, weight=weight, **kwargs)
+    cluster_result = pd.DataFrame({'Id': table.nodes, 'modularity_class': membership},
+                                  columns=['Id', 'modularity_class'])
+    return cluster_result, membership
+
+
+def test_leiden_connected():
+    '''numpy_leiden的每个社区都是连通的（有向图为弱连通），默认的seed结果可以重复'''
+    import networkx as nx
+    from edgetable import EdgeTable
+
+    graph = nx.gnm_random_graph(5000, 12000, seed=2)
+    edgedata = pd.DataFrame(list(graph.edges()), columns=['Source', 'Target'])
+    for directed in [False, True]:
+        table = EdgeTable.from_edgedata(edgedata, directed=directed)
+        for seed in [30, 39, 62, 79]:
+            membership = louvain(table, refine=True, seed=seed)
+            links = nx.Graph()
+            links.add_nodes_from(range(len(membership)))
+            links.add_edges_from(zip(table.source, table.target))
+            for community in np.unique(membership):
+                nodes = np.flatnonzero(membership == community)
+                assert nx.is_connected(links.subgraph(nodes)), (directed, seed, community)
+        assert np.array_equal(detect_communities(table, method='numpy_leiden')[1],
+                              detect_communities(table, method='numpy_leiden')[1])
+    print('test_leiden_connected ok')
+
+
+if __name__ == '__main__':
+
+    test_leiden_connected()
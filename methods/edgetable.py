@@ -0,0 +1,839 @@
+#-*- coding:utf-8 -*-
+
+'''
+目的：
+    整数编码的边表，节点id只编码一次，供NetworkUnity中的各个方法共用，
+    避免每个方法都从原始的Source，Target重新识别节点（例如拼接"src-tgt"字符串）
+
+数据：
+    EdgeTable
+        source, target: ndarray, 节点编码，节点数小于2^31时为int32，否则为int64
+        attrs: dict, 属性名 -> ndarray，边的属性（权重等）
+        nodes: pd.Index, 编码 -> 节点id，nodes.get_indexer(ids) 得到 id -> 编码
+        directed: bool, 是否为有向边
+
+方法：
+    * 从边数据创建 - EdgeTable.from_edgedata
+    * 从networkx的图创建 - EdgeTable.from_networkx
+    * 分块读取边文件创建 - EdgeTable.from_edge_file
+    * 转回边数据 - EdgeTable.to_edgedata
+    * 转为networkx的图 - EdgeTable.to_networkx
+    * 节点的度 - EdgeTable.degree
+    * 边的整数键 - EdgeTable.edge_key
+    * 筛选边 - EdgeTable.subset
+    * 筛选节点 - EdgeTable.node_subset
+    * 按度筛选节点（可迭代到不动点，k-core） - EdgeTable.degree_mask
+    * 连通分量的标签 - EdgeTable.component_labels
+    * 最大连通分量 - EdgeTable.largest_component
+    * 拼接多个边表 - EdgeTable.concat
+    * 合并重复边，累加属性 - EdgeTable.aggregate
+    * 分块读取边文件 - read_edge_chunks
+    * 节点id的增量编码 - NodeInterner
+    * 进程的内存峰值 - peak_memory
+    * 多个边表的流式合并 - EdgeMerger
+    * 按块遍历networkx的图的边 - networkx_edge_chunks
+    * networkx的图的节点 - networkx_nodes
+    * 节点编码转为节点id（类型按边的端点推断） - take_nodes
+
+使用：
+    table = EdgeTable.from_edgedata(edgedata, attr='Weight', directed=True)
+    NetworkUnity.graph_from_edgedata(table)
+
+'''
+
+import os
+import time
+import itertools
+import operator
+import numpy as np
+import pandas as pd
+
+
+def get_attr_list(edgedata, attr):
+    '''
+    把属性参数统一为list
+    :param edgedata: DataFrame 或 EdgeTable
+    :param attr: 'all'(除Source，Target以外的所有列), str, list 或 None
+    :return: list
+    '''
+    if attr is None:
+        return []
+    if isinstance(attr, str):
+        if attr == 'all':
+            if isinstance(edgedata, EdgeTable):
+                return list(edgedata.attrs.keys())
+            return [col for col in edgedata.columns if col not in ('Source', 'Target')]
+        return [attr, ]
+    return list(attr)
+
+
+def distinct(values, slot):
+    '''
+    去掉重复的整数，不排序，O(len(values))
+    :param slot: 长度大于values最大值的int数组，用作临时空间
+    '''
+    positions = np.arange(len(values))
+    slot[values] = positions
+    return values[slot[values] == positions]
+
+
+def code_dtype(num_nodes):
+    '''节点编码的类型，能用int32就用int32'''
+    return np.int32 if num_nodes < 2 ** 31 else np.int64
+
+
+def group_first(keys):
+    '''
+    按键分组，组号按键第一次出现的顺序编号（hash，不排序）
+    :param keys: array
+    :return: (codes, first), codes是每一行的组号，first是每一组第一次出现的位置
+    '''
+    codes, uniques = pd.factorize(keys)
+    # 组号按第一次出现的顺序递增，累计最大值增加的位置即为每一组第一次出现的位置
+    first = np.flatnonzero(np.diff(np.maximum.accumulate(codes), prepend=-1) > 0)
+    return codes, first
+
+
+# networkx的图每次取出的边数
+NETWORKX_CHUNK = 2 ** 20
+
+# 分块读取边文件时每块的行数
+EDGE_FILE_CHUNK = 2 ** 20
+
+
+def _infer_values(values):
+    '''object数组按值推断类型（int，bool，float，object），与pd.DataFrame(records)一致'''
+    return pd.Series(values, copy=False).infer_objects().to_numpy()
+
+
+def _attr_values(datas, name):
+    '''一块边的属性值，缺失为nan，类型按值推断，见_infer_values'''
+    return _infer_values(np.fromiter(map(operator.methodcaller('get', name, np.nan), datas),
+                                     dtype=object, count=len(datas)))
+
+
+def networkx_nodes(graph):
+    '''
+    networkx的图的节点，pd.Index，顺序与graph.nodes()一致（包括孤立节点），
+    int和float的节点混合时保留为object，不转为float（见take_nodes）
+    '''
+    ids = list(graph.nodes())
+    if pd.api.types.infer_dtype(ids, skipna=False) == 'mixed-integer-float':
+        return pd.Index(ids, dtype=object)
+    return pd.Index(ids)
+
+
+def take_nodes(nodes, codes):
+    '''
+    节点编码转为节点id，节点的类型不同时（nodes为object，例如int的边和一个str的孤立节点），
+    Source，Target的类型只按边的端点推断，与pd.DataFrame(records)一致
+    :param nodes: pd.Index, 编码 -> 节点id
+    :param codes: ndarray, 节点编码
+    :return: ndarray
+    '''
+    values = nodes.take(codes).to_numpy()
+    if values.dtype == object:
+        return _infer_values(values)
+    return values
+
+
+def _concat_values(pieces):
+    '''拼接各块的属性值，各块的类型不同时（例如int和缺失的nan）重新推断'''
+    if len(set(piece.dtype for piece in pieces)) < 2:
+        return np.concatenate(pieces)
+    return _infer_values(np.concatenate([piece.astype(object) for piece in pieces]))
+
+
+def networkx_edge_chunks(graph, attr='all', chunksize=NETWORKX_CHUNK, nodes=None):
+    '''
+    按块遍历networkx的图的邻接表，每块直接生成节点编码和属性的数组，不为每条边创建tuple或dict
+    边的顺序与graph.edges()一致，无向图的每条边只出现一次
+    :param graph: networkx.Graph/DiGraph
+    :param attr: 边属性，'all', str, list 或 None；'all'时属性按第一次出现的顺序
+    :param chunksize: 每块的边数（按节点分块，实际的边数可能略大）
+    :param nodes: 节点的编码顺序，默认为graph.nodes()的顺序
+    :return: generator of (source, target, attrs)，source，target为节点编码，attrs为 属性名 -> ndarray
+    '''
+    nodes = list(graph.nodes()) if nodes is None else nodes
+    node_index = {node: code for code, node in enumerate(nodes)}
+    dtype = code_dtype(len(node_index))
+    names = None if attr == 'all' else get_attr_list(None, attr)
+    directed = graph.is_directed()
+    # 直接使用邻接表的dict，避免AtlasView的开销
+    adj = graph._succ if directed else graph._adj
+
+    def _chunk(block):
+        codes = np.fromiter(map(node_index.__getitem__, block), dtype=dtype, count=len(block))
+        nbrs = [adj[node] for node in block]
+        degrees = np.fromiter(map(len, nbrs), dtype=np.int64, count=len(block))
+        size = int(degrees.sum())
+        source = np.repeat(codes, degrees)
+        target = np.fromiter(map(node_index.__getitem__, itertools.chain.from_iterable(nbrs)),
+                             dtype=dtype, count=size)
+        datas = list(itertools.chain.from_iterable(map(dict.values, nbrs)))
+        if not directed:
+            # 与graph.edges()相同，只保留编码不小于起点的邻居（包括自环）
+            keep = target >= source
+            source, target = source[keep], target[keep]
+            datas = list(itertools.compress(datas, keep.tolist()))
+        chunk_names = names
+        if chunk_names is None:
+            chunk_names = list(dict.fromkeys(itertools.chain.from_iterable(datas)))
+        return source, target, {name: _attr_values(datas, name) for name in chunk_names}
+
+    block, count = [], 0
+    for node in nodes:
+        block.append(node)
+        count += len(adj[node])
+        if count >= chunksize:
+            yield _chunk(block)
+            block, count = [], 0
+    if len(block) > 0:
+        yield _chunk(block)
+
+
+class EdgeTable():
+    '''
+    整数编码的边表，见模块说明
+    '''
+
+    def __init__(self, source, target, nodes, attrs=None, directed=True):
+        self.nodes = pd.Index(nodes)
+        dtype = code_dtype(len(self.nodes))
+        self.source = np.asarray(source, dtype=dtype)
+        self.target = np.asarray(target, dtype=dtype)
+        self.attrs = {} if attrs is None else {name: np.asarray(values)
+                                               for name, values in attrs.items()}
+        self.directed = directed
+
+    def __len__(self):
+        return len(self.source)
+
+    def __repr__(self):
+        return 'EdgeTable(nodes={}, edges={}, attrs={}, directed={})'.format(
+            self.number_of_nodes(), self.number_of_edges(), list(self.attrs.keys()), self.directed)
+
+    @classmethod
+    def from_edgedata(cls, edgedata, attr='all', directed=True, nodes=None):
+        '''
+        :param edgedata: DataFrame, 包含[Source,Target,...]
+        :param attr: 保存的边属性，'all', str, list 或 None
+        :param directed: 是否为有向边
+        :param nodes: 给定节点的顺序（编码），默认按节点第一次出现的顺序编码
+        :return: EdgeTable
+        '''
+        source = edgedata['Source'].values
+        target = edgedata['Target'].values
+        if nodes is None:
+            codes, nodes = pd.factorize(np.concatenate([source, target]))
+        else:
+            nodes = pd.Index(nodes)
+            codes = nodes.get_indexer(np.concatenate([source, target]))
+            if np.any(codes < 0):
+                raise KeyError('edgedata中存在nodes以外的节点')
+        num_edges = len(edgedata)
+        attrs = {name: edgedata[name].values for name in get_attr_list(edgedata, attr)}
+        return cls(codes[:num_edges], codes[num_edges:], nodes,
+                   attrs=attrs, directed=directed)
+
+    @classmethod
+    def from_networkx(cls, graph, attr=None, chunksize=NETWORKX_CHUNK):
+        '''
+        :param graph: networkx.Graph/DiGraph
+        :param attr: 保存的边属性，'all', str, list 或 None；
+                     类型按值推断（int，bool，float，object），有缺失的属性为nan，
+                     与pd.DataFrame(graph.edges(data=True)的dict)一致
+        :param chunksize: 每次从邻接表取出的边数，见networkx_edge_chunks
+        :return: EdgeTable，节点顺序与graph.nodes()一致（包括孤立节点）
+        '''
+        nodes = networkx_nodes(graph)
+        num_edges = graph.number_of_edges()
+        dtype = code_dtype(len(nodes))
+        source = np.empty(num_edges, dtype=dtype)
+        target = np.empty(num_edges, dtype=dtype)
+        # 属性名 -> [各块的值]，没有该属性的块为nan，filled为已经填入的边数
+        pieces, filled = {}, {}
+
+        def _fill(name, stop):
+            if filled.get(name, 0) < stop:
+                pieces.setdefault(name, []).append(np.full(stop - filled.get(name, 0), np.nan))
+                filled[name] = stop
+
+        start = 0
+        for chunk_source, chunk_target, chunk_attrs in networkx_edge_chunks(graph, attr=attr,
+                                                                            chunksize=chunksize):
+            stop = start + len(chunk_source)
+            source[start:stop] = chunk_source
+            target[start:stop] = chunk_target
+            for name, values in chunk_attrs.items():
+                _fill(name, start)
+                pieces.setdefault(name, []).append(values)
+                filled[name] = stop
+            start = stop
+        for name in pieces:
+            _fill(name, num_edges)
+        attrs = {name: _concat_values(values) for name, values in pieces.items()}
+        return cls(source, target, nodes, attrs=attrs, directed=graph.is_directed())
+
+    @classmethod
+    def from_edge_file(cls, path, attr='all', directed=True, chunksize=EDGE_FILE_CHUNK,
+                       verbose=True, **read_kwargs):
+        '''
+        分块读取边文件，节点id在读取时增量编码（见NodeInterner），
+        每块只保留整数编码和属性的数组，不在内存中保存整个原始的表
+        :param path: str, 文件地址，csv(包括txt等文本), parquet, feather
+        :param attr: 保存的边属性，'all'(第一块中除Source，Target以外的所有列), str, list 或 None
+        :param directed: 是否为有向边
+        :param chunksize: int, 每块的行数
+        :param verbose: 是否输出读取的进度和内存峰值
+        :param read_kwargs: 读取文件的其他参数，例如sep；
+                            csv分块推断类型，id有多种类型时建议给定dtype={'Source': str, 'Target': str}
+        :return: EdgeTable，节点按第一次出现的顺序编码
+        '''
+        columns = None
+        if attr != 'all':
+            columns = ['Source', 'Target'] + get_attr_list(None, attr)
+
+        interner = NodeInterner()
+        sources, targets, attrs = [], [], None
+        rows, start = 0, time.time()
+        for chunk in read_edge_chunks(path, chunksize=chunksize, columns=columns, **read_kwargs):
+            num_edges = len(chunk)
+            codes = interner.intern(np.concatenate([chunk['Source'].to_numpy(),
+                                                    chunk['Target'].to_numpy()]))
+            sources.append(codes[:num_edges])
+            targets.append(codes[num_edges:])
+            if attrs is None:
+                attrs = {name: [] for name in get_attr_list(chunk, attr)}
+            for name in attrs:
+                attrs[name].append(chunk[name].to_numpy())
+            rows += num_edges
+            del chunk, codes
+            if verbose:
+                print('Read Edges : {}, Nodes : {}, Time : {:.1f}s, Peak Memory : {}'.format(
+                    rows, len(interner), time.time() - start, peak_memory_str()))
+
+        nodes = interner.nodes()
+        if rows < 1:
+            return cls([], [], nodes, attrs={name: [] for name in (attrs or {})}, directed=directed)
+        dtype = code_dtype(len(nodes))
+        source = np.concatenate(sources).astype(dtype, copy=False)
+        del sources
+        target = np.concatenate(targets).astype(dtype, copy=False)
+        del targets
+        attrs = {name: np.concatenate(values) for name, values in attrs.items()}
+        return cls(source, target, nodes, attrs=attrs, directed=directed)
+
+    def to_edgedata(self, attr='all'):
+        '''
+        :param attr: 输出的边属性，'all', str, list 或 None
+        :return: DataFrame, [Source,Target,...]，节点为原始的id，
+                 Source，Target的类型按边的端点推断（不受孤立节点的类型影响），见take_nodes
+        '''
+        columns = {'Source': take_nodes(self.nodes, self.source),
+                   'Target': take_nodes(self.nodes, self.target)}
+        for name in get_attr_list(self, attr):
+            columns[name] = self.attrs[name]
+        return pd.DataFrame(columns)
+
+    def to_networkx(self, attr='all', directed=None):
+        '''
+        :param attr: 边的属性，'all', str, list 或 None
+        :param directed: 默认使用边表的directed
+        :return: networkx.Graph 或 DiGraph，包括所有节点（按编码的顺序）
+        '''
+        import networkx as nx
+
+        directed = self.directed if directed is None else directed
+        graph = nx.DiGraph() if directed else nx.Graph()
+        graph.add_nodes_from(self.nodes)
+        sources = self.node_ids(self.source)
+        targets = self.node_ids(self.target)
+        names = get_attr_list(self, attr)
+        if len(names) < 1:
+            graph.add_edges_from(zip(sources, targets))
+        else:
+            columns = [self.attrs[name].tolist() for name in names]
+            attr_dicts = (dict(zip(names, values)) for values in zip(*columns))
+            graph.add_edges_from(zip(sources, targets, attr_dicts))
+        return graph
+
+    def number_of_nodes(self):
+        return len(self.nodes)
+
+    def number_of_edges(self):
+        return len(self.source)
+
+    def node_codes(self, ids):
+        '''节点id -> 编码，不存在的节点为-1'''
+        return self.nodes.get_indexer(ids)
+
+    def node_ids(self, codes):
+        '''编码 -> 节点id'''
+        return self.nodes.take(codes)
+
+    def memory_usage(self):
+        '''边表的内存占用（bytes），不包括节点的id'''
+        size = self.source.nbytes + self.target.nbytes
+        return size + sum(values.nbytes for values in self.attrs.values())
+
+    def edge_key(self, directed=None):
+        '''
+        每条边的int64键，无向边用(min, max)组合，A-B 与 B-A 的键相同
+        :param directed: 默认使用边表的directed
+        :return: ndarray, int64
+        '''
+        directed = self.directed if directed is None else directed
+        source = self.source.astype(np.int64)
+        target = self.target.astype(np.int64)
+        if not directed:
+            source, target = np.minimum(source, target), np.maximum(source, target)
+        return source * self.number_of_nodes() + target
+
+    def degree(self, weight=None, direction='all'):
+        '''
+        节点的度，按边表的记录计数（重复的边会重复计数）
+        :param weight: None 或 属性名，使用该属性作为权重
+        :param direction: 'all', 'in', 'out'
+        :return: ndarray, 按节点编码排列
+        '''
+        weights = None if weight is None else self.attrs[weight]
+        num_nodes = self.number_of_nodes()
+        degree = np.zeros(num_nodes, dtype=np.float64 if weight is not None else np.int64)
+        if direction in ('all', 'out'):
+            degree += np.bincount(self.source, weights=weights, minlength=num_nodes)
+        if direction in ('all', 'in'):
+            degree += np.bincount(self.target, weights=weights, minlength=num_nodes)
+        return degree
+
+    def subset(self, mask, compact=True):
+        '''
+        筛选边
+        :param mask: bool array 或 边的位置
+        :param compact: 是否去掉不再出现的节点，重新编码
+        :return: EdgeTable
+        '''
+        source = self.source[mask]
+        target = self.target[mask]
+        attrs = {name: values[mask] for name, values in self.attrs.items()}
+        nodes = self.nodes
+        if compact:
+            num_edges = len(source)
+            codes, used = pd.factorize(np.concatenate([source, target]), sort=True)
+            source, target = codes[:num_edges], codes[num_edges:]
+            nodes = self.nodes.take(used)
+        return EdgeTable(source, target, nodes, attrs=attrs, directed=self.directed)
+
+    def node_subset(self, node_mask):
+        '''
+        筛选节点，保留两端节点都被保留的边，节点重新编码（保留的孤立节点也保留在nodes中）
+        :param node_mask: bool array, 按节点编码排列
+        :return: EdgeTable
+        '''
+        node_mask = np.asarray(node_mask, dtype=bool)
+        mapping = np.cumsum(node_mask, dtype=np.int64) - 1
+        edge_mask = node_mask[self.source] & node_mask[self.target]
+        nodes = self.nodes[node_mask]
+        dtype = code_dtype(len(nodes))
+        source = mapping[self.source[edge_mask]].astype(dtype)
+        target = mapping[self.target[edge_mask]].astype(dtype)
+        attrs = {name: values[edge_mask] for name, values in self.attrs.items()}
+        return EdgeTable(source, target, nodes, attrs=attrs, directed=self.directed)
+
+    def incidence(self):
+        '''
+        节点 -> 边的关联（CSR形式），自环在该节点下出现两次
+        :return: (indptr, edges), 节点i关联的边为 edges[indptr[i]:indptr[i+1]]
+        '''
+        num_edges = self.number_of_edges()
+        ends = np.concatenate([self.source, self.target])
+        order = np.argsort(ends, kind='stable')
+        indptr = np.zeros(self.number_of_nodes() + 1, dtype=np.int64)
+        np.cumsum(np.bincount(ends, minlength=self.number_of_nodes()), out=indptr[1:])
+        return indptr, order % num_edges if num_edges > 0 else order
+
+    def degree_mask(self, lower=None, upper=None, iterative=False):
+        '''
+        按度筛选节点，度为入度+出度，按边表的记录计数
+
+        :param lower: 度的下限（包含）
+        :param upper: 度的上限（包含）
+        :param iterative: 是否迭代到不动点：去掉节点后邻居的度会减小，
+            低于下限的邻居继续去掉，直到所有保留的节点都满足下限（lower=k 时即k-core）。
+            每一轮只处理新去掉的节点关联的边，总的计算量与边数线性相关
+        :return: bool array, 按节点编码排列，True为保留的节点
+        '''
+        degree = self.degree()
+        keep = np.ones(len(degree), dtype=bool)
+        if lower is not None:
+            keep &= degree >= lower
+        if upper is not None:
+            keep &= degree <= upper
+        if not iterative or lower is None:
+            return keep
+
+        indptr, incident = self.incidence()
+        alive = np.ones(self.number_of_edges(), dtype=bool)
+        edge_slot = np.empty(self.number_of_edges(), dtype=np.int64)
+        node_slot = np.empty(len(degree), dtype=np.int64)
+        removed = np.flatnonzero(~keep)
+        while len(removed) > 0:
+            starts = indptr[removed]
+            lengths = indptr[removed + 1] - starts
+            offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+            edges = incident[offsets + np.arange(lengths.sum())]
+            edges = distinct(edges[alive[edges]], edge_slot)
+            alive[edges] = False
+
+            ends = np.concatenate([self.source[edges], self.target[edges]])
+            np.subtract.at(degree, ends, 1)
+            ends = ends[keep[ends] & (degree[ends] < lower)]
+            removed = distinct(ends, node_slot)
+            keep[removed] = False
+        return keep
+
+    def component_labels(self):
+        '''
+        连通分量（有向图为弱连通），直接在边数组上计算，不创建邻接表：
+        每一轮把边两端的根节点中较大的挂到较小的下面（min-label hooking），
+        再压缩路径（pointer jumping），两端已在同一分量的边不再参与下一轮，
+        轮数与分量的直径的对数相关，每一轮都是对剩余边的向量化操作
+        :return: ndarray, 按节点编码排列，分量按节点数从大到小编号，0为最大连通分量
+        '''
+        num_nodes = self.number_of_nodes()
+        parent = np.arange(num_nodes, dtype=code_dtype(num_nodes))
+        source, target = self.source, self.target
+        while len(source) > 0:
+            root_source, root_target = parent[source], parent[target]
+            active = root_source != root_target
+            source, target = source[active], target[active]
+            root_source, root_target = root_source[active], root_target[active]
+            if len(source) < 1:
+                break
+            np.minimum.at(parent, np.maximum(root_source, root_target),
+                          np.minimum(root_source, root_target))
+            while True:
+                grandparent = parent[parent]
+                if np.array_equal(grandparent, parent):
+                    break
+                parent = grandparent
+
+        # 根节点是分量中编码最小的节点，按根节点的顺序给分量编号，再按节点数排序
+        is_root = parent == np.arange(num_nodes)
+        labels = (np.cumsum(is_root) - 1)[parent]
+        sizes = np.bincount(labels)
+        rank = np.empty(len(sizes), dtype=labels.dtype)
+        rank[np.argsort(-sizes, kind='stable')] = np.arange(len(sizes))
+        return rank[labels]
+
+    def largest_component(self):
+        '''
+        :return: EdgeTable, 最大连通分量（有向图为弱连通）的边
+        '''
+        if self.number_of_nodes() < 1:
+            return self
+        return self.node_subset(self.component_labels() == 0)
+
+    @staticmethod
+    def concat(tables, directed=None):
+        '''
+        拼接多个边表，节点重新统一编码（按在各个表中第一次出现的顺序）
+        :param tables: list of EdgeTable
+        :param directed: 默认使用第一个边表的directed
+        :return: EdgeTable
+        '''
+        tables = list(tables)
+        directed = tables[0].directed if directed is None else directed
+        nodes = tables[0].nodes.append([table.nodes for table in tables[1:]])
+        nodes = pd.Index(pd.unique(nodes))
+
+        names = []
+        for table in tables:
+            names.extend(name for name in table.attrs if name not in names)
+
+        sources, targets, attrs = [], [], {name: [] for name in names}
+        for table in tables:
+            mapping = nodes.get_indexer(table.nodes)
+            sources.append(mapping[table.source])
+            targets.append(mapping[table.target])
+            for name in names:
+                values = table.attrs.get(name)
+                if values is None:
+                    values = np.full(len(table), np.nan)
+                attrs[name].append(values)
+        attrs = {name: np.concatenate(values) for name, values in attrs.items()}
+        return EdgeTable(np.concatenate(sources), np.concatenate(targets), nodes,
+                         attrs=attrs, directed=directed)
+
+    def aggregate(self, accumulate_attr='all'):
+        '''
+        合并重复的边（无向边中A-B与B-A视为同一条边），
+        累加accumulate_attr中的属性，其他属性取第一次出现的值，
+        边的方向与顺序按第一次出现的边
+        :param accumulate_attr: 需要累加的属性，'all', str, list 或 None
+        :return: EdgeTable
+        '''
+        accumulate_attr = get_attr_list(self, accumulate_attr)
+        codes, first = group_first(self.edge_key())
+
+        attrs = {name: values[first] for name, values in self.attrs.items()}
+        if len(accumulate_attr) > 0:
+            attr_sum = pd.DataFrame({name: self.attrs[name] for name in accumulate_attr})
+            attr_sum = attr_sum.groupby(codes, sort=True).sum()
+            for name in accumulate_attr:
+                attrs[name] = attr_sum[name].values
+        return EdgeTable(self.source[first], self.target[first], self.nodes,
+                         attrs=attrs, directed=self.directed)
+
+
+def read_edge_chunks(path, chunksize=None, columns=None, **read_kwargs):
+    '''
+    分块读取边文件
+    :param path: str, 文件地址，csv(包括txt等文本), parquet, feather
+    :param chunksize: int, 每块的行数，None表示整个文件作为一块；
+                      parquet按row group分批读取，feather按record batch读取（需要pyarrow）
+    :param columns: list, 只读取的列，None表示所有列
+    :param read_kwargs: 传给pandas读取函数的参数
+    :return: generator of DataFrame
+    '''
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.parquet', '.feather') and chunksize is not None:
+        for batch in _arrow_batches(path, ext, chunksize, columns):
+            yield batch.to_pandas()
+    elif ext == '.parquet':
+        yield pd.read_parquet(path, columns=columns, **read_kwargs)
+    elif ext == '.feather':
+        yield pd.read_feather(path, columns=columns, **read_kwargs)
+    elif chunksize is None:
+        yield pd.read_csv(path, usecols=columns, **read_kwargs)
+    else:
+        for chunk in pd.read_csv(path, chunksize=chunksize, usecols=columns, **read_kwargs):
+            yield chunk
+
+
+def _arrow_batches(path, ext, chunksize, columns):
+    '''parquet/feather文件的RecordBatch，每批最多chunksize行'''
+    import pyarrow as pa
+
+    if ext == '.parquet':
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch
+        return
+
+    # feather(v2)即arrow ipc文件，内存映射后逐个读取record batch
+    with pa.memory_map(path, 'r') as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            if columns is not None:
+                batch = batch.select(columns)
+            for offset in range(0, batch.num_rows, chunksize):
+                yield batch.slice(offset, chunksize)
+
+
+class NodeInterner():
+    '''
+    节点id的增量编码，按第一次出现的顺序编号
+    每块先用pd.factorize去重，只有块内唯一的id需要查询（和加入）编码表
+    '''
+
+    def __init__(self, node_type=None):
+        '''
+        :param node_type: 节点id的类型，例如str，给定时先转换再编码（1和'1'为同一个节点）
+        '''
+        self.node_type = node_type
+        self.index = {}
+        self.uniques = []
+
+    def __len__(self):
+        return len(self.index)
+
+    def intern(self, ids):
+        '''
+        :param ids: array, 节点id
+        :return: ndarray, 编码，已有的id使用原来的编码，新的id依次编号
+        '''
+        codes, uniques = pd.factorize(ids)
+        if self.node_type is not None:
+            # 只转换块内唯一的id
+            type_codes, uniques = pd.factorize(pd.Index(uniques).astype(self.node_type))
+            codes = type_codes[codes]
+        num_nodes = len(self.index)
+        setdefault = self.index.setdefault
+        mapping = np.fromiter((setdefault(node, len(self.index)) for node in uniques),
+                              dtype=np.int64, count=len(uniques))
+        new = mapping >= num_nodes
+        if new.any():
+            self.uniques.append(np.asarray(uniques)[new])
+        mapping = mapping.astype(code_dtype(len(self.index)), copy=False)
+        return mapping[codes]
+
+    def nodes(self):
+        '''
+        :return: pd.Index, 编码 -> 节点id
+        '''
+        if len(self.uniques) < 1:
+            return pd.Index([])
+        return pd.Index(np.concatenate(self.uniques))
+
+
+def peak_memory():
+    '''
+    :return: 当前进程的内存峰值（bytes），不支持resource模块的系统（Windows）返回None
+    '''
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux的单位为KB，macOS为bytes
+    return peak if os.uname()[0] == 'Darwin' else peak * 1024
+
+
+def peak_memory_str():
+    '''内存峰值的字符串，用于输出进度'''
+    peak = peak_memory()
+    if peak is None:
+        return 'unknown'
+    return '{:.1f} MB'.format(peak / 2 ** 20)
+
+
+class EdgeMerger():
+    '''
+    多个边数据的流式合并
+
+    节点id和边的整数键都用NodeInterner增量编码，每条唯一的边对应结果中的一行（按第一次出现的顺序），
+    累加的属性用np.add.at加到对应的行上，其他属性只写入新出现的边。
+    每加入一份边数据只处理这份数据的行，与已经合并的边的数量无关，
+    内存只与唯一边的数量和一份数据的大小有关，与总的行数无关。
+    无向边中A-B与B-A视为同一条边。
+
+    使用：
+        merger = EdgeMerger(directed=False, accumulate_attr='Weight')
+        for edgedata in daily_edgedatas:
+            merger.add(edgedata)
+        table = merger.result()
+    '''
+
+    def __init__(self, directed=True, accumulate_attr='all'):
+        '''
+        :param directed: 是否为有向边
+        :param accumulate_attr: 需要累加的属性，'all', str, list 或 None，其他属性保留第一次出现的值
+        '''
+        self.directed = directed
+        self.accumulate_attr = accumulate_attr
+        self.accumulate_names = None if accumulate_attr == 'all' else get_attr_list(None, accumulate_attr)
+        self.interner = NodeInterner()
+        # 边的整数键 -> 结果中的行
+        self.edge_interner = NodeInterner()
+        self.source = np.empty(0, dtype=np.int64)
+        self.target = np.empty(0, dtype=np.int64)
+        self.attrs = {}
+        self.size = 0
+        self.rows = 0
+
+    def _accumulated(self, name):
+        return self.accumulate_names is None or name in self.accumulate_names
+
+    def _reserve(self, size):
+        '''保证数组的容量不小于size，容量按2倍增长'''
+        capacity = len(self.source)
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity, 1024)
+
+        def _grow(values):
+            grown = np.empty(capacity, dtype=values.dtype)
+            grown[:self.size] = values[:self.size]
+            return grown
+
+        self.source = _grow(self.source)
+        self.target = _grow(self.target)
+        self.attrs = {name: _grow(values) for name, values in self.attrs.items()}
+
+    def _column(self, name, dtype, start, stop, fill_new=True):
+        '''
+        属性列，类型按需要提升，空缺的值为0（累加的属性）或nan：
+        第一次出现的属性之前的行，以及fill_new时新的行[start, stop)（这份数据中没有这个属性）
+        '''
+        accumulated = self._accumulated(name)
+        column = self.attrs.get(name)
+        fill_start = start
+        if column is None:
+            column, fill_start = np.empty(len(self.source), dtype=dtype), 0
+        # 累加的属性在np.add.at之前新的行也要为0
+        fill_stop = stop if fill_new or accumulated else start
+
+        dtypes = [column.dtype, dtype]
+        if fill_stop > fill_start and not accumulated:
+            dtypes.append(np.float64)
+        try:
+            new_dtype = np.result_type(*dtypes)
+        except TypeError:
+            new_dtype = np.dtype(object)
+        if new_dtype != column.dtype:
+            column = column.astype(new_dtype)
+        if fill_stop > fill_start:
+            column[fill_start:fill_stop] = 0 if accumulated else np.nan
+        self.attrs[name] = column
+        return column
+
+    def add(self, edgedata):
+        '''
+        :param edgedata: DataFrame 或 EdgeTable
+        :return: self
+        '''
+        if not isinstance(edgedata, EdgeTable):
+            edgedata = EdgeTable.from_edgedata(edgedata, attr='all', directed=self.directed)
+        self.rows += len(edgedata)
+
+        # 这份数据的节点编码 -> 统一的节点编码，只处理这份数据中的节点
+        mapping = self.interner.intern(edgedata.nodes.to_numpy()).astype(np.uint64)
+        source = mapping[edgedata.source]
+        target = mapping[edgedata.target]
+        if self.directed:
+            key = (source << np.uint64(32)) | target
+        else:
+            key = (np.minimum(source, target) << np.uint64(32)) | np.maximum(source, target)
+
+        start = self.size
+        rows = self.edge_interner.intern(key).astype(np.int64)
+        stop = len(self.edge_interner)
+        # 新的边按第一次出现的顺序编号，累计最大值增加的位置即为每条新边第一次出现的位置
+        new = np.flatnonzero(rows >= start)
+        first = new[np.diff(np.maximum.accumulate(rows[new]), prepend=start - 1) > 0]
+
+        self._reserve(stop)
+        self.source[start:stop] = source[first]
+        self.target[start:stop] = target[first]
+        for name in self.attrs:
+            if name not in edgedata.attrs:
+                self._column(name, self.attrs[name].dtype, start, stop)
+        for name, values in edgedata.attrs.items():
+            column = self._column(name, values.dtype, start, stop, fill_new=False)
+            if self._accumulated(name):
+                if values.dtype.kind == 'f':
+                    values = np.where(np.isnan(values), 0, values)
+                np.add.at(column, rows, values)
+            else:
+                column[start:stop] = values[first]
+        self.size = stop
+        return self
+
+    def add_file(self, path, chunksize=None, **read_kwargs):
+        '''
+        分块读取文件并合并，见read_edge_chunks
+        '''
+        for chunk in read_edge_chunks(path, chunksize=chunksize, **read_kwargs):
+            self.add(chunk)
+        return self
+
+    def result(self):
+        '''
+        :return: EdgeTable，合并后的边（复制，之后的add不影响）
+        '''
+        attrs = {name: values[:self.size].copy() for name, values in self.attrs.items()}
+        return EdgeTable(self.source[:self.size].copy(), self.target[:self.size].copy(),
+                         self.interner.nodes(), attrs=attrs, directed=self.directed)
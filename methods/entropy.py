@@ -1,9 +1,91 @@
 import os
 import sys
 import time
+import threading
+from functools import partial
 import pandas as pd
 import numpy as np
-from scipy.stats import entropy as _sci_entropy
+
+# row_entropy每块的行数
+BLOCK_ROWS = 2**16
+
+# 每个线程自己的缓冲区
+_local = threading.local()
+
+
+def _block_buffers(rows,cols,dtype):
+    '''当前线程的两个缓冲区（概率和p*ln(p)），不够大时重新分配'''
+    bufs = getattr(_local,"buffers",None)
+    if(bufs is None or bufs[0].dtype != dtype or bufs[0].shape[0] < rows or bufs[0].shape[1] != cols):
+        bufs = (np.empty((rows,cols),dtype=dtype),np.empty((rows,cols),dtype=dtype))
+        _local.buffers = bufs
+    return bufs[0][:rows],bufs[1][:rows]
+
+
+def _block_entropy(values,out,start,stop,dtype):
+    '''计算values[start:stop]的熵，写入out[start:stop]'''
+    x,log_x = _block_buffers(stop - start,values.shape[1],dtype)
+    x[...] = values.iloc[start:stop] if hasattr(values,"iloc") else values[start:stop]
+    np.nan_to_num(x,copy=False)
+    total = x.sum(axis=1)
+    empty = total == 0
+    total[empty] = 1
+    x /= total[:,None]
+
+    log_x.fill(0)
+    np.log(x,out=log_x,where=x > 0)
+    log_x *= x
+    ent = log_x.sum(axis=1)
+    np.negative(ent,out=ent)
+    ent[empty] = np.nan
+    out[start:stop] = ent
+
+
+def entropy_tasks(values,out,dtype=np.float64,block_rows=BLOCK_ROWS):
+    ''':return: list of 无参数的函数，每个计算一块的熵'''
+    return [partial(_block_entropy,values,out,start,min(start + block_rows,len(values)),dtype)
+            for start in range(0,len(values),block_rows)]
+
+
+def run_tasks(tasks,n_jobs=1):
+    '''
+    执行一组互不相关的任务，n_jobs>1时使用线程池（numpy的计算会释放GIL），
+    每个任务只写入自己的行范围，所以结果与顺序执行完全一致
+
+    :param tasks: list of 无参数的函数
+    :param n_jobs: 线程数，-1表示使用所有CPU
+    '''
+    if(n_jobs is not None and n_jobs < 0):
+        n_jobs = os.cpu_count() or 1
+
+    if(n_jobs is None or n_jobs <= 1 or len(tasks) < 2):
+        for task in tasks:
+            task()
+        return
+
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=min(n_jobs,len(tasks))) as pool:
+        # list()使任务中的异常在这里抛出
+        list(pool.map(lambda task: task(),tasks))
+
+
+def row_entropy(values,out=None,dtype=np.float64,block_rows=BLOCK_ROWS,n_jobs=1):
+    '''
+    按行计算熵 H = -sum(p*ln(p))，p为每行归一化后的概率，与scipy.stats.entropy一致
+    按行分块，每块复制到一个连续的缓冲区里计算，0（和nan）直接跳过，不需要加0.0000001，
+    全为0的行结果为nan
+
+    :param values: 2维的ndarray，np.memmap 或 DataFrame（只包含类别列）
+    :param out: 1维的ndarray 或 np.memmap，结果直接写入，None时新建
+    :param dtype: 计算使用的精度，np.float64 或 np.float32
+    :param block_rows: 每块的行数
+    :param n_jobs: 线程数，-1表示使用所有CPU
+    :return: out
+    '''
+    if(out is None):
+        out = np.empty(len(values),dtype=dtype)
+    run_tasks(entropy_tasks(values,out,dtype,block_rows),n_jobs)
+    return out
 
 
 '''
@@ -64,6 +146,17 @@ Entropy计算：
 日志；
     1.关于ent的计算完全采用sci的计算方式（不需要提前计算概率，sci会计算）
     这样的话，就没有必要将e_datas复制成p_datas, 
+    2.(2026.10) init_with_subgraphes 可以传入多层网络(multilayer.MultilayerNetwork)，
+    所有层共用一个节点编码，与NetworkUnity共用每层的度和流量；weighted=False时不再修改graph_dic
+    3.(2026.10) nodeinfo_from_subgraphes 改为统一编码后用bincount累加每层的流量，不再逐行遍历
+    4.(2026.10) edgeinfo_from_subgraphes 改为整数对的边编码，一次写入edge×layer的矩阵，
+    不再使用"s-t"字符串键的dict of dict 和 DataFrame(result).T
+    5.(2026.10) 增加init_with_layer_files，逐层分块读取边文件，流量累加到磁盘上(np.memmap)，
+    entropy()，modified_entropy()按行分块计算，所有层的边不需要同时读入内存
+    6.(2026.10) 增加row_entropy，entropy()和raw_entropy()按行分块在连续的ndarray上计算，
+    结果直接写入结果列；raw_entropy不再对包含0的行加0.0000001；Entropy(dtype=np.float32)可以降低精度
+    7.(2026.10) Entropy(n_jobs=...)，所有表（in，out，all，flow）的行块一起分配到线程池计算，
+    每块写入自己的行范围，结果与单线程一致
     
 
 @author: 文
@@ -79,9 +172,17 @@ class Entropy():
     NON_DIRECTED_DTS = ["all","flow"]
     DEFAULT_DT = "default"
 
-    def __init__(self):
+    def __init__(self,dtype=np.float64,n_jobs=1):
+        '''
+        :param dtype: 熵计算使用的精度，np.float64 或 np.float32（节省一半的缓冲区）
+        :param n_jobs: 线程数，所有表的所有行块一起分配到线程池，-1表示使用所有CPU
+        '''
+        self.dtype = dtype
+        self.n_jobs = n_jobs
         self.class_columns = None
         self.e_datas = {}
+        self.network = None
+        self.accumulator = None
         self._index = "Id"
         self.init_type = None
         self._is_data_processed = False
@@ -89,27 +190,110 @@ class Entropy():
     #  def transfer_edges
 
     def init_with_subgraphes(self,graph_dic,directed=True,weighted=True):
+        '''
+        graph_dic: {"attr_1": df1, ...} 或者 multilayer.MultilayerNetwork
+            传入MultilayerNetwork时使用它的directed, weighted，
+            所有层共用它的节点编码和每层的流量，和NetworkUnity中的计算共用
+        '''
+        from multilayer import MultilayerNetwork
+
+        if(not isinstance(graph_dic,MultilayerNetwork)):
+            # weighted=False时权重为1，不再修改传入的graph_dic；节点id与原来一样按str处理
+            graph_dic = MultilayerNetwork(graph_dic,attr="Weight",directed=directed,
+                                          weighted=weighted,node_type=str)
+        self.network = graph_dic
+        directed = graph_dic.directed
 
         if(directed):
             self.e_datas = dict.fromkeys(Entropy.DIRECTED_DTS)
         else:
             self.e_datas = dict.fromkeys(Entropy.NON_DIRECTED_DTS)
 
-        if(not weighted):
-            for ky in graph_dic.keys():
-                graph_dic[ky]["Weight"] = 1
-
-        time_1 = time.clock()
+        time_1 = time.time()
         self.nodeinfo_from_subgraphes(graph_dic,directed=directed)
-        print("[process node ent]，time：{:.3f}".format(time.clock() -time_1))
+        print("[process node ent]，time：{:.3f}".format(time.time() -time_1))
 
-        time_1 = time.clock()
+        time_1 = time.time()
         self.edgeinfo_from_subgraphes(graph_dic,directed=directed)
-        print("[process edge ent]，time：{:.3f}".format(time.clock() -time_1))
+        print("[process edge ent]，time：{:.3f}".format(time.time() -time_1))
         
         # 这里如果有枚举多好
         self.init_type = "subgraph_init"
 
+    def init_with_layer_files(self,layer_files,directed=True,weighted=True,chunksize=None,
+                              work_dir=None,edge_info=True,partitions=16,block_rows=None,**read_kwargs):
+        '''
+        内存放不下所有层的边时使用：逐层分块读取边文件，节点和边的流量累加到磁盘上（np.memmap），
+        e_datas中为multilayer.FlowMatrix（不是DataFrame），entropy()等按行分块计算，
+        save_result按块写入文件，见multilayer.LayerFlowAccumulator
+
+        layer_files: {"attr_1": path1, ...}，文件为csv，parquet 或 feather，包含["Source","Target","Weight"]
+        chunksize: 每块的行数
+        work_dir: 磁盘文件的目录，None时使用临时目录（cleanup()时删除）
+        edge_info: 是否计算边的信息（flow表）
+        partitions: 边的分区数，越多合并边时占用的内存越小
+        block_rows: 计算熵时每块的行数
+        read_kwargs: 读取csv的其他参数，例如sep
+
+        与init_with_subgraphes的区别：
+            flow表的行按边的hash分区排列（分区内为第一次出现的顺序），Source，Target为str
+        '''
+        from multilayer import LayerFlowAccumulator, BLOCK_ROWS
+
+        self.class_columns = list(layer_files.keys())
+        self.accumulator = LayerFlowAccumulator(self.class_columns,attr="Weight",directed=directed,
+                                                weighted=weighted,work_dir=work_dir,node_type=str,
+                                                partitions=partitions,
+                                                block_rows=BLOCK_ROWS if block_rows is None else block_rows)
+        time_1 = time.time()
+        for attr_name,path in layer_files.items():
+            self.accumulator.add_file(attr_name,path,chunksize=chunksize,**read_kwargs)
+        self.e_datas = self.accumulator.finalize(edge_info=edge_info)
+        print("[process layer files]，time：{:.3f}".format(time.time() -time_1))
+
+        self._is_data_processed = True
+        self.init_type = "layer_files_init"
+
+    def cleanup(self):
+        '''删除init_with_layer_files的临时文件'''
+        if(self.accumulator is not None):
+            self.accumulator.cleanup()
+
+    def _out_of_core(self):
+        return self.init_type == "layer_files_init"
+
+    def _block_apply(self,result_name,func):
+        '''
+        init_with_layer_files时，按行分块写入结果列，func(data, start, stop) -> 一块的结果
+        '''
+        def _write(data,result,start,stop):
+            result[start:stop] = func(data,start,stop)
+
+        tasks = []
+        for ky,data in self.e_datas.items():
+            result = data.result(result_name)
+            tasks += [partial(_write,data,result,start,stop) for start,stop in data.blocks()]
+        run_tasks(tasks,self.n_jobs)
+
+    def _row_entropy(self,result_name):
+        '''
+        所有表的行块一起计算熵，结果写入result_name列
+        每块写入自己的行范围，全部完成后按e_datas的顺序放回表中
+        '''
+        tasks = []
+        results = {}
+        for ky,data in self.e_datas.items():
+            if(self._out_of_core()):
+                tasks += entropy_tasks(data.values,data.result(result_name),self.dtype,data.block_rows)
+            else:
+                results[ky] = np.empty(len(data),dtype=self.dtype)
+                tasks += entropy_tasks(data[self.class_columns],results[ky],self.dtype)
+        run_tasks(tasks,self.n_jobs)
+
+        for ky,result in results.items():
+            self.e_datas[ky][result_name] = result
+        self._calculated[result_name] = True
+
     def init_with_infodata(self,e_data,class_columns=None):
 
         self.e_datas[Entropy.DEFAULT_DT] = e_data
@@ -120,151 +304,61 @@ class Entropy():
 
     def nodeinfo_from_subgraphes(self,graph_dic,directed=True):
         '''
-        转化子图数据到records
+        转化子图数据到节点信息表(in，out，all)
 
-        目前只是有向图
+        原来逐行遍历每个子图的边（.ix），每个节点在每个表中一个dict，
+        节点多的时候很慢（7.20s，5层3000万条边需要1小时左右）。
 
-        难题：
-            多个图中的同一个node，如何重复定位？
-        
-        1. list of dict:
-            node作为index？
-                用桶的思想？只能使用与int类型的idx，不太好
-                解决办法：用 node_to_index_mapping 来保存在表里的位置
-                
-            存在入数据和出数据中，节点不一致，可能节点只有入度
-            采用统一的index，可以保证in，out，all中数据顺序一致（最后排序不行？）
-        
-        2.2.dict of dict：
-            node最为dict的key，内层dict同上面，[idx,attr1,attr2]
-            这样的话，最终顺序不一定，需要多次判断in keys
-
-        创建方式：
-            提前创建，就不存在判断isin了，但是节点数据量多的话，就慢了，哎，真难搞
-                - dict 和 dict还不能提前知道key
-                - 存在冗余，例如这个节点没有入的流量，会设置全部为0
-            动态的话，python的list扩容机制同样拖慢时间啊
-
-        暂定： 
-            list of dict 然后内层的dict提前创建，同时采用index mapping的方式
-
-        结果验证：
-            对比了条件索引的方式：结果一致，速度快2倍
-                遍历图的方式: 7.20s
-                条件索引方式：18.9s
-            对比了network中图的weighteddegree的方式：结果一致
+        现在的做法（见MultilayerNetwork.node_table）：
+            1. 所有子图的Source，Target交替排列，转为str后统一编码（一次factorize），
+               节点的顺序与原来逐行遍历时第一次出现的顺序一致
+            2. 每层用bincount累加入，出流量，得到node×layer的矩阵，all为in + out
+            3. in，out表只保留作为过Target，Source的节点
+
+        结果与原来的表一致：列为[Id, *class_columns]，Id为str，index为节点第一次出现的顺序
+
+        graph_dic: {"attr_1": df1, ...} 或者 multilayer.MultilayerNetwork
         '''
-        
-        #  if(n_nodes is None):
-            #  node_sets = set()
-            #  for graph_i in graph_dic.values():
-                #  node_sets = node_sets.union(graph_i["Source"].unique())
-                #  node_sets = node_sets.union(graph_i["Target"].unique())
-            #  n_nodes = len(node_sets) 
+        from multilayer import MultilayerNetwork
+
+        if(not isinstance(graph_dic,MultilayerNetwork)):
+            graph_dic = MultilayerNetwork(graph_dic,attr="Weight",directed=directed,node_type=str)
 
         if(self.class_columns is None):
-            self.class_columns = list(graph_dic.keys())
-
-        ret_cols = [self._index] + self.class_columns
-
-        results = {ky_:[] for ky_ in self.e_datas.keys()}
-        if("flow" in results.keys()):
-            results.pop("flow") # 边信息单独计算，以免后面覆盖边的结果
-
-        index_flag = 0
-        node_index_mapping = dict()
-        for attr_name,edges in graph_dic.items():
-            ''' 遍历子图 '''
-            for idx_ in edges.index:
-                node_id_s = str(edges.ix[idx_,"Source"])
-                node_id_t = str(edges.ix[idx_,"Target"])
-                flow = edges.ix[idx_,"Weight"]
-
-                # 处理两个节点
-                for is_target,node in enumerate([node_id_s,node_id_t]):
-                    if(node not in node_index_mapping.keys()):
-                        
-                        # 初始化该节点的信息表
-                        for key_ in results.keys():
-                            ret_data_dic = {ky_:0 for ky_ in ret_cols} 
-                            ret_data_dic[self._index] = "None"
-                            results[key_].append(ret_data_dic)
-
-                        node_index = index_flag          
-                        node_index_mapping[node] = node_index
-                        index_flag += 1
-                    else:
-                        node_index  = node_index_mapping.get(node)
-                
-                    # 处理流量
-                    if(directed):
-                        if(is_target):
-                            # 在一个图中会多次多为一个target和source
-                            # 在多个图中同样
-                            results["in"][node_index][self._index] = str(node)
-                            results["in"][node_index][attr_name] += flow
-                        else:
-                            results["out"][node_index][self._index] = str(node)
-                            results["out"][node_index][attr_name] += flow
-
-                    results["all"][node_index][self._index] = str(node)
-                    results["all"][node_index][attr_name] += flow 
-           
-        for data_type in results.keys():
-            each_data = pd.DataFrame(results[data_type])
-            each_data = each_data[each_data[self._index] != "None"]
-            self.e_datas[data_type] = each_data
-
-            #  save_file_name = "result_{}.csv"
-            #  save_path = save_file_name.format(data_type)
-            #  each_data.to_csv(save_path,index=False)
+            self.class_columns = graph_dic.layer_names
+
+        data_types = ["in","out","all"] if directed else ["all"]
+        for data_type in data_types:
+            self.e_datas[data_type] = graph_dic.node_table(data_type,columns=self.class_columns)
 
-    
     def edgeinfo_from_subgraphes(self,graph_dic,directed=True):
         '''
-        目前来看，边太多太慢了，可能是dict的索引导致
-            时间：28w条边的全网络，需要20s
+        转化子图数据到边信息表(flow)
 
-        result采用的结构：
-            dict of dict，外层用边（source-target）作为键
-                          内层包含列信息(Id,Attr_1,Attr_2,...)
-            
+        原来用"source-target"字符串作为键的dict of dict，再pd.DataFrame(result).T，
+        边多的时候很慢（28w条边20s），转置也很占内存。
+
+        现在的做法（见MultilayerNetwork.edge_flows）：
+            边用统一编码后的整数对(source, target)表示，无向图用(min, max)，
+            所有层拼接后一次factorize，每层的权重一次写入edge×layer的矩阵，与边数线性相关
+
+        结果与原来的表一致：
+            Id为"source-target"（无向图为第一次出现的方向），也是index；
+            Source，Target为第一次出现时的原始值；同一层重复的边取最后一次的权重；
+            该层没有这条边时为nan；列为[Id, Source, Target, *class_columns]
+
+        graph_dic: {"attr_1": df1, ...} 或者 multilayer.MultilayerNetwork
         '''
+        from multilayer import MultilayerNetwork
+
+        if(not isinstance(graph_dic,MultilayerNetwork)):
+            graph_dic = MultilayerNetwork(graph_dic,attr="Weight",directed=directed,node_type=str)
 
         if(self.class_columns is None):
-            self.class_columns = list(graph_dic.keys())
-
-        source_name = "Source"
-        target_name = "Target"
-
-        ret_cols = [self._index] + self.class_columns
-        result = {}
-        for ty,data in graph_dic.items():
-            for idx in data.index:
-                s_ = data.ix[idx,source_name]
-                t_ = data.ix[idx,target_name]
-                
-                st = "{}-{}".format(str(s_),str(t_))
-                st_key = st
-
-                if(directed):
-                    if(st_key not in result.keys()):
-                        result[st_key] = {self._index:st_key,source_name:s_,target_name:t_}
-                else:
-                    if(st_key not in result.keys()):
-                        reverse_st = "{}-{}".format(str(t_),str(s_))
-                        if(reverse_st in result.keys()):
-                            #如果反方向的在
-                            st_key = reverse_st
-                        else:
-                            #都没有，创建st作为键
-                            result[st_key] = {self._index:st_key,source_name:s_,target_name:t_}
-                # 正常来说一个网络中，边是唯一的，无向图也只有一条记录,所以下面只要=就行了
-                result[st_key][ty] = data.ix[idx,"Weight"]
-        
-        df = pd.DataFrame(result)  #这里估计耗时多，内层用
-        df = df.T
-        self.e_datas["flow"] = df
+            self.class_columns = graph_dic.layer_names
+
+        # Source，Target保留原始的值（Id中为str），见MultilayerNetwork.edge_table
+        self.e_datas["flow"] = graph_dic.edge_table(columns=self.class_columns,id_type=None)
 
 
     @staticmethod
@@ -303,6 +397,9 @@ class Entropy():
 
     def raw_entropy(self):
         '''
+        手写的公式 E = - P(x)*ln(P(x))，用于对比scipy
+        原来对包含0的行都加了0.0000001，现在由row_entropy直接跳过0（0*ln(0)=0）
+
         ## params
             @datas: DataFrame of [Id, attr_name1,attr_name2..]
             @class_columns: list, 类别的名字列表，表示所有类别
@@ -311,19 +408,7 @@ class Entropy():
         if(not self._is_data_processed):
             self.process_data()
 
-        def _ent(prob_df):
-            '''这里在计算的时候，把包含0的行都增加了0.00000001，是考虑所有类别，结果差不大'''
-            index_not_all = ~prob_df.all(axis=1)
-            prob_df.ix[index_not_all] = prob_df.ix[index_not_all] + 0.0000001
-            #下面是计算公式
-            prob_df = prob_df * np.log(prob_df)
-            prob_df = -1.0 * np.sum(prob_df,axis=1)
-            return prob_df
-
-        for ky,data in self.e_datas.items():
-            self.e_datas[ky]["RawEnt"] = _ent(self.__prob_cal(data[self.class_columns]))
-
-        self._calculated["RawEnt"] = True
+        self._row_entropy("RawEnt")
             #  print("max and min: ",self.e_datas[ky]["RawEnt"].max(),self.e_datas[ky]["RawEnt"].min())
 
     def modified_entropy(self):
@@ -335,6 +420,11 @@ class Entropy():
         if(not self._calculated["Ent"]):
             self.entropy()
 
+        if(self._out_of_core()):
+            self._block_apply("ModEnt",lambda data,start,stop: data.result("Ent")[start:stop] / COEF)
+            self._calculated["ModEnt"] = True
+            return
+
         for ky in self.e_datas.keys():
             self.e_datas[ky]["ModEnt"] = self.e_datas[ky]["Ent"] / COEF
         
@@ -342,21 +432,12 @@ class Entropy():
 
 
     def entropy(self):
-        ''' 使用 scipy中熵的计算公式'''
+        ''' 与scipy中熵的计算公式一致，使用row_entropy按行分块计算'''
 
         if(not self._is_data_processed):
             self.process_data()
 
-        # 采用universal function的方式计算，注意看sci的源码，需要转置
-        for ky in self.e_datas.keys():
-            #  ret_ent = []
-            #  for i in self.e_datas[ky].index:
-                #  one_line_data = self.e_datas[ky].ix[i,self.class_columns].values.tolist()[:]
-                #  ret_ent.append(_sci_entropy(one_line_data))
-
-            self.e_datas[ky]["Ent"] = _sci_entropy(self.e_datas[ky][self.class_columns].T)
-
-        self._calculated["Ent"] = True
+        self._row_entropy("Ent")
             #  print("max and min: ",self.e_datas[ky]["RawEnt"].max(),self.e_datas[ky]["RawEnt"].min())
 
     def save_result(self,save_dir=None,fname_header=None,keep_infodata=True):
@@ -373,8 +454,6 @@ class Entropy():
             if(keep_infodata):
                 e_col = e_col + self.class_columns
 
-            save_col = e_col + list(set(data.columns.values).difference(e_col))
-
             save_path = os.path.join(save_dir,save_file_name.format(ky))
             # DEFAULT_DT文件名修改hash
             if(ky == Entropy.DEFAULT_DT):
@@ -385,7 +464,17 @@ class Entropy():
                     #  save_path = save_path.replace(ky,"{}_{}".format(ky,str(file_no)))
                     pass
 
+            if(self._out_of_core()):
+                # FlowMatrix按块写入
+                for start,stop in data.blocks():
+                    block = data.frame(start,stop,keep_infodata=keep_infodata)
+                    block = block[e_col + [col for col in block.columns if col not in e_col]]
+                    block.to_csv(save_path,index=False,mode="w" if start == 0 else "a",header=start == 0)
+                print("[saved]:",save_path)
+                continue
+
             try:
+                save_col = e_col + list(set(data.columns.values).difference(e_col))
                 data = data[save_col]
                 data.to_csv(save_path,index=False)
                 print("[saved]:",save_path)
@@ -422,7 +511,7 @@ def test_subgraph():
     trans = ["Walk","Bus","Bike","Vehicle","Railway"]
     graph_dic = dict.fromkeys(trans)   # 总共5层子网络
     for each in graph_dic.keys():
-        data_each = pd.DataFrame([[1,2],[2,3]], columns=["Source","Target"])
+        data_each = pd.DataFrame([[1,2,1],[2,3,1]], columns=["Source","Target","Weight"])
         graph_dic[each] = data_each
 
     ent = Entropy() #初始化一个实例
@@ -460,14 +549,14 @@ def test_infodata():
 if __name__ == "__main__":
     import time
     
-    time1 = time.clock()
+    time1 = time.time()
 
     test_subgraph()
 
     test_infodata()
 
 
-    print("runtime, {:.3f}".format(time.clock() - time1))
+    print("runtime, {:.3f}".format(time.time() - time1))
 
 
 
@@ -0,0 +1,1033 @@
+#-*- coding:utf-8 -*-
+
+'''
+目的：
+    基于scipy.sparse的网络指标计算，作为NetworkUnity.calculate_node_features的可选后端，
+    适用于节点数在百万以上，networkx中纯python的实现太慢的情况
+
+方法：
+    * 从边表创建CSR邻接矩阵 - csr_adjacency
+    * 节点的度（入度，出度，加权） - node_degrees
+    * 特征向量中心度 - eigenvector_centrality
+    * 最短路径的抽样数量 - betweenness_sample_size
+    * 最短路径累加（Brandes） - shortest_path_pass
+    * 介数中心度和接近中心度（精确或抽样） - shortest_path_centrality
+    * 平均最短路径长度（精确或抽样） - average_shortest_path_length
+    * 节点特征表（sparse后端） - sparse_node_features
+    * 指标注册表 - METRICS, register, list_metrics
+    * 按指标计算节点特征 - node_features
+    * 按指标计算网络特征 - graph_features
+    * 节点特征表的列顺序 - order_node_features
+
+数据：
+    table, EdgeTable(见edgetable.py)
+    adjacency, scipy.sparse.csr_matrix，行为起点，列为终点，
+        无向图为对称矩阵，自环在对角线上记为2倍的权重（与networkx的度一致）
+
+抽样（近似）计算：
+    介数中心度采用Brandes的pivot抽样（Brandes & Pich 2007），随机抽取k个源节点，
+    累加依赖值后乘以n/k；接近中心度用同样的k次BFS得到的距离来估计（Eppstein & Wang 2004）。
+    同时给出每个节点估计值的标准误（StdErr），95%置信区间约为 ±1.96*StdErr。
+    介数的StdErr把节点自身的样本方差与全图的离散指数合并估计（依赖值重尾，单独用样本方差会低估）。
+    k可以直接给定（sample_size），也可以由误差epsilon计算（betweenness_sample_size）。
+    k >= n 时为精确计算，StdErr为0。
+
+并行计算：
+    每个源节点的BFS/Dijkstra相互独立，n_jobs>1时把源节点分块分配到进程池，
+    CSR数组通过共享内存传给子进程（只读），各块的结果按块的顺序累加，与串行结果完全一致。
+    分块只由源节点数量决定（与n_jobs无关），介数和接近中心度在所有后端都用同一个CSR上的计算，
+    所以n_jobs不影响结果。
+
+指标注册表：
+    每个指标（节点指标，网络指标）注册时声明计算复杂度（cost）和依赖（requires），
+    依赖可以是其他指标或中间结果（networkx的图，EdgeTable，最短路径等）。
+    一次计算中（MetricContext）每个指标和中间结果只算一次，例如介数和接近中心度（精确或抽样，
+    networkx或sparse后端）共用同一次CSR上的最短路径计算（paths），AveDegree直接使用Degree的结果。
+    依赖与后端有关时按后端声明（例如networkx后端用networkx的图，sparse后端用EdgeTable），
+    list_metrics()的UsedBy列给出共用每个中间结果的指标。调用时用 metrics=[...] 选择需要的指标。
+
+备注：
+    * 重复的边在邻接矩阵中权重会累加，networkx中后面的边会覆盖前面的边
+    * 结果与networkx的节点顺序一致（EdgeTable.from_networkx）
+
+'''
+
+import os
+import heapq
+import itertools
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.sparse import csgraph
+from scipy.sparse import linalg as sp_linalg
+
+# calculate_node_features 输出的列顺序
+NODE_FEATURES = ['Degree', 'InDegree', 'OutDegree',
+                 'DegreeCentrality', 'BetweennessCentrality',
+                 'EigenvectorCentrality', 'ClosenessCentrality',
+                 'WeightedDegree', 'WeightedInDegree', 'WeightedOutDegree',
+                 'WeightedBetweennessCentrality', 'WeightedEigenvectorCentrality',
+                 'BetweennessCentralityStdErr', 'ClosenessCentralityStdErr',
+                 'WeightedBetweennessCentralityStdErr',
+                 'Id']
+
+
+def order_node_features(node_features):
+    '''按NODE_FEATURES排列节点特征表的列，其他的列放在后面'''
+    columns = [col for col in NODE_FEATURES if col in node_features.columns]
+    columns += [col for col in node_features.columns if col not in columns]
+    return node_features[columns]
+
+
+def csr_adjacency(table, weight=None):
+    '''
+    :param table: EdgeTable
+    :param weight: None 或 属性名，None时所有边的权重为1
+    :return: scipy.sparse.csr_matrix, n*n
+    '''
+    num_nodes = table.number_of_nodes()
+    if weight is None:
+        data = np.ones(len(table), dtype=np.float64)
+    else:
+        data = np.asarray(table.attrs[weight], dtype=np.float64)
+
+    row, col = table.source, table.target
+    if not table.directed:
+        row, col = np.concatenate([row, col]), np.concatenate([col, row])
+        data = np.concatenate([data, data])
+
+    adjacency = sp.csr_matrix((data, (row, col)), shape=(num_nodes, num_nodes))
+    adjacency.sum_duplicates()
+    return adjacency
+
+
+def node_degrees(table, weight=None):
+    '''
+    节点的度，有向图包括入度和出度，给定weight时同时计算加权的度
+    :param table: EdgeTable
+    :param weight: None 或 属性名
+    :return: dict, 指标名 -> ndarray，指标名与calculate_node_features一致
+    '''
+    structure = csr_adjacency(table)
+    out_degree = np.diff(structure.indptr)
+    in_degree = np.bincount(structure.indices, minlength=table.number_of_nodes())
+
+    features = {}
+    if table.directed:
+        features['Degree'] = out_degree + in_degree
+        features['InDegree'] = in_degree
+        features['OutDegree'] = out_degree
+    else:
+        # 自环在无向图中记2次
+        features['Degree'] = out_degree + (structure.diagonal() != 0)
+
+    if weight is not None:
+        adjacency = csr_adjacency(table, weight=weight)
+        weighted_out = np.asarray(adjacency.sum(axis=1)).ravel()
+        weighted_in = np.asarray(adjacency.sum(axis=0)).ravel()
+        if table.directed:
+            features['WeightedDegree'] = weighted_out + weighted_in
+            features['WeightedInDegree'] = weighted_in
+            features['WeightedOutDegree'] = weighted_out
+        else:
+            features['WeightedDegree'] = weighted_out
+    return features
+
+
+def eigenvector_centrality(table, weight=None):
+    '''
+    特征向量中心度，与 nx.eigenvector_centrality_numpy 的计算方式一致：
+    邻接矩阵转置（有向图为入边）最大实特征值对应的特征向量，按L2范数归一化
+
+    :param table: EdgeTable
+    :param weight: None 或 属性名
+    :return: ndarray
+    '''
+    adjacency = csr_adjacency(table, weight=weight)
+    if not table.directed:
+        # 与networkx的邻接矩阵一致，自环只记一次
+        adjacency = adjacency - sp.diags(adjacency.diagonal() / 2.0)
+    matrix = adjacency.T.astype(np.float64)
+
+    if matrix.shape[0] < 3:
+        values, vectors = np.linalg.eig(matrix.toarray())
+        largest = vectors[:, np.argmax(values.real)].real
+    else:
+        _, vectors = sp_linalg.eigs(matrix, k=1, which='LR', maxiter=50 * matrix.shape[0])
+        largest = vectors.flatten().real
+    norm = np.sign(largest.sum()) * np.linalg.norm(largest)
+    return largest / norm
+
+
+def betweenness_sample_size(num_nodes, epsilon, delta=0.1):
+    '''
+    抽样的源节点数量，Hoeffding不等式 + 对n个节点的union bound：
+    以至少 1-delta 的概率，所有节点的（归一化）介数的误差都小于epsilon
+    :param num_nodes: 节点数
+    :param epsilon: 允许的误差
+    :param delta: 失败的概率
+    :return: int, 不超过节点数
+    '''
+    size = np.ceil(np.log(2.0 * num_nodes / delta) / (2.0 * epsilon ** 2))
+    return int(min(size, num_nodes))
+
+
+def _gather_neighbors(indptr, indices, frontier):
+    '''CSR中一组节点的所有出边，返回(起点, 终点)'''
+    starts = indptr[frontier]
+    counts = indptr[frontier + 1] - starts
+    total = counts.sum()
+    offsets = np.arange(total) + np.repeat(starts - np.cumsum(counts) + counts, counts)
+    return np.repeat(frontier, counts), indices[offsets]
+
+
+def _bfs_dependency(indptr, indices, source, dist, sigma, delta):
+    '''
+    无权图的单源Brandes，按层向量化的BFS：
+    正向得到距离dist和最短路径数sigma，反向逐层累加依赖delta
+    dist, sigma, delta 为复用的数组（未访问的节点为-1，0，0）
+    :return: 访问到的节点（包括source）
+    '''
+    dist[source] = 0
+    sigma[source] = 1.0
+    frontier = np.array([source], dtype=indices.dtype)
+    visited = [frontier]
+    levels = []
+    depth = 0
+    while True:
+        parents, children = _gather_neighbors(indptr, indices, frontier)
+        new_nodes = np.unique(children[dist[children] < 0])
+        if len(new_nodes) < 1:
+            break
+        dist[new_nodes] = depth + 1
+        on_path = dist[children] == depth + 1
+        parents, children = parents[on_path], children[on_path]
+        np.add.at(sigma, children, sigma[parents])
+        levels.append((parents, children))
+        visited.append(new_nodes)
+        frontier = new_nodes
+        depth += 1
+
+    for parents, children in reversed(levels):
+        np.add.at(delta, parents, sigma[parents] / sigma[children] * (1.0 + delta[children]))
+    return np.concatenate(visited)
+
+
+def _dijkstra_dependency(indptr, indices, data, source, dist, sigma, delta):
+    '''
+    加权图的单源Brandes（Dijkstra），与networkx的实现一致，
+    indptr, indices, data 为list，循环中使用dict（python中逐个访问比ndarray快），
+    最后把访问到的节点的结果写回dist, sigma, delta
+    :return: 访问到的节点（包括source）
+    '''
+    order = []
+    preds = {}
+    done = {}
+    seen = {source: 0.0}
+    paths = {source: 1.0}
+    counter = itertools.count()
+    queue = [(0.0, next(counter), source, source)]
+    while queue:
+        dist_v, _, pred, v = heapq.heappop(queue)
+        if v in done:
+            continue
+        if v != source:
+            paths[v] += paths[pred]
+        order.append(v)
+        done[v] = dist_v
+        for i in range(indptr[v], indptr[v + 1]):
+            w = indices[i]
+            dist_w = dist_v + data[i]
+            if w not in done and (w not in seen or dist_w < seen[w]):
+                seen[w] = dist_w
+                heapq.heappush(queue, (dist_w, next(counter), v, w))
+                paths[w] = 0.0
+                preds[w] = [v]
+            elif dist_w == seen.get(w):
+                paths[w] += paths[v]
+                preds[w].append(v)
+
+    dependency = dict.fromkeys(order, 0.0)
+    for w in reversed(order):
+        coeff = (1.0 + dependency[w]) / paths[w]
+        for v in preds.get(w, []):
+            dependency[v] += paths[v] * coeff
+
+    visited = np.asarray(order, dtype=np.int64)
+    dist[visited] = [done[v] for v in order]
+    sigma[visited] = [paths[v] for v in order]
+    delta[visited] = [dependency[v] for v in order]
+    return visited
+
+
+# 源节点分块：块的大小只由源节点数量决定，与进程数无关，所以并行与串行的累加顺序相同，结果完全一致；
+# 分成较多的小块，小图也能分配到多个进程，结果逐块累加，块多不增加内存
+SOURCE_CHUNK = 8
+MAX_CHUNKS = 256
+
+# 子进程中共享的CSR数组
+_WORKER = {}
+
+
+def _source_chunks(sources):
+    size = max(SOURCE_CHUNK, int(np.ceil(len(sources) / float(MAX_CHUNKS))))
+    return [sources[i:i + size] for i in range(0, len(sources), size)]
+
+
+def _prepare_arrays(indptr, indices, data, weighted):
+    '''Dijkstra在python中逐个访问，用list更快'''
+    if weighted:
+        return indptr.tolist(), indices.tolist(), data.tolist()
+    return indptr, indices
+
+
+def _pass_chunk(arrays, num_nodes, sources, weighted):
+    '''一块源节点的最短路径累加，见shortest_path_pass'''
+    dist = np.full(num_nodes, -1.0)
+    sigma = np.zeros(num_nodes)
+    delta = np.zeros(num_nodes)
+    result = {name: np.zeros(num_nodes) for name in
+              ['betweenness', 'betweenness_sq', 'dist_sum', 'dist_sq', 'reach']}
+
+    for source in sources:
+        if weighted:
+            visited = _dijkstra_dependency(*arrays, source=int(source),
+                                           dist=dist, sigma=sigma, delta=delta)
+        else:
+            visited = _bfs_dependency(arrays[0], arrays[1], source, dist, sigma, delta)
+        delta[source] = 0.0
+        result['betweenness'][visited] += delta[visited]
+        result['betweenness_sq'][visited] += delta[visited] ** 2
+        result['dist_sum'][visited] += dist[visited]
+        result['dist_sq'][visited] += dist[visited] ** 2
+        result['reach'][visited] += 1
+
+        dist[visited] = -1.0
+        sigma[visited] = 0.0
+        delta[visited] = 0.0
+    return result
+
+
+def _init_worker(blocks, num_nodes, weighted):
+    '''子进程初始化：连接共享内存中的CSR数组（只读），不复制'''
+    from multiprocessing import shared_memory
+
+    handles, arrays = [], []
+    for name, shape, dtype in blocks:
+        handle = shared_memory.SharedMemory(name=name)
+        array = np.ndarray(shape, dtype=dtype, buffer=handle.buf)
+        array.flags.writeable = False
+        handles.append(handle)
+        arrays.append(array)
+    _WORKER['handles'] = handles
+    _WORKER['arrays'] = _prepare_arrays(*arrays, weighted=weighted)
+    _WORKER['num_nodes'] = num_nodes
+    _WORKER['weighted'] = weighted
+
+
+def _worker_chunk(sources):
+    return _pass_chunk(_WORKER['arrays'], _WORKER['num_nodes'], sources, _WORKER['weighted'])
+
+
+def _parallel_chunks(adjacency, chunks, weighted, n_jobs):
+    '''
+    多进程计算各块，CSR数组放在共享内存中，每个子进程只连接一次，不随任务pickle
+    :return: generator，按块的顺序逐个返回结果（imap），不保存所有块的结果
+    '''
+    from multiprocessing import Pool, shared_memory
+
+    handles, blocks = [], []
+    try:
+        for array in (adjacency.indptr, adjacency.indices, adjacency.data):
+            handle = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=handle.buf)[:] = array
+            handles.append(handle)
+            blocks.append((handle.name, array.shape, array.dtype.str))
+
+        with Pool(processes=min(n_jobs, len(chunks)), initializer=_init_worker,
+                  initargs=(blocks, adjacency.shape[0], weighted)) as pool:
+            for partial in pool.imap(_worker_chunk, chunks, chunksize=1):
+                yield partial
+    finally:
+        for handle in handles:
+            handle.close()
+            handle.unlink()
+
+
+def shortest_path_pass(adjacency, sources, weighted=False, n_jobs=1):
+    '''
+    从每个源节点计算一次最短路径（BFS或Dijkstra），同时累加介数和接近中心度需要的量
+
+    源节点分块计算后按块的顺序累加（每块的结果到达后立即累加），n_jobs>1时各块分配到进程池中，
+    CSR数组放在共享内存里（只读），结果与串行计算完全一致
+
+    :param adjacency: csr_matrix
+    :param sources: 源节点编码
+    :param weighted: 是否使用边的权重（Dijkstra）
+    :param n_jobs: 进程数，-1表示使用所有CPU
+    :return: dict of ndarray，
+        betweenness, betweenness_sq: 依赖值的和与平方和（不包括源节点自己）
+        dist_sum, dist_sq, reach: 源节点到该节点的距离之和，平方和，能到达的源节点数量（包括自己）
+    '''
+    num_nodes = adjacency.shape[0]
+    chunks = _source_chunks(np.asarray(sources))
+    if n_jobs is not None and n_jobs < 0:
+        n_jobs = os.cpu_count() or 1
+
+    if n_jobs is None or n_jobs <= 1 or len(chunks) < 2:
+        arrays = _prepare_arrays(adjacency.indptr, adjacency.indices, adjacency.data, weighted)
+        partials = (_pass_chunk(arrays, num_nodes, chunk, weighted) for chunk in chunks)
+    else:
+        partials = _parallel_chunks(adjacency, chunks, weighted, n_jobs)
+
+    result = {name: np.zeros(num_nodes) for name in
+              ['betweenness', 'betweenness_sq', 'dist_sum', 'dist_sq', 'reach']}
+    for partial in partials:
+        for name, values in partial.items():
+            result[name] += values
+    return result
+
+
+def _sample_sources(num_nodes, sample_size=None, epsilon=None, seed=None):
+    '''抽样的源节点，不抽样时返回全部节点'''
+    if sample_size is None and epsilon is not None:
+        sample_size = betweenness_sample_size(num_nodes, epsilon)
+    if sample_size is None or sample_size >= num_nodes:
+        return np.arange(num_nodes)
+    rng = np.random.RandomState(seed)
+    return np.sort(rng.choice(num_nodes, size=int(sample_size), replace=False))
+
+
+def _centrality_from_pass(result, num_nodes, num_sources):
+    '''
+    由shortest_path_pass的结果计算介数和接近中心度（与networkx的归一化一致）及其标准误
+    '''
+    n, k = float(num_nodes), float(num_sources)
+    fpc = np.sqrt(max(0.0, 1.0 - k / n))  # 有限总体校正，精确计算时为0
+
+    # 介数：n/k * 抽样依赖值的和，按 1/((n-1)(n-2)) 归一化
+    scale = 1.0 / ((n - 1) * (n - 2)) if num_nodes > 2 else 1.0
+    mean = result['betweenness'] / k
+    var = np.maximum(result['betweenness_sq'] - k * mean ** 2, 0.0) / max(k - 1.0, 1.0)
+    # 单个节点的依赖值是重尾的（主要来自少数源节点），k次抽样常常抽不到这些源节点，
+    # 样本方差会明显偏小；因此与全图的离散指数 D = sum(var)/sum(mean)（方差正比于均值的模型）
+    # 给出的方差各取一半
+    total = mean.sum()
+    dispersion = var.sum() / total if total > 0 else 0.0
+    var = (var + dispersion * mean) / 2
+    betweenness = n * mean * scale
+    betweenness_stderr = n * np.sqrt(var / k) * fpc * scale
+
+    # 接近中心度：(r-1)/D * (r-1)/(n-1)，r为能到达该节点的节点数（包括自己），D为距离之和
+    reach = result['reach'] * n / k
+    dist_sum = result['dist_sum'] * n / k
+    with np.errstate(divide='ignore', invalid='ignore'):
+        closeness = np.where(dist_sum > 0,
+                             (reach - 1) ** 2 / (dist_sum * max(n - 1, 1)), 0.0)
+        dist_mean = result['dist_sum'] / result['reach']
+        dist_var = np.maximum(result['dist_sq'] / result['reach'] - dist_mean ** 2, 0.0)
+        dist_stderr = np.sqrt(dist_var / result['reach']) * fpc
+        closeness_stderr = np.where(dist_mean > 0, closeness * dist_stderr / dist_mean, 0.0)
+    return betweenness, betweenness_stderr, closeness, closeness_stderr
+
+
+def shortest_path_centrality(table, weight=None, sample_size=None, epsilon=None, seed=None,
+                             n_jobs=1):
+    '''
+    介数中心度和接近中心度，精确计算或抽样近似
+
+    :param table: EdgeTable
+    :param weight: None 或 属性名，给定时用Dijkstra计算加权的介数（接近中心度始终不加权，与networkx一致）
+    :param sample_size: int, 抽样的源节点数量
+    :param epsilon: float, 允许的误差，给定时由betweenness_sample_size计算抽样数量
+    :param seed: 随机种子
+    :param n_jobs: 进程数，见shortest_path_pass
+    :return: dict,
+        'Betweenness', 'BetweennessStdErr', 'Closeness', 'ClosenessStdErr': ndarray,
+        'Samples': 源节点的数量
+    '''
+    num_nodes = table.number_of_nodes()
+    sources = _sample_sources(num_nodes, sample_size=sample_size, epsilon=epsilon, seed=seed)
+    adjacency = csr_adjacency(table, weight=weight)
+    result = shortest_path_pass(adjacency, sources, weighted=weight is not None, n_jobs=n_jobs)
+
+    betweenness, betweenness_stderr, closeness, closeness_stderr = \
+        _centrality_from_pass(result, num_nodes, len(sources))
+    return {'Betweenness': betweenness,
+            'BetweennessStdErr': betweenness_stderr,
+            'Closeness': closeness,
+            'ClosenessStdErr': closeness_stderr,
+            'Samples': len(sources)}
+
+
+def average_shortest_path_length(table, sample_size=None, seed=None, block_bytes=2 ** 27):
+    '''
+    平均最短路径长度（不加权），与 nx.average_shortest_path_length 一致：所有节点对距离的平均值
+
+    抽样时随机抽取sample_size个源节点，每个源节点BFS得到到其他节点的平均距离，
+    再对源节点求平均；不抽样（或sample_size >= n）时为精确计算。
+    BFS采用scipy.sparse.csgraph（C实现），按块计算，每块的距离矩阵不超过block_bytes。
+    不连通的图只统计能到达的节点对。
+
+    :param table: EdgeTable
+    :param sample_size: int, 抽样的源节点数量，None为精确计算
+    :param seed: 随机种子
+    :param block_bytes: 每块距离矩阵的大小（bytes）
+    :return: dict, 'AveShortestPathLength', 'StdErr'（标准误）, 'Samples'
+    '''
+    num_nodes = table.number_of_nodes()
+    sources = _sample_sources(num_nodes, sample_size=sample_size, seed=seed)
+    adjacency = csr_adjacency(table)
+    block_size = max(1, int(block_bytes // (8 * max(num_nodes, 1))))
+
+    source_means = []
+    for i in range(0, len(sources), block_size):
+        block = sources[i:i + block_size]
+        dist = csgraph.shortest_path(adjacency, directed=table.directed,
+                                     unweighted=True, indices=block)
+        reachable = np.isfinite(dist) & (dist > 0)
+        counts = reachable.sum(axis=1)
+        sums = np.where(reachable, dist, 0).sum(axis=1)
+        source_means.append(np.where(counts > 0, sums / np.maximum(counts, 1), 0.0))
+    source_means = np.concatenate(source_means) if source_means else np.zeros(0)
+
+    k = len(sources)
+    fpc = np.sqrt(max(0.0, 1.0 - float(k) / max(num_nodes, 1)))
+    stderr = np.std(source_means, ddof=1) / np.sqrt(k) * fpc if k > 1 else 0.0
+    return {'AveShortestPathLength': float(np.mean(source_means)) if k > 0 else 0.0,
+            'StdErr': float(stderr),
+            'Samples': k}
+
+
+def sparse_node_features(table, weight=None, centrality=False,
+                         sample_size=None, epsilon=None, seed=None, n_jobs=1):
+    '''
+    节点特征表（sparse后端），列与calculate_node_features一致，见node_features
+    :param table: EdgeTable
+    :return: DataFrame, index 和 Id 为节点id，抽样时增加 *StdErr 列
+    '''
+    return node_features(table, weight=weight, centrality=centrality, backend='sparse',
+                         sample_size=sample_size, epsilon=epsilon, seed=seed, n_jobs=n_jobs)
+
+
+# ------------------- 指标注册表 --------------------------
+
+# 计算复杂度的类别
+COSTS = {'constant': 'O(1)',
+         'linear': 'O(V+E)',
+         'iterative': 'O(k(V+E))，迭代求解，例如特征向量',
+         'all_pairs': 'O(VE)，每个源节点一次最短路径，可抽样和多进程'}
+
+
+BACKENDS = ('networkx', 'sparse')
+
+
+class Metric():
+    '''
+    注册的指标，或者多个指标共用的中间结果
+
+    name: 指标名，即输出的列名（或中间结果的名字）
+    func: func(context)，节点指标返回按context.nodes排列的ndarray，网络指标返回数值
+    scope: 'node', 'graph', 'intermediate'
+    cost: 计算复杂度的类别，见COSTS
+    requires: 依赖的指标或中间结果，在同一次计算中只计算一次，被多个指标共用，
+              依赖与后端有关时为dict（后端 -> 依赖），例如 {'networkx': ('graph',), 'sparse': ('table',)}
+    directed: None表示有向无向都可以，True只用于有向图，False只用于无向图
+    weighted: 是否需要边的权重
+    '''
+
+    def __init__(self, name, func, scope='node', cost='linear', requires=(),
+                 directed=None, weighted=False, description=''):
+        self.name = name
+        self.func = func
+        self.scope = scope
+        self.cost = cost
+        if isinstance(requires, dict):
+            self.requires = {backend: tuple(names) for backend, names in requires.items()}
+        else:
+            self.requires = {backend: tuple(requires) for backend in BACKENDS}
+        self.directed = directed
+        self.weighted = weighted
+        self.description = description
+
+    def requirements(self, backend=None):
+        '''
+        :param backend: None时返回所有后端的依赖（去重，保持顺序）
+        :return: tuple, 依赖的指标或中间结果
+        '''
+        if backend is not None:
+            return self.requires.get(backend, ())
+        names = []
+        for backend_names in self.requires.values():
+            names += [name for name in backend_names if name not in names]
+        return tuple(names)
+
+    def available(self, directed, weighted):
+        if self.directed is not None and self.directed != directed:
+            return False
+        return weighted or not self.weighted
+
+
+METRICS = {}
+
+
+def register(name, scope='node', cost='linear', requires=(), directed=None,
+             weighted=False, description=''):
+    '''注册指标的装饰器'''
+    def _register(func):
+        METRICS[name] = Metric(name, func, scope=scope, cost=cost, requires=requires,
+                               directed=directed, weighted=weighted, description=description)
+        return func
+    return _register
+
+
+def list_metrics(scope=None, backend=None):
+    '''
+    :param scope: None, 'node', 'graph', 'intermediate'
+    :param backend: None（所有后端的依赖）, 'networkx', 'sparse'
+    :return: DataFrame, 注册的指标及其复杂度和依赖，
+             UsedBy为直接依赖它的指标（同一次计算中共用它的结果）
+    '''
+    used_by = {}
+    for metric in METRICS.values():
+        for required in metric.requirements(backend):
+            used_by.setdefault(required, []).append(metric.name)
+
+    records = []
+    for metric in METRICS.values():
+        if scope is None or metric.scope == scope:
+            records.append({'Name': metric.name, 'Scope': metric.scope, 'Cost': metric.cost,
+                            'Requires': ','.join(metric.requirements(backend)),
+                            'UsedBy': ','.join(used_by.get(metric.name, [])),
+                            'Directed': metric.directed, 'Weighted': metric.weighted,
+                            'Description': metric.description})
+    return pd.DataFrame(records, columns=['Name', 'Scope', 'Cost', 'Requires', 'UsedBy',
+                                          'Directed', 'Weighted', 'Description'])
+
+
+class MetricContext():
+    '''
+    一次指标计算的上下文，保存输入的图和参数，
+    指标和中间结果（networkx的图，EdgeTable，最短路径等）计算一次后缓存，被其他指标共用
+    '''
+
+    def __init__(self, graph, weight=None, directed=True, backend='networkx',
+                 sample_size=None, epsilon=None, seed=None, n_jobs=1, path_samples=None):
+        '''
+        :param graph: networkx.Graph/DiGraph, DataFrame 或 EdgeTable
+        :param weight: None 或 边权重的属性名
+        :param directed: graph为DataFrame时，是否为有向图
+        :param backend: 'networkx' 或 'sparse'
+        :param sample_size, epsilon, seed: 最短路径抽样的参数，见shortest_path_centrality
+        :param n_jobs: 最短路径计算的进程数
+        :param path_samples: 平均最短路径长度抽样的源节点数量
+        '''
+        from edgetable import EdgeTable
+
+        self.weight = weight
+        self.backend = backend
+        self.sample_size = sample_size
+        self.epsilon = epsilon
+        self.seed = seed
+        self.n_jobs = n_jobs
+        self.path_samples = path_samples
+        self.cache = {}
+
+        if isinstance(graph, EdgeTable):
+            self.cache['table'] = graph
+        elif isinstance(graph, pd.DataFrame):
+            self.cache['table'] = EdgeTable.from_edgedata(graph, attr=weight, directed=directed)
+        else:
+            self.cache['graph'] = graph
+
+        self.from_graph = 'graph' in self.cache
+        if self.from_graph:
+            self.directed = graph.is_directed()
+            self.nodes = pd.Index(list(graph.nodes()))
+        else:
+            self.directed = self.cache['table'].directed
+            self.nodes = self.cache['table'].nodes
+
+    @property
+    def sampled(self):
+        return self.sample_size is not None or self.epsilon is not None
+
+    def get(self, name):
+        '''计算指标或中间结果，依赖先计算，结果缓存'''
+        if name not in self.cache:
+            metric = METRICS[name]
+            for required in metric.requirements(self.backend):
+                self.get(required)
+            self.cache[name] = metric.func(self)
+        return self.cache[name]
+
+    def node_array(self, values):
+        '''dict（节点id -> 值）转为按nodes排列的ndarray'''
+        return pd.Series(dict(values)).reindex(self.nodes).values
+
+    def check(self, names):
+        '''检查指标是否存在，是否适用于该图'''
+        for name in names:
+            if name not in METRICS or METRICS[name].scope == 'intermediate':
+                raise ValueError('未注册的指标：{}，见list_metrics()'.format(name))
+            if not METRICS[name].available(self.directed, self.weight is not None):
+                raise ValueError('指标{}不适用于该图（directed={}, weight={}）'.format(
+                    name, self.directed, self.weight))
+
+
+# ---- 中间结果 ----
+
+# 'graph'和'table'至少有一个在MetricContext中已经给定，另一个由它转换得到；
+# networkx后端的指标用networkx的图，sparse后端用EdgeTable
+_GRAPH_OR_TABLE = {'networkx': ('graph',), 'sparse': ('table',)}
+
+@register('graph', scope='intermediate', cost='linear', requires=('table',),
+          description='networkx的图')
+def _graph(ctx):
+    return ctx.get('table').to_networkx(attr=ctx.weight)
+
+
+@register('table', scope='intermediate', cost='linear', requires=('graph',),
+          description='EdgeTable')
+def _table(ctx):
+    from edgetable import EdgeTable
+    return EdgeTable.from_networkx(ctx.get('graph'), attr=ctx.weight)
+
+
+@register('degrees', scope='intermediate', cost='linear', requires=_GRAPH_OR_TABLE,
+          description='所有的度（入度，出度，加权），见node_degrees')
+def _degrees(ctx):
+    if ctx.backend == 'sparse':
+        return node_degrees(ctx.get('table'), weight=ctx.weight)
+
+    graph = ctx.get('graph')
+    degrees = {'Degree': ctx.node_array(graph.degree())}
+    if ctx.directed:
+        degrees['InDegree'] = ctx.node_array(graph.in_degree())
+        degrees['OutDegree'] = ctx.node_array(graph.out_degree())
+    if ctx.weight is not None:
+        degrees['WeightedDegree'] = ctx.node_array(graph.degree(weight=ctx.weight))
+        if ctx.directed:
+            degrees['WeightedInDegree'] = ctx.node_array(graph.in_degree(weight=ctx.weight))
+            degrees['WeightedOutDegree'] = ctx.node_array(graph.out_degree(weight=ctx.weight))
+    return degrees
+
+
+@register('paths', scope='intermediate', cost='all_pairs', requires=('table',),
+          description='不加权的最短路径累加（CSR上的BFS），所有后端（精确，抽样，多进程）只计算一次，'
+                      '介数，接近中心度及其标准误共用')
+def _paths(ctx):
+    return shortest_path_centrality(ctx.get('table'), sample_size=ctx.sample_size,
+                                    epsilon=ctx.epsilon, seed=ctx.seed, n_jobs=ctx.n_jobs)
+
+
+@register('weighted_paths', scope='intermediate', cost='all_pairs', weighted=True,
+          requires={'networkx': ('graph', 'table'), 'sparse': ('table',)},
+          description='加权的最短路径累加（CSR上的Dijkstra），加权介数及其标准误共用')
+def _weighted_paths(ctx):
+    from edgetable import EdgeTable
+
+    table = ctx.get('table')
+    if ctx.backend == 'networkx' and not ctx.from_graph:
+        # networkx后端的权重与networkx的图一致（重复的边取最后一条，而不是累加）
+        table = EdgeTable.from_networkx(ctx.get('graph'), attr=ctx.weight)
+    return shortest_path_centrality(table, weight=ctx.weight, sample_size=ctx.sample_size,
+                                    epsilon=ctx.epsilon, seed=ctx.seed, n_jobs=ctx.n_jobs)
+
+
+@register('path_length', scope='intermediate', cost='all_pairs', directed=False,
+          requires={'networkx': ('graph', 'table'), 'sparse': ('table',)},
+          description='平均最短路径长度，见average_shortest_path_length')
+def _path_length(ctx):
+    if ctx.path_samples is None and ctx.backend == 'networkx':
+        import networkx as nx
+        return {'AveShortestPathLength': nx.average_shortest_path_length(ctx.get('graph')),
+                'StdErr': 0.0, 'Samples': len(ctx.nodes)}
+    return average_shortest_path_length(ctx.get('table'), sample_size=ctx.path_samples,
+                                        seed=ctx.seed)
+
+
+# ---- 节点指标 ----
+
+def _register_degree(name, directed=None, weighted=False):
+    register(name, requires=('degrees',), directed=directed, weighted=weighted)(
+        lambda ctx: ctx.get('degrees')[name])
+
+
+_register_degree('Degree')
+_register_degree('InDegree', directed=True)
+_register_degree('OutDegree', directed=True)
+_register_degree('WeightedDegree', weighted=True)
+_register_degree('WeightedInDegree', directed=True, weighted=True)
+_register_degree('WeightedOutDegree', directed=True, weighted=True)
+
+
+@register('DegreeCentrality', requires=('Degree',))
+def _degree_centrality(ctx):
+    num_nodes = len(ctx.nodes)
+    if num_nodes <= 1:
+        return np.ones(num_nodes)
+    return ctx.get('Degree') / (num_nodes - 1.0)
+
+
+@register('EigenvectorCentrality', cost='iterative', requires=_GRAPH_OR_TABLE)
+def _eigenvector(ctx):
+    if ctx.backend == 'sparse':
+        return eigenvector_centrality(ctx.get('table'))
+    import networkx as nx
+    return ctx.node_array(nx.eigenvector_centrality_numpy(ctx.get('graph')))
+
+
+@register('WeightedEigenvectorCentrality', cost='iterative', weighted=True,
+          requires=_GRAPH_OR_TABLE)
+def _weighted_eigenvector(ctx):
+    if ctx.backend == 'sparse':
+        return eigenvector_centrality(ctx.get('table'), weight=ctx.weight)
+    import networkx as nx
+    return ctx.node_array(nx.eigenvector_centrality_numpy(ctx.get('graph'), weight=ctx.weight))
+
+
+def _register_paths(name, paths_name, key, weighted=False, description=''):
+    register(name, cost='all_pairs', requires=(paths_name,), weighted=weighted,
+             description=description)(lambda ctx: ctx.get(paths_name)[key])
+
+
+_register_paths('BetweennessCentrality', 'paths', 'Betweenness',
+                description='与nx.betweenness_centrality一致')
+_register_paths('ClosenessCentrality', 'paths', 'Closeness',
+                description='与nx.closeness_centrality一致')
+_register_paths('WeightedBetweennessCentrality', 'weighted_paths', 'Betweenness', weighted=True,
+                description='与nx.betweenness_centrality(weight=...)一致')
+_register_paths('BetweennessCentralityStdErr', 'paths', 'BetweennessStdErr',
+                description='抽样估计的标准误，精确计算时为0')
+_register_paths('ClosenessCentralityStdErr', 'paths', 'ClosenessStdErr',
+                description='抽样估计的标准误，精确计算时为0')
+_register_paths('WeightedBetweennessCentralityStdErr', 'weighted_paths', 'BetweennessStdErr',
+                weighted=True, description='抽样估计的标准误，精确计算时为0')
+
+
+
+# ---- 网络指标 ----
+
+@register('Node', scope='graph', cost='constant')
+def _node(ctx):
+    return len(ctx.nodes)
+
+
+@register('Edge', scope='graph', cost='linear', requires=_GRAPH_OR_TABLE)
+def _edge(ctx):
+    if ctx.backend != 'sparse':
+        return ctx.get('graph').number_of_edges()
+    structure = csr_adjacency(ctx.get('table'))
+    if ctx.directed:
+        return structure.nnz
+    return (structure.nnz + np.count_nonzero(structure.diagonal())) // 2
+
+
+@register('Density', scope='graph', cost='constant', requires=('Node', 'Edge'))
+def _density(ctx):
+    num_nodes, num_edges = ctx.get('Node'), ctx.get('Edge')
+    if num_nodes < 2:
+        return 0
+    density = num_edges / float(num_nodes * (num_nodes - 1))
+    return density if ctx.directed else 2 * density
+
+
+def _register_average(name, node_name, directed=None, cost='linear'):
+    register(name, scope='graph', cost=cost, requires=(node_name,), directed=directed)(
+        lambda ctx: float(np.mean(ctx.get(node_name))) if len(ctx.nodes) > 0 else 0)
+
+
+_register_average('AveDegree', 'Degree')
+_register_average('AveInDegree', 'InDegree', directed=True)
+_register_average('AveOutDegree', 'OutDegree', directed=True)
+_register_average('AveDegreeCentrality', 'DegreeCentrality')
+_register_average('AveEigenvectorCentrality', 'EigenvectorCentrality', cost='iterative')
+_register_average('AveBetweennessCentrality', 'BetweennessCentrality', cost='all_pairs')
+_register_average('AveClosenessCentrality', 'ClosenessCentrality', cost='all_pairs')
+_register_average('AveBetweennessCentralityStdErr', 'BetweennessCentralityStdErr', cost='all_pairs')
+_register_average('AveClosenessCentralityStdErr', 'ClosenessCentralityStdErr', cost='all_pairs')
+
+
+@register('Directed', scope='graph', cost='constant')
+def _directed(ctx):
+    return int(ctx.directed)
+
+
+@register('AveClusterCoefficent', scope='graph', cost='all_pairs', directed=False,
+          requires=('graph',), description='networkx计算（sparse后端也需要networkx的图）')
+def _clustering(ctx):
+    import networkx as nx
+    return nx.average_clustering(ctx.get('graph'))
+
+
+@register('AveShortestPathLength', scope='graph', cost='all_pairs', directed=False,
+          requires=('path_length',))
+def _average_path_length(ctx):
+    return ctx.get('path_length')['AveShortestPathLength']
+
+
+@register('AveShortestPathLengthStdErr', scope='graph', cost='all_pairs', directed=False,
+          requires=('path_length',))
+def _average_path_length_stderr(ctx):
+    return ctx.get('path_length')['StdErr']
+
+
+@register('PathSamples', scope='graph', cost='constant', directed=False, requires=('path_length',))
+def _path_samples(ctx):
+    return ctx.get('path_length')['Samples']
+
+
+@register('CentralitySamples', scope='graph', cost='constant', requires=('paths',))
+def _centrality_samples(ctx):
+    return ctx.get('paths')['Samples']
+
+
+# ------------------- 按指标计算 --------------------------
+
+def default_node_metrics(directed, weighted, centrality=False, sampled=False):
+    '''calculate_node_features 默认计算的指标（与原来centrality, weight参数的结果一致）'''
+    names = ['Degree', 'InDegree', 'OutDegree']
+    if centrality:
+        names += ['DegreeCentrality', 'BetweennessCentrality',
+                  'EigenvectorCentrality', 'ClosenessCentrality']
+    if weighted:
+        names += ['WeightedDegree', 'WeightedInDegree', 'WeightedOutDegree']
+        if centrality:
+            names += ['WeightedBetweennessCentrality', 'WeightedEigenvectorCentrality']
+    if centrality and sampled:
+        names += ['BetweennessCentralityStdErr', 'ClosenessCentralityStdErr',
+                  'WeightedBetweennessCentralityStdErr']
+    return [name for name in names if METRICS[name].available(directed, weighted)]
+
+
+def default_graph_metrics(directed, centrality=False, sampled=False, path_sampled=False):
+    '''calculate_graph_features 默认计算的指标'''
+    names = ['Node', 'Edge', 'Density', 'AveDegree', 'Directed',
+             'AveClusterCoefficent', 'AveShortestPathLength']
+    if path_sampled:
+        names += ['AveShortestPathLengthStdErr', 'PathSamples']
+    names += ['AveInDegree', 'AveOutDegree']
+    if centrality:
+        names += ['AveDegreeCentrality', 'AveEigenvectorCentrality',
+                  'AveBetweennessCentrality', 'AveClosenessCentrality']
+        if sampled:
+            names += ['AveBetweennessCentralityStdErr', 'AveClosenessCentralityStdErr',
+                      'CentralitySamples']
+    return [name for name in names if METRICS[name].available(directed, False)]
+
+
+def node_features(graph, metrics=None, weight=None, centrality=False, directed=True,
+                  backend='networkx', sample_size=None, epsilon=None, seed=None, n_jobs=1):
+    '''
+    按指标计算节点特征，同一次计算中共用的中间结果（例如最短路径）只算一次
+
+    :param graph: networkx.Graph/DiGraph, DataFrame 或 EdgeTable
+    :param metrics: list, 需要计算的指标，见list_metrics('node')；None时由centrality和weight决定
+    :param 其他参数: 见MetricContext
+    :return: DataFrame, index 和 Id 为节点id
+    '''
+    ctx = MetricContext(graph, weight=weight, directed=directed, backend=backend,
+                        sample_size=sample_size, epsilon=epsilon, seed=seed, n_jobs=n_jobs)
+    if metrics is None:
+        metrics = default_node_metrics(ctx.directed, weight is not None,
+                                       centrality=centrality, sampled=ctx.sampled)
+    ctx.check(metrics)
+
+    features = pd.DataFrame({name: ctx.get(name) for name in metrics}, index=ctx.nodes)
+    features['Id'] = features.index
+    return order_node_features(features)
+
+
+def graph_features(graph, metrics=None, centrality=False, exclude=None, directed=True,
+                   backend='networkx', sample_size=None, epsilon=None, seed=None, n_jobs=1,
+                   path_samples=None):
+    '''
+    按指标计算网络特征，网络指标依赖的节点指标和中间结果只算一次
+
+    :param graph: networkx.Graph/DiGraph, DataFrame 或 EdgeTable
+    :param metrics: list, 需要计算的指标，见list_metrics('graph')；None时由centrality决定
+    :param exclude: list, 不计算的指标
+    :param 其他参数: 见MetricContext
+    :return: pd.Series
+    '''
+    ctx = MetricContext(graph, directed=directed, backend=backend, sample_size=sample_size,
+                        epsilon=epsilon, seed=seed, n_jobs=n_jobs, path_samples=path_samples)
+    if metrics is None:
+        metrics = default_graph_metrics(ctx.directed, centrality=centrality, sampled=ctx.sampled,
+                                        path_sampled=path_samples is not None)
+    if exclude is not None:
+        metrics = [name for name in metrics if name not in exclude]
+    ctx.check(metrics)
+
+    return pd.Series({name: ctx.get(name) for name in metrics})
+
+
+def test_parallel_centrality():
+    '''n_jobs>1与n_jobs=1的介数和接近中心度完全一致（networkx和sparse后端，精确和抽样）'''
+    import networkx as nx
+
+    metrics = ['BetweennessCentrality', 'ClosenessCentrality', 'WeightedBetweennessCentrality',
+               'BetweennessCentralityStdErr', 'ClosenessCentralityStdErr']
+    for directed in [False, True]:
+        graph = nx.gnm_random_graph(300, 1200, seed=1, directed=directed)
+        for u, v in graph.edges():
+            graph[u][v]['Weight'] = float((u * v) % 5 + 1)
+        for backend in ['networkx', 'sparse']:
+            for sample_size in [None, 100]:
+                features = [node_features(graph, metrics=metrics, weight='Weight', backend=backend,
+                                           sample_size=sample_size, seed=0, n_jobs=n_jobs)
+                            for n_jobs in [1, 4]]
+                for name in metrics:
+                    assert np.array_equal(features[0][name].values, features[1][name].values), \
+                        (directed, backend, sample_size, name)
+
+        exact = node_features(graph, metrics=metrics, weight='Weight', n_jobs=4)
+        betweenness = nx.betweenness_centrality(graph, weight='Weight')
+        assert np.allclose(exact['WeightedBetweennessCentrality'].values,
+                           [betweenness[node] for node in graph.nodes()])
+        closeness = nx.closeness_centrality(graph)
+        assert np.allclose(exact['ClosenessCentrality'].values,
+                           [closeness[node] for node in graph.nodes()])
+    print('test_parallel_centrality ok')
+
+
+def test_metric_requires():
+    '''每个指标和中间结果用到的其他指标（ctx.get）都在requires中声明（两种后端，图和边表输入）'''
+    import networkx as nx
+    from edgetable import EdgeTable
+
+    class _Context(MetricContext):
+        def get(self, name):
+            if self.running is not None:
+                self.used.setdefault(self.running, set()).add(name)
+            if name not in self.cache:
+                metric = METRICS[name]
+                for required in metric.requirements(self.backend):
+                    self.get(required)
+                running, self.running = self.running, name
+                self.cache[name] = metric.func(self)
+                self.running = running
+            return self.cache[name]
+
+    for directed in [False, True]:
+        graph = nx.gnm_random_graph(50, 150, seed=1, directed=directed)
+        nx.add_cycle(graph, range(50))  # 连通图，networkx的特征向量中心度才有唯一解
+        for u, v in graph.edges():
+            graph[u][v]['Weight'] = float((u * v) % 5 + 1)
+        for data in [graph, EdgeTable.from_networkx(graph, attr='Weight')]:
+            for backend in BACKENDS:
+                ctx = _Context(data, weight='Weight', backend=backend)
+                ctx.running, ctx.used = None, {}
+                for name, metric in METRICS.items():
+                    if metric.scope != 'intermediate' and metric.available(ctx.directed, True):
+                        ctx.get(name)
+                for name, used in ctx.used.items():
+                    assert used <= set(METRICS[name].requirements(backend)), (name, backend, used)
+    print('test_metric_requires ok')
+
+
+if __name__ == '__main__':
+
+    test_parallel_centrality()
+    test_metric_requires()
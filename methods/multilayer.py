@@ -0,0 +1,613 @@
+#-*- coding:utf-8 -*-
+
+'''
+目的：
+    多层网络（例如步行，公交，地铁等不同出行方式的子网络），所有层共用一个节点编码，
+    Entropy.init_with_subgraphes 和 NetworkUnity 的网络特征都可以直接使用，
+    每层的度，流量（加权度）只计算一次，不再在各个模块中分别对节点重新编码
+
+数据：
+    MultilayerNetwork
+        nodes: pd.Index, 全局的节点编码 -> 节点id，
+               按层的顺序，每层按行的顺序，Source在Target之前，第一次出现的顺序编码
+        layers: dict, 层名 -> EdgeTable，所有层的EdgeTable共用nodes（全局编码，包含其他层的节点）
+        attr: 权重的属性名
+        directed: 是否为有向网络
+
+    node×layer矩阵：ndarray, 行按全局节点编码，列按层的顺序，
+        例如 node_flows('in')[i, j] 为节点i在第j层的入流量（入边权重的和）
+
+方法：
+    * 层名 - MultilayerNetwork.layer_names
+    * 某一层的边表 - MultilayerNetwork.layer
+    * 某一层的CSR邻接矩阵 - MultilayerNetwork.adjacency
+    * 每层的度（node×layer） - MultilayerNetwork.node_degrees
+    * 每层的流量（node×layer） - MultilayerNetwork.node_flows
+    * 节点流量表（Entropy的in，out，all表） - MultilayerNetwork.node_table
+    * 每层边的流量（edge×layer） - MultilayerNetwork.edge_flows
+    * 边流量表（Entropy的flow表） - MultilayerNetwork.edge_table
+    * 转为边数据的dict - MultilayerNetwork.to_dict
+    * 每层的网络特征 - MultilayerNetwork.graph_features
+    * 分块读取每层的边文件，在磁盘上累加流量 - LayerFlowAccumulator
+    * 磁盘上的流量矩阵，按行分块访问 - FlowMatrix
+
+使用：
+    network = MultilayerNetwork({'Walk': df1, 'Bus': df2}, attr='Weight', directed=True)
+    ent = Entropy()
+    ent.init_with_subgraphes(network)
+    NetworkUnity.calculate_graph_features(network)
+
+内存放不下所有层的边时（Entropy.init_with_layer_files）：
+    LayerFlowAccumulator逐层，逐块读取边文件，节点id增量编码（edgetable.NodeInterner），
+    节点的入，出流量累加到磁盘上的node×layer矩阵（np.memmap，按行增长）；
+    边按整数键的hash分到多个分区文件，读取结束后逐个分区在内存中合并，
+    内存只与一块数据，节点数和一个分区的大小有关。结果为FlowMatrix，按行分块计算熵。
+
+备注：
+    * 2026.10 - 新增
+'''
+
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+
+from edgetable import EdgeTable, NodeInterner, code_dtype, group_first, read_edge_chunks
+
+
+# 按行分块计算时每块的行数
+BLOCK_ROWS = 2 ** 18
+
+# 边分区文件中的记录
+EDGE_RECORD = np.dtype([('key', np.int64), ('source', np.int64), ('target', np.int64),
+                        ('layer', np.int32), ('weight', np.float64)])
+
+
+def _concat_ids(arrays):
+    '''拼接各层的节点id，类型不同时转为object（避免numpy把数值转为字符串）'''
+    if len(arrays) < 1:
+        return np.empty(0)
+    if len(set(array.dtype for array in arrays)) > 1:
+        arrays = [np.asarray(array, dtype=object) for array in arrays]
+    return np.concatenate(arrays)
+
+
+class MultilayerNetwork():
+    '''
+    多层网络，见模块说明
+    '''
+
+    def __init__(self, layers, attr='Weight', directed=True, weighted=True, node_type=None):
+        '''
+        :param layers: dict（或(name, data)的list），层名 -> 边数据（DataFrame，包含[Source,Target,attr]）或 EdgeTable
+        :param attr: 权重的属性名
+        :param directed: 是否为有向网络
+        :param weighted: 是否加权，False时所有边的权重为1（不修改输入的数据）
+        :param node_type: 节点id的类型，例如str，给定时先转换再编码（Entropy中节点id为str，1和'1'为同一个节点），
+                          同时保留每层原始的Source，Target（输入列的引用），edge_table(id_type=None)输出原始的值
+        '''
+        layers = list(layers.items()) if isinstance(layers, dict) else list(layers)
+        self.attr = attr
+        self.directed = directed
+        self.weighted = weighted
+        self._cache = {}
+
+        sources, targets, weights = [], [], []
+        for _, data in layers:
+            if isinstance(data, EdgeTable):
+                sources.append(data.nodes.take(data.source))
+                targets.append(data.nodes.take(data.target))
+                values = data.attrs.get(attr) if weighted else None
+            else:
+                sources.append(data['Source'].to_numpy())
+                targets.append(data['Target'].to_numpy())
+                values = data[attr].to_numpy() if weighted else None
+            num_edges = len(sources[-1])
+            weights.append(np.ones(num_edges) if values is None else np.asarray(values, dtype=np.float64))
+
+        # Source，Target交替排列后编码，节点的顺序与逐行遍历每层的边时第一次出现的顺序一致
+        sizes = [len(source) for source in sources]
+        codes, nodes = pd.factorize(np.column_stack([_concat_ids(sources),
+                                                     _concat_ids(targets)]).ravel())
+        if node_type is not None:
+            # 只转换唯一的id，转换后相同的id（例如1和'1'）合并，仍然按第一次出现的顺序
+            node_codes, nodes = pd.factorize(pd.Index(nodes).astype(node_type))
+            codes = node_codes[codes]
+        self.nodes = pd.Index(nodes)
+        codes = codes.reshape(-1, 2).astype(code_dtype(len(self.nodes)))
+        # 转换类型后nodes中不再是原始的id
+        self._raw_ids = None if node_type is None else (sources, targets)
+
+        self.layers = {}
+        start = 0
+        for (name, _), size, weight in zip(layers, sizes, weights):
+            self.layers[name] = EdgeTable(codes[start:start + size, 0], codes[start:start + size, 1],
+                                          self.nodes, attrs={attr: weight}, directed=directed)
+            start += size
+
+    def __repr__(self):
+        return 'MultilayerNetwork(nodes={}, layers={}, edges={}, directed={})'.format(
+            self.number_of_nodes(), self.layer_names, [len(table) for table in self.layers.values()],
+            self.directed)
+
+    @property
+    def layer_names(self):
+        return list(self.layers.keys())
+
+    def number_of_nodes(self):
+        return len(self.nodes)
+
+    def number_of_layers(self):
+        return len(self.layers)
+
+    def layer(self, name, compact=False):
+        '''
+        :param name: 层名
+        :param compact: 是否只保留该层的节点（重新编码，保持全局编码的顺序），否则使用全局编码
+        :return: EdgeTable
+        '''
+        table = self.layers[name]
+        if compact:
+            return table.subset(slice(None), compact=True)
+        return table
+
+    def adjacency(self, name):
+        '''
+        :param name: 层名
+        :return: scipy.sparse.csr_matrix, n*n（n为所有层的节点数），见graph_metrics.csr_adjacency
+        '''
+        key = ('adjacency', name)
+        if key not in self._cache:
+            import graph_metrics
+
+            self._cache[key] = graph_metrics.csr_adjacency(self.layers[name], weight=self.attr)
+        return self._cache[key]
+
+    def _node_matrix(self, direction, weighted):
+        num_nodes = self.number_of_nodes()
+        matrix = np.zeros((num_nodes, self.number_of_layers()), dtype=np.float64)
+        for j, table in enumerate(self.layers.values()):
+            weight = table.attrs[self.attr] if weighted else None
+            if direction in ('out', 'all'):
+                matrix[:, j] += np.bincount(table.source, weights=weight, minlength=num_nodes)
+            if direction in ('in', 'all'):
+                matrix[:, j] += np.bincount(table.target, weights=weight, minlength=num_nodes)
+        return matrix
+
+    def node_degrees(self, direction='all', weighted=False):
+        '''
+        每层节点的度，重复的边分别计算，自环在'all'中计算两次
+        :param direction: 'in', 'out' 或 'all'
+        :param weighted: 是否加权（即流量）
+        :return: ndarray, node×layer，结果缓存，不要原地修改
+        '''
+        if direction not in ('in', 'out', 'all'):
+            raise ValueError("direction应为'in', 'out' 或 'all'")
+        key = ('degree', direction, weighted)
+        if key not in self._cache:
+            if direction == 'all' and ('degree', 'in', weighted) in self._cache \
+                    and ('degree', 'out', weighted) in self._cache:
+                self._cache[key] = (self._cache[('degree', 'in', weighted)]
+                                    + self._cache[('degree', 'out', weighted)])
+            else:
+                self._cache[key] = self._node_matrix(direction, weighted)
+        return self._cache[key]
+
+    def node_flows(self, direction='all'):
+        '''
+        每层节点的流量（边权重的和），即node_degrees(direction, weighted=True)
+        :return: ndarray, node×layer
+        '''
+        return self.node_degrees(direction, weighted=True)
+
+    def node_table(self, direction='all', columns=None, id_type=str):
+        '''
+        节点在每层的流量表，只包含在该方向上出现过的节点（例如'in'只包含作为过Target的节点）
+        :param direction: 'in', 'out' 或 'all'
+        :param columns: list, 输出的层（列）的顺序，默认为所有层；不存在的层为0，没有列出的层放在后面
+        :param id_type: Id列的类型，None时为原始的节点id
+        :return: DataFrame, [Id, *columns]，index为全局节点编码
+        '''
+        columns = self.layer_names if columns is None else list(columns)
+        columns += [name for name in self.layer_names if name not in columns]
+        present = self.node_degrees(direction, weighted=False).any(axis=1)
+        codes = np.flatnonzero(present)
+        flows = pd.DataFrame(self.node_flows(direction)[codes], index=codes, columns=self.layer_names)
+        flows = flows.reindex(columns=columns, fill_value=0)
+        ids = self.nodes[codes]
+        flows.insert(0, 'Id', ids if id_type is None else ids.astype(id_type))
+        return flows
+
+    def edge_flows(self, duplicates='last'):
+        '''
+        所有层的唯一边在每层的流量。边按整数编码的(source, target)匹配，
+        无向网络中A-B与B-A为同一条边，方向为第一次出现的方向；
+        所有层的边拼接后一次factorize，再按(边, 层)一次写入edge×layer的矩阵，与边数线性相关
+        :param duplicates: 同一层中重复的边，'last'取最后一次出现的权重（与原来的Entropy一致），'sum'累加
+        :return: (source, target, flows, first)
+                 source，target: ndarray, 唯一边（按第一次出现的顺序）的全局节点编码
+                 flows: ndarray, edge×layer，该层没有这条边时为nan
+                 first: ndarray, 每条边第一次出现的位置（所有层的边按层的顺序拼接后的行号）
+        '''
+        if duplicates not in ('last', 'sum'):
+            raise ValueError("duplicates应为'last' 或 'sum'")
+        key = ('edge_flows', duplicates)
+        if key in self._cache:
+            return self._cache[key]
+
+        tables = list(self.layers.values())
+        source = np.concatenate([table.source for table in tables]).astype(np.int64)
+        target = np.concatenate([table.target for table in tables]).astype(np.int64)
+        if self.directed:
+            keys = (source << 32) | target
+        else:
+            keys = (np.minimum(source, target) << 32) | np.maximum(source, target)
+        codes, first = group_first(keys)
+        del keys
+        num_edges = len(first)
+
+        flows = np.full((num_edges, len(tables)), np.nan)
+        start = 0
+        for j, table in enumerate(tables):
+            layer_codes = codes[start:start + len(table)]
+            weight = table.attrs[self.attr]
+            start += len(table)
+            if duplicates == 'sum':
+                counts = np.bincount(layer_codes, minlength=num_edges)
+                values = np.bincount(layer_codes, weights=weight, minlength=num_edges)
+                flows[counts > 0, j] = values[counts > 0]
+            else:
+                last = np.full(num_edges, -1, dtype=np.int64)
+                np.maximum.at(last, layer_codes, np.arange(len(table)))
+                present = last >= 0
+                flows[present, j] = weight[last[present]]
+        result = (source[first], target[first], flows, first)
+        self._cache[key] = result
+        return result
+
+    def edge_table(self, columns=None, id_type=str, duplicates='last'):
+        '''
+        边在每层的流量表，见edge_flows
+        :param columns: list, 输出的层（列）的顺序，默认为所有层；不存在的层为nan，没有列出的层放在后面
+        :param id_type: Source，Target的类型，None时为原始的节点id
+                        （给定node_type时为这条边第一次出现的行中的原始值）；Id为"source-target"
+        :param duplicates: 见edge_flows
+        :return: DataFrame, [Id, Source, Target, *columns]，index为Id
+        '''
+        columns = self.layer_names if columns is None else list(columns)
+        columns += [name for name in self.layer_names if name not in columns]
+        source, target, flows, first = self.edge_flows(duplicates)
+        flows = pd.DataFrame(flows, columns=self.layer_names).reindex(columns=columns)
+
+        source, target = self.nodes.take(source), self.nodes.take(target)
+        ids = source.astype(str) + '-' + target.astype(str)
+        if id_type is not None:
+            source, target = source.astype(id_type), target.astype(id_type)
+        elif self._raw_ids is not None:
+            source = _concat_ids(self._raw_ids[0])[first]
+            target = _concat_ids(self._raw_ids[1])[first]
+        flows.index = ids
+        flows.insert(0, 'Id', ids)
+        flows.insert(1, 'Source', source)
+        flows.insert(2, 'Target', target)
+        return flows
+
+    def to_dict(self):
+        '''
+        :return: dict, 层名 -> 边数据(DataFrame, [Source,Target,attr])，即Entropy.init_with_subgraphes的graph_dic
+        '''
+        return {name: table.to_edgedata() for name, table in self.layers.items()}
+
+    def graph_features(self, layers=None, **feature_kwargs):
+        '''
+        每层的网络特征
+        :param layers: list, 需要计算的层，默认为所有层
+        :param feature_kwargs: 传给NetworkUnity.calculate_graph_features的参数，例如metrics，
+                               save_path时保存所有层的结果
+        :return: DataFrame, index为层名
+        '''
+        from network import NetworkUnity
+
+        save_path = feature_kwargs.pop('save_path', None)
+        layers = self.layer_names if layers is None else layers
+        features = [NetworkUnity.calculate_graph_features(self.layer(name, compact=True), **feature_kwargs)
+                    for name in layers]
+        features = pd.DataFrame(features, index=pd.Index(layers, name='Layer'))
+        if save_path is not None:
+            features.to_csv(save_path)
+            print('File Saved : ', save_path)
+        return features
+
+
+class _GrowingMemmap():
+    '''按行增长的np.memmap，按行存储（C order），增长时只扩展文件，已有的数据不移动'''
+
+    def __init__(self, path, columns, dtype=np.float64):
+        self.path = path
+        self.columns = columns
+        self.dtype = np.dtype(dtype)
+        self.capacity = 0
+        self.array = None
+        open(path, 'wb').close()
+        self._resize(1024)
+
+    def _resize(self, capacity):
+        if self.array is not None:
+            self.array.flush()
+            self.array = None
+        with open(self.path, 'r+b') as f:
+            # 扩展的部分为0
+            f.truncate(capacity * self.columns * self.dtype.itemsize)
+        self.array = np.memmap(self.path, dtype=self.dtype, mode='r+', shape=(capacity, self.columns))
+        self.capacity = capacity
+
+    def ensure(self, rows):
+        '''保证至少有rows行，容量按2倍增长'''
+        if rows > self.capacity:
+            self._resize(max(rows, 2 * self.capacity))
+        return self.array
+
+
+class FlowMatrix():
+    '''
+    磁盘上（np.memmap）的流量矩阵，行为节点或边，列为层，按行分块访问，
+    Entropy.init_with_layer_files中代替e_datas中的DataFrame，不把整个表读入内存
+    '''
+
+    def __init__(self, values, columns, nodes, rows=None, edges=None, work_dir=None, name='flow',
+                 block_rows=BLOCK_ROWS):
+        '''
+        :param values: ndarray 或 np.memmap, rows×layer的流量（nan表示0）
+        :param columns: list, 层名
+        :param nodes: pd.Index, 节点编码 -> 节点id
+        :param rows: ndarray, 节点表中每一行的节点编码
+        :param edges: ndarray, 边表中每一行的(source, target)节点编码，rows×2
+        :param work_dir: 结果列（Ent等）的memmap文件的目录，None时结果保存在内存中
+        :param name: 文件名的前缀
+        :param block_rows: 每块的行数
+        '''
+        self.values = values
+        self.columns = list(columns)
+        self.nodes = nodes
+        self.rows = rows
+        self.edges = edges
+        self.work_dir = work_dir
+        self.name = name
+        self.block_rows = block_rows
+        self.results = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def __repr__(self):
+        return 'FlowMatrix(name={}, rows={}, columns={}, results={})'.format(
+            self.name, len(self), self.columns, list(self.results.keys()))
+
+    def blocks(self):
+        ''':return: generator of (start, stop)'''
+        for start in range(0, len(self), self.block_rows):
+            yield start, min(start + self.block_rows, len(self))
+
+    def result(self, name):
+        '''结果列（例如Ent），第一次使用时创建，初始为nan'''
+        if name not in self.results:
+            if self.work_dir is None:
+                self.results[name] = np.full(len(self), np.nan)
+            else:
+                path = os.path.join(self.work_dir, '{}_{}.dat'.format(self.name, name))
+                result = np.memmap(path, dtype=np.float64, mode='w+', shape=(max(len(self), 1),))
+                result[:] = np.nan
+                self.results[name] = result[:len(self)]
+        return self.results[name]
+
+    def ids(self, start, stop):
+        ''':return: pd.Index, 行的Id，节点为str(id)，边为"source-target"'''
+        if self.edges is None:
+            return self.nodes.take(self.rows[start:stop]).astype(str)
+        pairs = self.edges[start:stop]
+        return (self.nodes.take(pairs[:, 0]).astype(str) + '-'
+                + self.nodes.take(pairs[:, 1]).astype(str))
+
+    def frame(self, start, stop, keep_infodata=True):
+        '''
+        一块的结果表，与Entropy中的e_datas一致：[Id, (Source, Target), *columns, *results]，
+        流量全部为0（或nan）的行去掉（与process_data一致）
+        '''
+        values = np.nan_to_num(np.asarray(self.values[start:stop]))
+        keep = values.any(axis=1)
+        data = pd.DataFrame({'Id': np.asarray(self.ids(start, stop))[keep]})
+        if self.edges is not None:
+            pairs = np.asarray(self.edges[start:stop])[keep]
+            data['Source'] = np.asarray(self.nodes.take(pairs[:, 0]))
+            data['Target'] = np.asarray(self.nodes.take(pairs[:, 1]))
+        if keep_infodata:
+            for j, column in enumerate(self.columns):
+                data[column] = values[keep, j]
+        for name, result in self.results.items():
+            data[name] = np.asarray(result[start:stop])[keep]
+        return data
+
+
+class LayerFlowAccumulator():
+    '''
+    分块读取每层的边文件，节点和边在每层的流量累加到磁盘上，见模块说明
+
+    使用：
+        accumulator = LayerFlowAccumulator(['Walk', 'Bus'], directed=True)
+        accumulator.add_file('Walk', 'walk.csv', chunksize=10 ** 6)
+        accumulator.add_file('Bus', 'bus.parquet', chunksize=10 ** 6)
+        e_datas = accumulator.finalize()
+    '''
+
+    def __init__(self, layer_names, attr='Weight', directed=True, weighted=True, work_dir=None,
+                 node_type=str, partitions=16, block_rows=BLOCK_ROWS):
+        '''
+        :param layer_names: list, 层名（列的顺序）
+        :param attr: 权重列
+        :param directed: 是否为有向网络
+        :param weighted: 是否加权，False时权重为1
+        :param work_dir: 磁盘文件的目录，None时在临时目录中创建，cleanup时删除
+        :param node_type: 节点id的类型，见NodeInterner，Entropy中为str
+        :param partitions: 边的分区数，分区越多，每个分区合并时需要的内存越小
+        :param block_rows: 结果FlowMatrix每块的行数
+        '''
+        self.layer_names = list(layer_names)
+        self.attr = attr
+        self.directed = directed
+        self.weighted = weighted
+        self.partitions = partitions
+        self.block_rows = block_rows
+        self._temporary = work_dir is None
+        self.work_dir = tempfile.mkdtemp(prefix='layer_flows_') if work_dir is None else work_dir
+        if not os.path.exists(self.work_dir):
+            os.makedirs(self.work_dir)
+
+        self.interner = NodeInterner(node_type=node_type)
+        num_layers = len(self.layer_names)
+        self.node_in = _GrowingMemmap(self._path('node_in.dat'), num_layers)
+        self.node_out = _GrowingMemmap(self._path('node_out.dat'), num_layers)
+        # 是否作为过Target，Source
+        self.node_roles = _GrowingMemmap(self._path('node_roles.dat'), 2, dtype=np.uint8)
+        self._edge_files = [open(self._path('edges_{}.bin'.format(i)), 'wb') for i in range(partitions)]
+        self.rows = 0
+
+    def _path(self, name):
+        return os.path.join(self.work_dir, name)
+
+    def add_chunk(self, layer, edgedata):
+        '''
+        :param layer: 层名
+        :param edgedata: DataFrame, 包含[Source,Target,attr]
+        :return: self
+        '''
+        j = self.layer_names.index(layer)
+        num_edges = len(edgedata)
+        if num_edges < 1:
+            return self
+        codes = self.interner.intern(np.column_stack([edgedata['Source'].to_numpy(),
+                                                      edgedata['Target'].to_numpy()]).ravel())
+        source = codes[0::2].astype(np.int64)
+        target = codes[1::2].astype(np.int64)
+        if self.weighted:
+            weight = edgedata[self.attr].to_numpy(dtype=np.float64)
+        else:
+            weight = np.ones(num_edges)
+
+        num_nodes = len(self.interner)
+        num_layers = len(self.layer_names)
+        node_in = self.node_in.ensure(num_nodes)
+        node_out = self.node_out.ensure(num_nodes)
+        roles = self.node_roles.ensure(num_nodes)
+        # 在按行存储的一维视图上累加，只涉及这一块的节点
+        np.add.at(node_in.reshape(-1), target * num_layers + j, weight)
+        np.add.at(node_out.reshape(-1), source * num_layers + j, weight)
+        roles[target, 0] = 1
+        roles[source, 1] = 1
+
+        # 边按键的hash分区，追加到分区文件（文件中的顺序即出现的顺序）
+        if self.directed:
+            keys = (source << 32) | target
+        else:
+            keys = (np.minimum(source, target) << 32) | np.maximum(source, target)
+        records = np.empty(num_edges, dtype=EDGE_RECORD)
+        records['key'], records['source'], records['target'] = keys, source, target
+        records['layer'], records['weight'] = j, weight
+        hashed = (keys.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(40)
+        part = (hashed % np.uint64(self.partitions)).astype(np.int64)
+        order = np.argsort(part, kind='stable')
+        bounds = np.searchsorted(part[order], np.arange(self.partitions + 1))
+        records = records[order]
+        for i in range(self.partitions):
+            if bounds[i + 1] > bounds[i]:
+                records[bounds[i]:bounds[i + 1]].tofile(self._edge_files[i])
+        self.rows += num_edges
+        return self
+
+    def add_file(self, layer, path, chunksize=None, verbose=True, **read_kwargs):
+        '''
+        分块读取一层的边文件，见edgetable.read_edge_chunks
+        :return: self
+        '''
+        from edgetable import EDGE_FILE_CHUNK, peak_memory_str
+
+        chunksize = EDGE_FILE_CHUNK if chunksize is None else chunksize
+        columns = ['Source', 'Target'] + ([self.attr] if self.weighted else [])
+        for chunk in read_edge_chunks(path, chunksize=chunksize, columns=columns, **read_kwargs):
+            self.add_chunk(layer, chunk)
+            if verbose:
+                print('[{}] Read Edges : {}, Nodes : {}, Peak Memory : {}'.format(
+                    layer, self.rows, len(self.interner), peak_memory_str()))
+        return self
+
+    def _node_matrix(self, direction, nodes):
+        '''节点表：in，out只包含作为过Target，Source的节点，all包含所有节点'''
+        num_nodes = len(nodes)
+        if direction == 'all':
+            rows = np.arange(num_nodes)
+        else:
+            rows = np.flatnonzero(self.node_roles.array[:num_nodes, 0 if direction == 'in' else 1])
+        values = np.memmap(self._path('node_{}_table.dat'.format(direction)), dtype=np.float64,
+                           mode='w+', shape=(max(len(rows), 1), len(self.layer_names)))[:len(rows)]
+        for start in range(0, len(rows), self.block_rows):
+            block = rows[start:start + self.block_rows]
+            if direction == 'in':
+                values[start:start + len(block)] = self.node_in.array[block]
+            elif direction == 'out':
+                values[start:start + len(block)] = self.node_out.array[block]
+            else:
+                values[start:start + len(block)] = self.node_in.array[block] + self.node_out.array[block]
+        return FlowMatrix(values, self.layer_names, nodes, rows=rows, work_dir=self.work_dir,
+                          name='node_{}'.format(direction), block_rows=self.block_rows)
+
+    def _edge_matrix(self, nodes):
+        '''
+        逐个分区合并边：同一层重复的边取最后一次的权重，无向边的方向为第一次出现的方向，
+        分区内按第一次出现的顺序
+        '''
+        num_layers = len(self.layer_names)
+        flows = _GrowingMemmap(self._path('edge_flows.dat'), num_layers)
+        pairs = _GrowingMemmap(self._path('edge_pairs.dat'), 2, dtype=np.int64)
+        num_edges = 0
+        for i in range(self.partitions):
+            records = np.fromfile(self._path('edges_{}.bin'.format(i)), dtype=EDGE_RECORD)
+            if len(records) < 1:
+                continue
+            codes, first = group_first(records['key'])
+            size = len(first)
+            block = np.full((size, num_layers), np.nan)
+            for j in range(num_layers):
+                positions = np.flatnonzero(records['layer'] == j)
+                last = np.full(size, -1, dtype=np.int64)
+                np.maximum.at(last, codes[positions], positions)
+                present = last >= 0
+                block[present, j] = records['weight'][last[present]]
+            flows.ensure(num_edges + size)[num_edges:num_edges + size] = block
+            pairs.ensure(num_edges + size)[num_edges:num_edges + size] = np.column_stack(
+                [records['source'][first], records['target'][first]])
+            num_edges += size
+            del records, codes, block
+        return FlowMatrix(flows.array[:num_edges], self.layer_names, nodes,
+                          edges=pairs.array[:num_edges], work_dir=self.work_dir, name='flow',
+                          block_rows=self.block_rows)
+
+    def finalize(self, edge_info=True):
+        '''
+        :param edge_info: 是否合并边的流量（flow表）
+        :return: dict, 'in', 'out'(有向), 'all', 'flow'(edge_info) -> FlowMatrix
+        '''
+        for f in self._edge_files:
+            f.close()
+        nodes = self.interner.nodes()
+        directions = ['in', 'out', 'all'] if self.directed else ['all']
+        e_datas = {direction: self._node_matrix(direction, nodes) for direction in directions}
+        if edge_info:
+            e_datas['flow'] = self._edge_matrix(nodes)
+        for i in range(self.partitions):
+            os.remove(self._path('edges_{}.bin'.format(i)))
+        return e_datas
+
+    def cleanup(self):
+        '''删除临时目录（work_dir为None时创建的），之后FlowMatrix不能再使用'''
+        if self._temporary and os.path.exists(self.work_dir):
+            shutil.rmtree(self.work_dir, ignore_errors=True)
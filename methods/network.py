@@ -7,13 +7,19 @@
 
 方法：
     * 从边数据生成网络 - get_graph_from_edgedata
+    * 分块读取边文件生成网络 - graph_from_edge_file
     * 从边数据获取节点 - get_nodes_from_edgedata
     * 将有向边转化为无向边 - as_undirected_edgedata
+    * 连通分量的标签 - component_labels
+    * 最大连通分量 - largest_component
     * 合并两个网络 - merge_edgedata
+    * 流式合并多个网络 - merge_edgedata_stream
     * 计算网络的特征 - calculate_graph_features
+    * 按时间窗口计算网络的特征 - window_graph_features
     * 计算节点的特征 - calculate_node_features
     * 根据度来过滤网络 - degree_filter
     * 计算模块度 - modularity
+    * 模块度的增量更新 - modularity_tracker
     * 社区发现 - community_detect
     * 社区结构的相似度度量 - partition_similarity
     * 绘制网络 - draw_graph
@@ -23,6 +29,11 @@
         DataFrame;
         网络中边的信息，包含[Source,Target,Weight]信息,也可以是没有权重的
 
+    edgetable:
+        EdgeTable(见edgetable.py);
+        整数编码的边表，节点id只编码一次，权重等属性为ndarray，
+        graph_from_edgedata, merge_edgedata, nodes_from_edgedata, degree_filter 可以直接使用
+
     cluster_result
         DataFrame;
         社区划分的结果，形式为['Id','modularity_class']
@@ -39,63 +50,152 @@
 
     * 2018.1.9 - 增加了合并边数据的方法,merge_edgedata!
 
-需要改进：
-    * 将有向图转化为无向图的方法还需要改！
+    * 2026.10 - as_undirected_edgedata 改为基于无序键的groupby实现，与边数线性相关,
+                见 benchmark_as_undirected_edgedata；同方向的重复边也合并，自环保留（不再被删除），
+                只累加数值列
+              - calculate_node_features 增加 backend='sparse'，基于scipy.sparse计算，见graph_metrics.py
+              - 介数和接近中心度支持抽样近似计算(sample_size, epsilon, seed)，并给出标准误
+              - 介数和接近中心度支持多进程计算(n_jobs)
+              - calculate_graph_features 支持抽样计算平均最短路径长度(path_samples)，
+                以及跳过耗时的特征(exclude)
+              - 网络特征和节点特征改为基于graph_metrics的指标注册表计算，
+                可以用 metrics=[...] 只计算需要的指标，共用的中间结果只计算一次
+              - degree_filter 在边表上用bincount筛选，返回副本，支持迭代筛选到不动点(iterative，k-core)
+              - 连通分量在整数编码的边数组上计算(component_labels, largest_component)，
+                graph_from_edgedata(connected_component=True) 不再创建所有分量的子图
+              - community_detect 直接从整数编码的边创建igraph.Graph，方法为注册的函数（见community.py），
+                不再使用eval和pygraphistry
+              - modularity 在整数编码的边数组上用bincount计算，不再经过pygraphistry和igraph
+              - 增加modularity_tracker，移动节点时O(deg)更新模块度
+              - get_confusion_matrix 由社区编码一次生成稀疏列联表（见partition.py），
+                可以返回稀疏的结果(sparse)，不再修改输入的列名
+              - normalized_mutual_info_similarity, partitiion_similarity 由同一个稀疏列联表计算，
+                增加AMI，FMI，V-measure等指标，partitiion_similarity 可以批量比较多个划分
+              - networkx2pandas 按块把边写入预先分配的数组，不为每条边创建dict，
+                可以按块写入csv/parquet文件(save_path, chunksize)
+              - 增加graph_from_edge_file，分块读取csv/parquet/feather，节点id在读取时编码，
+                可以返回networkx的图，EdgeTable或CSR矩阵，并输出进度和内存峰值；
+                graph_from_edgedata 改用 nx.from_pandas_edgelist
+              - 增加window_graph_features，在滑动/滚动时间窗口上增量更新度和权重，
+                逐个窗口输出网络特征（见temporal.py）
+              - calculate_graph_features 可以输入多层网络（见multilayer.py），逐层计算
+              - calculate_graph_features 增加 backend='sparse'，边数据不再转为networkx的图
 
 '''
 
+import os
+import itertools
 import pandas as pd
 import numpy as np
 import networkx as nx
 
+from edgetable import EdgeTable, EdgeMerger, get_attr_list
+
 
 class NetworkUnity():
     def __init__(self):
         pass
 
     @staticmethod
-    def as_undirected_edgedata(edgedata):
-        #将有向边转化为无向边
-        index_droped = []
-        edgedata_directed = edgedata.copy()
-        for ind in edgedata.index:
-            source = edgedata.ix[ind, 'Source']
-            target = edgedata.ix[ind, 'Target']
-            if ind not in index_droped:
-                '''
-                如果该边没有被丢弃过--例如之前在A-B这条边时,发现存在B-A,
-                那么B-A这条边的index会被记录,之后会被丢弃
-                '''
-                data_target_as_source = edgedata[edgedata['Source'] == target]
-                if len(data_target_as_source) >= 1:
-                    if source in data_target_as_source['Target'].values:
-                        index_2 = data_target_as_source[data_target_as_source['Target'] == source].index[0]
-                        edgedata_directed.ix[ind, 'Weight'] += edgedata_directed.ix[index_2, 'Weight']
-                        index_droped.append(index_2)
-        #被丢弃的边数据
-        # data_droped = edgedata.ix[index_droped,:]
-        edgedata_directed.drop(index_droped, axis=0, inplace=True)
-        return edgedata_directed
+    def as_undirected_edgedata(edgedata, accumulate_attr='Weight'):
+        '''
+        将有向边转化为无向边
+
+        思路：
+            把每条边的(Source,Target)映射为无序的键(min, max)，A-B 与 B-A 得到同一个键，
+            然后一次groupby累加属性，保留先出现的那条边（方向和index都不变）。
+            时间复杂度与边数线性相关，不再对每条边做一次全表扫描。
+
+        与2026.10以前的逐行实现的区别（只在有重复边或自环时不同）：
+            * 同一个键的所有边合并为一条，包括同方向的重复边（原来只合并第一条反向边）
+            * 自环保留一条，属性不变（原来自环与自己匹配，权重加倍后被删除）
+            * 只累加数值列，其他列（例如字符串）保留第一条边的值
+
+        :param edgedata: DataFrame, 边数据
+        :param accumulate_attr: 需要累加的属性，str 或 list，
+                                'all' 表示除Source，Target以外的所有列，None表示不累加；
+                                非数值（包括bool）的列不累加
+        :return: DataFrame, 无向边数据
+        '''
+        accumulate_attr = [col for col in get_attr_list(edgedata, accumulate_attr)
+                           if pd.api.types.is_numeric_dtype(edgedata[col])
+                           and not pd.api.types.is_bool_dtype(edgedata[col])]
+        if len(edgedata) < 1:
+            return edgedata.copy()
+
+        key = EdgeTable.from_edgedata(edgedata, attr=None).edge_key(directed=False)
+        key = pd.Series(key, index=edgedata.index)
+
+        edgedata_undirected = edgedata[~key.duplicated(keep='first')].copy()
+        if len(accumulate_attr) > 0:
+            # sort=False时，分组的顺序就是每个键第一次出现的顺序，与保留的边一一对应
+            attr_sum = edgedata[accumulate_attr].groupby(key, sort=False).sum()
+            attr_sum.index = edgedata_undirected.index
+            edgedata_undirected[accumulate_attr] = attr_sum
+        return edgedata_undirected
 
     @staticmethod
-    def networkx2pandas(graph):
+    def networkx2pandas(graph, attr='all', save_path=None, chunksize=None):
         '''
         :param graph: networkx.Graph/DiGraph
-        :return: edgedata, DataFrame
+        :param attr: 输出的边属性，'all', str, list 或 None
+        :param save_path: None 或 文件地址（.csv, .parquet），给定时按块写入文件，不在内存中生成整个表
+        :param chunksize: 写入文件时每块的边数，默认为edgetable.NETWORKX_CHUNK
+        :return: edgedata, DataFrame；写入文件时返回save_path
+
+        边按块从邻接表中取出，节点编码和属性直接写入预先分配的numpy数组，见EdgeTable.from_networkx
         '''
-        def _getedges(g):
-            for es in list(g.edges(data=True)):
-                yield dict({'Source': es[0], 'Target': es[1]}, **es[2])
-        edgedata = pd.DataFrame(_getedges(graph))
-        return edgedata
+        from edgetable import networkx_edge_chunks, networkx_nodes, take_nodes, NETWORKX_CHUNK
+
+        if save_path is None:
+            return EdgeTable.from_networkx(graph, attr=attr).to_edgedata()
+
+        chunksize = NETWORKX_CHUNK if chunksize is None else chunksize
+        nodes = networkx_nodes(graph)
+        if attr == 'all':
+            # 写入文件时每块的列要相同，先找出所有的属性
+            datas = (data for _, _, data in graph.edges(data=True))
+            attr = list(dict.fromkeys(itertools.chain.from_iterable(datas)))
+
+        is_parquet = os.path.splitext(save_path)[1].lower() == '.parquet'
+        writer = None
+        try:
+            for i, (source, target, attrs) in enumerate(networkx_edge_chunks(graph, attr=attr,
+                                                                             chunksize=chunksize,
+                                                                             nodes=nodes)):
+                columns = {'Source': take_nodes(nodes, source), 'Target': take_nodes(nodes, target)}
+                columns.update(attrs)
+                chunk = pd.DataFrame(columns)
+                if is_parquet:
+                    import pyarrow as pa
+                    import pyarrow.parquet as pq
+                    table = pa.Table.from_pandas(chunk, preserve_index=False,
+                                                 schema=None if writer is None else writer.schema)
+                    if writer is None:
+                        writer = pq.ParquetWriter(save_path, table.schema)
+                    writer.write_table(table)
+                else:
+                    chunk.to_csv(save_path, index=False, mode='w' if i == 0 else 'a', header=i == 0)
+        finally:
+            if writer is not None:
+                writer.close()
+
+        print('File Saved : ', save_path)
+        return save_path
 
     @staticmethod
     def nodes_from_edgedata(edgedata,return_df=True):
         '''
-        :param edgedata: 边的数据
+        :param edgedata: 边的数据，DataFrame 或 EdgeTable
         :param return_df: 是否返回Series，默认True，否则为list
         :return: 节点数据
         '''
+        if isinstance(edgedata, EdgeTable):
+            nodes = list(edgedata.nodes)
+            if return_df:
+                nodes = pd.DataFrame(nodes, columns=['Id'])
+            return nodes
+
         source = set(edgedata['Source'])
         target = set(edgedata['Target'])
         nodes = list(source.union(target))
@@ -106,11 +206,11 @@ class NetworkUnity():
     @staticmethod
     def graph_from_edgedata(edgedata, attr='Weight', directed=True,connected_component=False):
         '''
-        :param edgedata: 边的数据
+        :param edgedata: 边的数据，DataFrame 或 EdgeTable
         :param attr: string 或 list; 边的属性数据，如果没有权重，设置attr=None，
         :param directed: 有向图还是无向图
-        :param connected_component: 返回最大联通子图，默认为True,对于有向图为weakly_connected
-                                    未开发
+        :param connected_component: 返回最大联通子图，对于有向图为weakly_connected，
+                                    见largest_component
 
         :return: networkx.Graph 或 DiGraph
         '''
@@ -120,181 +220,215 @@ class NetworkUnity():
             else:
                 return nx.Graph()
 
-        if directed:
-            graph = nx.from_pandas_dataframe(edgedata, 'Source', 'Target',
-                                             edge_attr=attr, create_using=nx.DiGraph())
-            if connected_component:
-                #返回最大联通子图
-                graph = max(nx.weakly_connected_component_subgraphs(graph), key=len)
+        if connected_component:
+            #最大联通子图，在边数据上筛选后再创建网络
+            edgedata = NetworkUnity.largest_component(edgedata, directed=directed)
+
+        create_using = nx.DiGraph() if directed else nx.Graph()
+        if isinstance(edgedata, EdgeTable):
+            graph = edgedata.to_networkx(attr=attr, directed=directed)
         else:
-            graph = nx.from_pandas_dataframe(edgedata, 'Source', 'Target',
-                                             edge_attr=attr, create_using=nx.Graph())
-            if connected_component:
-                graph =  max(nx.connected_component_subgraphs(graph), key=len)
+            # networkx 2.0以后from_pandas_dataframe改为from_pandas_edgelist
+            graph = nx.from_pandas_edgelist(edgedata, 'Source', 'Target',
+                                            edge_attr=attr, create_using=create_using)
 
         print('Directed Graph ：', graph.is_directed())
         return graph
 
     @staticmethod
-    def merge_edgedata(edgedata_1, edgedata_2, dirceted=True, accumulate_attr='all'):
+    def graph_from_edge_file(path, attr='Weight', directed=True, connected_component=False,
+                             output='networkx', chunksize=None, verbose=True, **read_kwargs):
         '''
-        合并2个图（edges）,思路如下
+        分块读取边文件创建网络，节点id在读取时编码，不在内存中保存整个原始的表，
+        见EdgeTable.from_edge_file
+        :param path: str, 文件地址，csv(包括txt等文本), parquet, feather
+        :param attr: string 或 list; 边的属性数据，如果没有权重，设置attr=None
+        :param directed: 有向图还是无向图
+        :param connected_component: 只保留最大联通子图，见largest_component
+        :param output: 'networkx', 'edgetable' 或 'csr'
+        :param chunksize: int, 每块的行数，默认为edgetable.EDGE_FILE_CHUNK
+        :param verbose: 是否输出读取的进度和内存峰值
+        :param read_kwargs: 读取文件的其他参数，例如sep
+        :return: output为'networkx'时为networkx.Graph 或 DiGraph；'edgetable'时为EdgeTable；
+                 'csr'时为(scipy.sparse.csr_matrix, nodes)，权重为attr（attr为list时取第一个），
+                 无向图为对称矩阵，见graph_metrics.csr_adjacency
+        '''
+        from edgetable import EDGE_FILE_CHUNK, peak_memory_str
+
+        if output not in ('networkx', 'edgetable', 'csr'):
+            raise ValueError("output应为'networkx', 'edgetable' 或 'csr'")
+        chunksize = EDGE_FILE_CHUNK if chunksize is None else chunksize
+        table = EdgeTable.from_edge_file(path, attr=attr, directed=directed, chunksize=chunksize,
+                                         verbose=verbose, **read_kwargs)
+        if connected_component:
+            table = table.largest_component()
+
+        if output == 'edgetable':
+            return table
+        if output == 'csr':
+            import graph_metrics
+
+            names = get_attr_list(table, attr)
+            adjacency = graph_metrics.csr_adjacency(table, weight=names[0] if names else None)
+            result = (adjacency, table.nodes)
+        else:
+            result = NetworkUnity.graph_from_edgedata(table, attr=attr, directed=directed)
+        if verbose:
+            print('Peak Memory : ', peak_memory_str())
+        return result
 
-        有向边：
-        ------
-            直接用Dataframe的append, 拼接在后面，然后根据重复的边，累加属性值
-
-        无向边：
-        ------
-            图2中的边分为2类：
-                原图（edgedata1）中存在的边:
-                    又分为2类，正向存在的(图1种是3-4 和 图2中是3-4)
-                    反向存在的（如图1中是3-5，图2中5-3）
-                    -- 找到图2中这类边，将反向的边，source和target互换
-                    -- 然后append这些边
-                原图（edgedata1）中不存在的边：
-                    直接append
-        累加属性：
-        --------
-            根据source 和 target 找到重复的数据，然后累加
-
-        :param edgedata_1: Dataframe, 边数据1
-        :param edgedata_2: Dataframe, 边数据2
-        :param dirceted: bool，是否为有向
-        :param accumulate_attr: 需要累加的属性，str 或 list
-        :return: Dataframe，合并以后的数据
-        '''
-
-        def _merge_directed(edgedata1, edgedata2):
-            edgedata_merge = pd.concat([edgedata1, edgedata2],
-                                       axis=0,
-                                       ignore_index=True)
-            return edgedata_merge
-
-        def _merge_undirected(edgedata1, edgedata2):
-            def _add_edge(edgedata_):
-                edgedata = edgedata_.copy()
-                source_str = edgedata['Source'].astype(dtype=str)
-                target_str = edgedata['Target'].astype(dtype=str)
-                edgedata['edges_pd'] = source_str + '-' + target_str
-                edgedata['edges_nd'] = target_str + '-' + source_str
-                return edgedata
-
-            edgedata1 = _add_edge(edgedata1)
-            edgedata2 = _add_edge(edgedata2)
-
-            # 原edge中已经存在的边
-            idx_pd = edgedata2['edges_pd'].isin(edgedata1['edges_pd'])
-            idx_nd = edgedata2['edges_nd'].isin(edgedata1['edges_pd'])
-            idx_exist = idx_nd | idx_pd
-            idx_new = ~ idx_exist
-
-            # 反向的边先转为正向
-            tmp = edgedata2.loc[idx_nd, 'Target'].copy()
-            edgedata2.loc[idx_nd, 'Target'] = edgedata2.loc[idx_nd, 'Source']
-            edgedata2.loc[idx_nd, 'Source'] = tmp
-
-            edge_exist = edgedata2[idx_exist]
-            edge_new = edgedata2[idx_new]
-
-            # 合并
-            edgedata_merge = edgedata1.append([edge_exist, edge_new],
-                                              ignore_index=True)
-            edgedata_merge = edgedata_merge.drop(['edges_pd', 'edges_nd'],
-                                                 axis=1)
-            return edgedata_merge
-
-        if accumulate_attr == 'all':
-            accumulate_attr = edgedata_1.columns.copy()
-            accumulate_attr = accumulate_attr.drop(['Source', 'Target'])
-        elif isinstance(accumulate_attr, str):
-            accumulate_attr = [accumulate_attr, ]
-
-        # 合并边
-        if dirceted:
-            edgedata_merge = _merge_directed(edgedata_1, edgedata_2)
+    @staticmethod
+    def component_labels(graph, directed=True):
+        '''
+        连通分量的标签（有向图为弱连通），在整数编码的边数组上计算，见EdgeTable.component_labels
+        :param graph: 边数据（DataFrame），EdgeTable 或 networkx.Graph/DiGraph
+        :param directed: graph为DataFrame时，是否为有向图（不影响结果）
+        :return: pd.Series, index为节点id，值为分量编号，按节点数从大到小，0为最大连通分量
+        '''
+        if isinstance(graph, EdgeTable):
+            table = graph
+        elif isinstance(graph, pd.DataFrame):
+            table = EdgeTable.from_edgedata(graph, attr=None, directed=directed)
         else:
-            edgedata_merge = _merge_undirected(edgedata_1, edgedata_2)
+            table = EdgeTable.from_networkx(graph, attr=None)
+        return pd.Series(table.component_labels(), index=table.nodes, name='component')
 
-        # 处理属性
-        if len(accumulate_attr) > 0:
-            # ---------------找到重复边-----------------
-            duplicated_last = edgedata_merge[edgedata_merge.duplicated(subset=['Source', 'Target'],
-                                                                       keep='first')].copy()
-            duplicated_first = edgedata_merge[edgedata_merge.duplicated(subset=['Source', 'Target'],
-                                                                        keep='last')].copy()
-            # ----------------累加属性------------------
-            index_first = list(duplicated_first.index)
-            duplicated_last.index = index_first
+    @staticmethod
+    def largest_component(graph, directed=True):
+        '''
+        最大连通分量（有向图为弱连通），不创建其他分量的子图
+        :param graph: 边数据（DataFrame），EdgeTable 或 networkx.Graph/DiGraph
+        :param directed: graph为DataFrame时，是否为有向图（不影响结果）
+        :return: 与输入的类型相同，DataFrame时为最大连通分量的边
+        '''
+        if isinstance(graph, EdgeTable):
+            return graph.largest_component()
+        if isinstance(graph, pd.DataFrame):
+            table = EdgeTable.from_edgedata(graph, attr=None, directed=directed)
+            labels = table.component_labels()
+            return graph[labels[table.source] == 0].copy()
+        table = EdgeTable.from_networkx(graph, attr=None)
+        labels = table.component_labels()
+        return graph.subgraph(table.nodes[labels == 0]).copy()
+
+    @staticmethod
+    def merge_edgedata(edgedata_1, edgedata_2, dirceted=True, accumulate_attr='all'):
+        '''
+        合并2个图（edges）,思路如下
 
-            edgedata_merge.loc[index_first, accumulate_attr] += duplicated_last[accumulate_attr]
+        节点统一编码为整数，每条边映射为一个整数键（无向边用(min, max)，A-B 与 B-A 的键相同），
+        然后按键合并重复的边，累加属性，其他属性保留第一次出现的值。
+        边的方向和顺序以第一次出现的边为准（即edgedata_1中的边在前）。
 
-        # ---------------去掉重复边------------------------------
-        edgedata_merge = edgedata_merge.drop_duplicates(subset=['Source', 'Target'])
+        多个边数据的合并见 merge_edgedata_stream
 
+        :param edgedata_1: Dataframe 或 EdgeTable, 边数据1
+        :param edgedata_2: Dataframe 或 EdgeTable, 边数据2
+        :param dirceted: bool，是否为有向
+        :param accumulate_attr: 需要累加的属性，str 或 list
+        :return: Dataframe 或 EdgeTable(两个都是EdgeTable时)，合并以后的数据
+        '''
+        return_edgetable = (isinstance(edgedata_1, EdgeTable)
+                            and isinstance(edgedata_2, EdgeTable))
+        edgedata_merge = NetworkUnity.merge_edgedata_stream([edgedata_1, edgedata_2],
+                                                            directed=dirceted,
+                                                            accumulate_attr=accumulate_attr,
+                                                            return_edgetable=return_edgetable)
+        if not return_edgetable:
+            columns = list(edgedata_1.columns)
+            columns += [col for col in edgedata_2.columns if col not in columns]
+            edgedata_merge = edgedata_merge[columns]
         return edgedata_merge
 
     @staticmethod
-    def calculate_graph_features(graph,centrality=False,save_path=None):
+    def merge_edgedata_stream(edgedatas, directed=True, accumulate_attr='all',
+                              chunksize=None, return_edgetable=False, **read_kwargs):
+        '''
+        合并多个图（edges），例如几百天的每日边数据
+
+        逐个（文件则逐块）读取并合并到已有的结果中，内存只与唯一边的数量有关，
+        与所有数据的总行数无关，见edgetable.EdgeMerger
+
+        :param edgedatas: iterable, 元素为 DataFrame, EdgeTable 或 文件地址(csv, parquet, feather)
+        :param directed: bool，是否为有向
+        :param accumulate_attr: 需要累加的属性，'all', str 或 list
+        :param chunksize: int, 读取csv文件时每块的行数
+        :param return_edgetable: 是否返回EdgeTable，默认返回DataFrame
+        :param read_kwargs: 读取文件的其他参数，例如sep
+        :return: Dataframe 或 EdgeTable
         '''
-        :param graph: graph对象,应该是连通的！
+        merger = EdgeMerger(directed=directed, accumulate_attr=accumulate_attr)
+        for edgedata in edgedatas:
+            if isinstance(edgedata, str):
+                merger.add_file(edgedata, chunksize=chunksize, **read_kwargs)
+            else:
+                merger.add(edgedata)
+
+        edgetable = merger.result()
+        if return_edgetable:
+            return edgetable
+        return edgetable.to_edgedata()
+
+    @staticmethod
+    def calculate_graph_features(graph,centrality=False,save_path=None,
+                                 sample_size=None, epsilon=None, seed=None, n_jobs=1,
+                                 path_samples=None, exclude=None, metrics=None,
+                                 backend='networkx', directed=True):
+        '''
+        :param graph: graph对象,应该是连通的！也可以是边数据（DataFrame 或 EdgeTable），
+                      或者多层网络（multilayer.MultilayerNetwork，逐层计算，返回DataFrame，index为层名）
         :param centrality: 是否计算中心度信息
         :param save_path: 信息保存地址
+        :param sample_size: int, 抽样近似计算介数和接近中心度时，抽样的源节点数量
+        :param epsilon: float, 抽样时允许的误差，用来确定抽样数量，与sample_size给定一个即可
+        :param seed: 抽样的随机种子
+            sample_size 和 epsilon 都为None时精确计算（默认），适用于小图；
+            抽样时增加 AveBetweennessCentralityStdErr，AveClosenessCentralityStdErr（节点标准误的平均值，
+            是平均值标准误的上界）和 CentralitySamples（抽样的源节点数量）
+        :param n_jobs: 介数和接近中心度计算的进程数，>1时源节点分块在进程池中计算，-1表示使用所有CPU，结果与串行计算一致
+        :param path_samples: int, 无向图的平均最短路径长度抽样的源节点数量，None为精确计算（全部节点对），
+                             抽样时增加 AveShortestPathLengthStdErr 和 PathSamples，
+                             见graph_metrics.average_shortest_path_length
+        :param exclude: list, 不计算的特征，例如 ['AveClusterCoefficent', 'AveShortestPathLength']，
+                        节点很多时只需要密度，度等信息，可以跳过这些耗时的特征
+        :param metrics: list, 只计算这些特征，例如 ['Node', 'Density', 'AveBetweennessCentrality']，
+                        None时由centrality决定，可用的特征见graph_metrics.list_metrics('graph')
+        :param backend:
+            'networkx'，边数据先转为networkx的图再计算
+            'sparse'，边数据保持为EdgeTable，节点数，边数，密度，度等在CSR邻接矩阵上计算，
+                      适用于百万以上节点的大图（建议同时exclude耗时的特征），见graph_metrics.py
+        :param directed: graph为DataFrame时，是否为有向图
         :return: graph的各种网络特征，pd.Series
 
         用来计算图的各种网络特征，计算时间跟图的大小相关
         大部分特征都是不加权计算的。
-        用字典来记载可能更好
+        特征的计算见graph_metrics的指标注册表，特征依赖的中间结果（例如最短路径）只计算一次
         '''
-        def _average(node_dic):
-            if len(node_dic) < 1:
-                return 0
-            else:
-                return np.average(list(node_dic.values()))
-        features = {}
-        NODE_NUM = graph.number_of_nodes()
+        import graph_metrics
+        from multilayer import MultilayerNetwork
+
+        if isinstance(graph, MultilayerNetwork):
+            return graph.graph_features(centrality=centrality, save_path=save_path,
+                                        sample_size=sample_size, epsilon=epsilon, seed=seed,
+                                        n_jobs=n_jobs, path_samples=path_samples,
+                                        exclude=exclude, metrics=metrics,
+                                        backend=backend, directed=directed)
+        if backend == 'sparse' and isinstance(graph, pd.DataFrame):
+            graph = EdgeTable.from_edgedata(graph, attr=None, directed=directed)
+        elif backend == 'networkx' and isinstance(graph, EdgeTable):
+            graph = NetworkUnity.graph_from_edgedata(graph, attr=None, directed=graph.directed)
+        elif backend == 'networkx' and not isinstance(graph, (nx.Graph, nx.DiGraph)):
+            graph = NetworkUnity.graph_from_edgedata(graph, attr=None, directed=directed)
 
-        if NODE_NUM < 1:
+        if graph.number_of_nodes() < 1:
             print('Graph is empty')
             return pd.Series()
 
-        features['Node'] = NODE_NUM
-        features['Edge'] = graph.number_of_edges()
-        features['Density'] = nx.density(graph)
-        features['AveDegree'] = _average(graph.degree())
-        # features['Diameter'] = nx.diameter(graph)
-
-        # 有向图和无向图
-        if not graph.is_directed():
-            features['Directed'] = 0
-            features['AveClusterCoefficent'] = nx.average_clustering(graph)
-            features['AveShortestPathLength'] = nx.average_shortest_path_length(graph)
-        else:
-            features['Directed'] = 1
-            features['AveInDegree'] = _average(graph.in_degree())
-            features['AveOutDegree'] = _average(graph.out_degree())
-
-        # 中心性指标
-        if centrality:
-            # 度中心性
-            node_degree_centrality = nx.degree_centrality(graph)
-            ave_degree_centrality = _average(node_degree_centrality)
-            # 特征向量中心度
-            node_eigenvector_centrality = nx.eigenvector_centrality_numpy(graph)
-            ave_eigenvector_centrality = _average(node_eigenvector_centrality)
-            #介数中心度
-            node_betweenness = nx.betweenness_centrality(graph)
-            ave_betweenness_centrality = _average(node_betweenness)
-            #接近中心度
-            node_closeness = nx.closeness_centrality(graph)
-            ave_closeness_centrality = _average(node_closeness)
-
-            features['AveDegreeCentrality'] = ave_degree_centrality
-            features['AveEigenvectorCentrality'] = ave_eigenvector_centrality
-            features['AveBetweennessCentrality'] = ave_betweenness_centrality
-            features['AveClosenessCentrality'] = ave_closeness_centrality
-
-        graph_info = pd.Series(features)
+        graph_info = graph_metrics.graph_features(graph, metrics=metrics, centrality=centrality,
+                                                  exclude=exclude, directed=directed, backend=backend,
+                                                  sample_size=sample_size, epsilon=epsilon,
+                                                  seed=seed, n_jobs=n_jobs,
+                                                  path_samples=path_samples)
         if save_path is not None:
             graph_info.to_csv(save_path,index=True,header=None)
             print('File Saved : ', save_path)
@@ -302,44 +436,80 @@ class NetworkUnity():
         return graph_info
 
     @staticmethod
-    def calculate_node_features(graph,weight=None,centrality=False, save_path=None):
+    def window_graph_features(edgedata, size, step=None, time='Time', attr='Weight', directed=True,
+                              metrics=None, start=None, end=None, save_path=None, **feature_kwargs):
+        '''
+        按时间窗口计算网络特征，窗口移动时增量加入和移除边，不为每个窗口重建网络，见temporal.py
+        :param edgedata: DataFrame, 包含[Source,Target,time,attr] 或 temporal.TemporalGraph
+        :param size: 窗口长度，时间为datetime时为Timedelta或str，例如'1h'
+        :param step: 步长，None时等于size（滚动窗口），小于size时为滑动窗口
+        :param time: 时间列
+        :param attr: 权重列，None时权重为窗口内的次数
+        :param directed: 有向图还是无向图
+        :param metrics: list, 需要计算的指标，见TemporalGraph.iter_features
+        :param start, end: 第一个窗口的起始时间和最后一个窗口起始时间的上限
+        :param save_path: 信息保存地址，给定时返回所有窗口的DataFrame，否则返回每个窗口的Series的生成器
+        :param feature_kwargs: 传给graph_metrics.graph_features的参数
+        :return: generator of pd.Series 或 DataFrame
         '''
-        :param graph: networkx.Graph \ Digraph
+        from temporal import TemporalGraph
+
+        if isinstance(edgedata, TemporalGraph):
+            temporal_graph = edgedata
+        else:
+            temporal_graph = TemporalGraph(edgedata, time=time, attr=attr, directed=directed)
+        features = temporal_graph.iter_features(size, step=step, start=start, end=end,
+                                                metrics=metrics, **feature_kwargs)
+        if save_path is None:
+            return features
+
+        features = pd.DataFrame(list(features))
+        features.to_csv(save_path, index=False)
+        print('File Saved : ', save_path)
+        return features
+
+    @staticmethod
+    def calculate_node_features(graph,weight=None,centrality=False, save_path=None,
+                                backend='networkx', directed=True,
+                                sample_size=None, epsilon=None, seed=None, n_jobs=1,
+                                metrics=None):
+        '''
+        :param graph: networkx.Graph \ Digraph，也可以是边数据（DataFrame 或 EdgeTable）
         :param weight: str, 某些指标是否使用边的权重，weight = 'Weight'
         :param centrality: 是否计算中心性指标
         :param save_path: 保存地址
+        :param backend:
+            'networkx'，采用networkx计算
+            'sparse'，从边数据创建scipy.sparse的CSR邻接矩阵，向量化计算度，入度，出度，加权度，
+                      中心性指标，适用于百万以上节点的大图，见graph_metrics.py
+        :param directed: graph为DataFrame时，是否为有向图
+        :param sample_size: int, 抽样近似计算介数和接近中心度时，抽样的源节点数量
+        :param epsilon: float, 抽样近似计算时允许的误差，用来确定抽样数量，与sample_size给定一个即可
+        :param seed: 抽样的随机种子
+            sample_size 和 epsilon 都为None时精确计算（默认），
+            抽样时增加 *StdErr 列，表示估计值的标准误
+        :param n_jobs: 介数和接近中心度计算的进程数，>1时源节点分块在进程池中计算，-1表示使用所有CPU，
+                       结果与串行计算一致
+        :param metrics: list, 只计算这些指标，例如 ['Degree', 'BetweennessCentrality']，
+                        None时由centrality和weight决定，可用的指标见graph_metrics.list_metrics('node')，
+                        介数和接近中心度共用同一次最短路径计算
         :return: DataFrame, node_features
         '''
-        if graph.number_of_nodes() < 1:
-            return pd.DataFrame()
+        import graph_metrics
 
-        features = {}
-        features['Degree'] = nx.degree(graph)
+        if backend == 'networkx' and not isinstance(graph, (nx.Graph, nx.DiGraph)):
+            graph = NetworkUnity.graph_from_edgedata(graph, attr=weight, directed=directed)
+        elif backend == 'sparse' and isinstance(graph, pd.DataFrame):
+            graph = EdgeTable.from_edgedata(graph, attr=weight, directed=directed)
 
-        if graph.is_directed():
-            features['InDegree'] = graph.in_degree()
-            features['OutDegree'] = graph.out_degree()
-
-        if centrality:
-            features['DegreeCentrality'] = nx.degree_centrality(graph)
-            features['BetweennessCentrality'] = nx.betweenness_centrality(graph)
-            features['EigenvectorCentrality'] = nx.eigenvector_centrality_numpy(graph)
-            features['ClosenessCentrality'] = nx.closeness_centrality(graph)
-
-        if weight is not None:
-
-            features['WeightedDegree'] = nx.degree(graph,weight=weight)
-            if graph.is_directed():
-                features['WeightedInDegree'] = graph.in_degree(weight=weight)
-                features['WeightedOutDegree'] = graph.out_degree(weight=weight)
-
-            if centrality:
-                features['WeightedBetweennessCentrality'] = nx.betweenness_centrality(graph,weight=weight)
-                features['WeightedEigenvectorCentrality'] = nx.eigenvector_centrality_numpy(graph,weight=weight)
-
-        node_features = pd.DataFrame(features)
-        node_features['Id'] = node_features.index
+        number_of_nodes = graph.number_of_nodes()
+        if number_of_nodes < 1:
+            return pd.DataFrame()
 
+        node_features = graph_metrics.node_features(graph, metrics=metrics, weight=weight,
+                                                    centrality=centrality, backend=backend,
+                                                    sample_size=sample_size, epsilon=epsilon,
+                                                    seed=seed, n_jobs=n_jobs)
         if save_path is not None:
             node_features.to_csv(save_path,header=None)
             print('File Saved : ', save_path)
@@ -347,30 +517,36 @@ class NetworkUnity():
         return node_features
 
     @staticmethod
-    def degree_filter(graph,lower=None,upper=None):
+    def degree_filter(graph,lower=None,upper=None,iterative=False,directed=True):
         '''
-        :param graph: Networkx.Graph/DiGraph
+        :param graph: Networkx.Graph/DiGraph, 边数据（DataFrame）或 EdgeTable
         :param lower: int/float，the lower limitation of degree
         :param upper: int/float，the upper limitation of degree
-        :return: graph after filter
-        '''
-        node_degree = graph.degree()
-        nodes_all = list(graph.nodes())
-        print('Node num: ',graph.number_of_nodes())
-
-        data = pd.DataFrame(list(node_degree.items()),columns=['Id','Degree'])
+        :param iterative: 是否迭代筛选到不动点，去掉节点后度低于lower的邻居也会被去掉（k-core），
+                          False时只按原来的度筛选一次
+        :param directed: graph为DataFrame时，是否为有向图
+        :return: 筛选后的副本，与输入的类型相同，不修改原来的graph
 
-        if lower is not None:
-            data = data[data['Degree'] >= lower]
-        if upper is not None:
-            data = data[data['Degree'] <= upper]
+        度在边表上用bincount计算，见EdgeTable.degree_mask；
+        networkx的图只复制保留下来的节点和边
+        '''
+        if isinstance(graph, EdgeTable):
+            table = graph
+        elif isinstance(graph, pd.DataFrame):
+            table = EdgeTable.from_edgedata(graph, attr=None, directed=directed)
+        else:
+            table = EdgeTable.from_networkx(graph, attr=None)
 
-        nodes_saved = list(data['Id'])
-        nodes_drop = set(nodes_all).difference(nodes_saved)
-        graph.remove_nodes_from(nodes_drop)
-        print('Node num: ',graph.number_of_nodes())
+        node_saved = table.degree_mask(lower=lower, upper=upper, iterative=iterative)
+        print('Node num: ', table.number_of_nodes())
+        print('Node num: ', int(node_saved.sum()))
 
-        return graph
+        if isinstance(graph, EdgeTable):
+            return graph.node_subset(node_saved)
+        if isinstance(graph, pd.DataFrame):
+            edge_saved = node_saved[table.source] & node_saved[table.target]
+            return graph[edge_saved].copy()
+        return graph.subgraph(table.nodes[node_saved]).copy()
 
     @staticmethod
     def draw_graph(graph,nodes=None):
@@ -392,79 +568,49 @@ class NetworkUnity():
 
     @staticmethod
     def community_detect(graph=None,edgedata=None,directed=True,
-                         use_method=1, use_weight=None):
+                         use_method=1, use_weight=None, **kwargs):
         '''
-        :param edgedata: DataFrame, 边的数据
+        :param edgedata: 边的数据，DataFrame 或 EdgeTable，使用最大连通子图
         :param graph: Networkx.Graph/DiGraph，与edgedata给定一个就行
         :param directed: Bool, 是否有向
-        :param use_method: Int, 使用方法
-        :param weight_name: String, 社区发现算法是否使用边权重，如果使用,例如weight_name='Weight'
-        :return: 带有社区信息的节点表格
-        '''
-        #创建igraph.Graph类
-        if graph is None and edgedata is not None:
-            graph = NetworkUnity.get_graph_from_edgedata(edgedata,
-                                                         attr=use_weight,
-                                                         directed=directed,
-                                                         connected_component=True)
-
-        gr = graphistry.bind(source='Source', destination='Target', node='Id', edge_weight='Weight').graph(graph)
-        edgedata = NetworkUnity.networkx2pandas(graph)
-        ig = gr.pandas2igraph(edgedata, directed=directed)
-
-        #--------------------------------------------------------
-        #如果使用边的数据edgedata
-        # gr = graphistry.bind(source='Source',destination='Target',edge_weight='Weight').edges(edgedata)
-        # nodes = NetworkUnity.get_nodes_from_edgedata(edgedata)
-        # gr = gr.bind(node='Id').nodes(nodes)
-        # ig = gr.pandas2igraph(edgedata,directed=directed)
-        # --------------------------------------------------------
+        :param use_method: 使用方法，方法名（例如'multilevel', 'leiden', 'infomap'）或原来的编号，
+                           见community.list_methods() 和 community.LEGACY_METHODS
+        :param use_weight: String, 社区发现算法是否使用边权重，如果使用,例如use_weight='Weight'
+        :param kwargs: 传给社区发现方法的参数
+        :return: 带有社区信息的节点表格，['Id','modularity_class']
 
-        '''
         关于聚类的方法，
         参考http://pythonhosted.org/python-igraph/igraph.Graph-class.html
-        希望以后可以对每一个算法添加一些简单的介绍
+        边数据只整数编码一次，直接创建igraph.Graph，见community.py
         '''
+        import community
 
-        method_dict = {
-            0:'''ig.community_fastgreedy(weights='%s')'''%str(use_weight),
-            1:'''ig.community_infomap(edge_weights='%s',trials=10)'''%str(use_weight),
-            2:'''ig.community_leading_eigenvector_naive(clusters=10)''',
-            3:'''ig.community_leading_eigenvector(clusters=10)''',
-            4:'''ig.community_label_propagation(weights='%s')'''%str(use_weight),
-            5:'''ig.community_multilevel(weights='%s')'''%str(use_weight),
-            6:'''ig.community_optimal_modularity()''',
-            7:'''ig.community_edge_betweenness()''',
-            8:'''ig.community_spinglass()''',
-            }
-
-        detect_method = method_dict.get(use_method)
-
-        if use_weight is None:
-            #如果为None,需要把公式里面的冒号去掉,注意如果有多个None,这个方法需要重新写
-            detect_method= detect_method.replace('\'','')
+        if graph is None and edgedata is not None:
+            if isinstance(edgedata, EdgeTable):
+                table = edgedata
+            else:
+                table = EdgeTable.from_edgedata(edgedata, attr=use_weight, directed=directed)
+            table = table.largest_component()
+        else:
+            table = EdgeTable.from_networkx(graph, attr=use_weight)
+        # 与networkx的图一致，重复的边只保留一条
+        table = table.aggregate(accumulate_attr=None)
 
         # -------------开始实施社区发现算法-----------
-        print('社区发现方法： ',detect_method)
-        res_community = eval(detect_method)
-        #将社区信息保存到节点信息中
-        ig.vs['modularity_class'] = res_community.membership
-        #将节点信息转化为Dataframe表
-        edgedata_,nodedata = gr.igraph2pandas(ig)
-        modularity = res_community.modularity
-
-        print(res_community.summary())
-        print('community size:\n', res_community.sizes())
-        print('modularity:\n', modularity)
+        print('社区发现方法： ', community.LEGACY_METHODS.get(use_method, use_method))
+        cluster_result, membership = community.detect_communities(table, method=use_method,
+                                                                  weight=use_weight, **kwargs)
+        print('community size:\n', np.bincount(membership))
+        print('modularity:\n', community.modularity(table, membership, weight=use_weight))
 
-        return nodedata
+        return cluster_result
 
     @staticmethod
     def modularity(cluster_result,edgedata=None,graph=None,
                        directed=True, edge_weight='Weight'):
         '''
         :param cluster_result: 聚类结果，参考gephi输出的表，[Id,modulraity_class]
-        :param edgedata: 边数据，与graph给定其中一个
+        :param edgedata: 边数据（DataFrame 或 EdgeTable），与graph给定其中一个
         :param graph: networkx中的Graph/DiGraph
         :param directed: 是否为有向图
         :param edge_weight:
@@ -475,56 +621,66 @@ class NetworkUnity():
         ps：
             1.edgedata 和 graph 至少要给定一个
             2.与gephi中计算的模块度结果已经对比过了，结果一致
+            3.在整数编码的边数组上计算，见community.modularity；
+              网络中的节点必须都在cluster_result中，否则报错
         '''
-        import graphistry
+        import community
 
         if edgedata is None and graph is not None:
-            edgedata = NetworkUnity.networkx2pandas(graph)
+            table = EdgeTable.from_networkx(graph, attr=edge_weight)
+        elif isinstance(edgedata, EdgeTable):
+            table = edgedata
+        else:
+            table = EdgeTable.from_edgedata(edgedata, attr=edge_weight, directed=directed)
 
-        gr = graphistry.bind(source='Source', destination='Target',
-                             node='Id',edge_weight=edge_weight)
+        membership = community.membership_codes(table, cluster_result)
+        return community.modularity(table, membership, weight=edge_weight)
 
-        ig = gr.pandas2igraph(edgedata,directed=directed)
-        nodes = pd.DataFrame(list(ig.vs['Id']), columns=['Id'])
-        community_data = pd.merge(nodes, cluster_result, left_on='Id', right_on='Id', how='left')
+    @staticmethod
+    def modularity_tracker(cluster_result,edgedata=None,graph=None,
+                           directed=True, edge_weight='Weight'):
+        '''
+        模块度的增量更新，参数与modularity相同，见community.ModularityTracker
+        :return: ModularityTracker, tracker.move(node, new_class) 返回移动节点后的模块度
+        '''
+        import community
 
-        if edge_weight is None:
-            Q = ig.modularity(list(community_data['modularity_class']),weights=None)
+        if edgedata is None and graph is not None:
+            table = EdgeTable.from_networkx(graph, attr=edge_weight)
+        elif isinstance(edgedata, EdgeTable):
+            table = edgedata
         else:
-            Q = ig.modularity(list(community_data['modularity_class']),weights=list(ig.es[edge_weight]))
-        return Q
+            table = EdgeTable.from_edgedata(edgedata, attr=edge_weight, directed=directed)
+        return community.ModularityTracker(table, cluster_result, weight=edge_weight)
 
     @staticmethod
-    def get_confusion_matrix(result_1, result_2, return_df=True):
+    def get_confusion_matrix(result_1, result_2, return_df=True, sparse=False):
         '''
         计算两个社区划分的混淆矩阵
 
         :param result_1: 划分结果1，包含[Id，modularity_class]; DataFrame；
         :param result_2: 划分结果2,形式同result_1; DataFrame
         :param return_df: 是否返回DataFrame形式
+        :param sparse: 是否返回稀疏的结果，
+                       return_df=True时为稀疏的DataFrame，否则为scipy.sparse.csr_matrix，
+                       社区很多时（例如上万个）使用
         :return: confusition matrix based on two classify result
-        '''
 
-        result_1.columns = ['Id', 'modularity_class']
-        result_2.columns = ['Id', 'modularity_class']
-        clusters_1 = pd.unique(result_1['modularity_class'])
-        clusters_2 = pd.unique(result_2['modularity_class'])
-        NUM_1 = len(clusters_1)
-        NUM_2 = len(clusters_2)
-        clusters_1.sort()
-        clusters_2.sort()
+        按第一列（节点id），第二列（社区）读取，不修改result_1, result_2的列名；
+        列联表由对齐后的社区编码一次生成，见partition.py
+        '''
+        import partition
 
-        def _get_matrix():
-            for cluster_1 in clusters_1:
-                for cluster_2 in clusters_2:
-                    nodes_1 = result_1.loc[result_1['modularity_class'] == cluster_1, 'Id']
-                    nodes_2 = result_2.loc[result_2['modularity_class'] == cluster_2, 'Id']
-                    union_nodes = np.intersect1d(nodes_1, nodes_2)
-                    yield len(union_nodes)
+        codes_1, codes_2, clusters_1, clusters_2 = partition.align_partitions(result_1, result_2)
+        matrix = partition.contingency_matrix(codes_1, codes_2,
+                                              shape=(len(clusters_1), len(clusters_2)))
 
-        matrix = list(_get_matrix())
-        matrix = np.reshape(np.asarray(matrix), newshape=(NUM_1, NUM_2))
+        if sparse:
+            if return_df:
+                matrix = pd.DataFrame.sparse.from_spmatrix(matrix, index=clusters_1, columns=clusters_2)
+            return matrix
 
+        matrix = matrix.toarray()
         if return_df:
             matrix = pd.DataFrame(matrix, index=clusters_1, columns=clusters_2)
 
@@ -541,32 +697,16 @@ class NetworkUnity():
             跟sklearn.metric.normalized_mutual_info_score 的结果一致！！
             那你写这玩意有啥用！！
 
-        :param confusion_matrix: 混淆矩阵
+        :param confusion_matrix: 混淆矩阵，DataFrame，ndarray 或 scipy.sparse（见get_confusion_matrix）
         :return: 社区划分的相似度
-        '''
-
-        confusion_matrix = np.asarray(confusion_matrix)
-        NUM_NODES = np.sum(confusion_matrix, axis=None)
-
-        nums_a = np.sum(confusion_matrix, axis=1)  # 按列相加
-        nums_b = np.sum(confusion_matrix, axis=0)  # 按行相加
-        print(np.all(nums_a), np.all(nums_b), NUM_NODES)
-
-        def _cal_entropy(info):
-            print(np.all(info / NUM_NODES))
-            return np.sum(np.multiply(info, np.log(info / NUM_NODES)))
 
-        # 分母计算
-        entropy_a = _cal_entropy(nums_a)
-        entropy_b = _cal_entropy(nums_b)
-        # 分子计算
-        both_info = np.dot(np.asmatrix(nums_a).T, np.asmatrix(nums_b))
-
-        joint_mat = np.multiply(confusion_matrix,
-                                np.log(confusion_matrix / both_info * NUM_NODES + 1e-10))
-        mutual_info = np.sum(joint_mat, axis=None) * (-2)
+        只使用混淆矩阵的非零元素和行列的和，不需要K1*K2的外积，见partition.contingency_scores
+        '''
+        import partition
 
-        similarity = mutual_info / (entropy_a + entropy_b)
+        similarity = partition.contingency_scores(confusion_matrix,
+                                                  measures=['normalized_mutual_info_score'])
+        similarity = similarity['normalized_mutual_info_score']
         print('Similarity ： ', similarity)
 
         return similarity
@@ -583,29 +723,28 @@ class NetworkUnity():
             * adjusted_rand_score
             * fowlkes_mallows_score
 
+        所有的指标都由同一个列联表计算，结果与sklearn一致，见partition.py
+        :param labels_true: 标签数组，或cluster_result（['Id','modularity_class']，按节点id对齐）
+        :param labels_pred: 形式同labels_true；
+                            也可以是多个划分（dict，list 或 二维数组），批量与labels_true比较
+        :param use_common_measure: 只计算 adjusted_rand_score 和 normalized_mutual_info_score
+        :return: pd.Series，批量比较时为DataFrame（每行一个划分）
         '''
-        from sklearn import metrics
-
-        measures = ['adjusted_rand_score',
-                    'normalized_mutual_info_score',
-                    'fowlkes_mallows_score',
-                    'v_measure_score',
-                    'calinski_harabaz_score',
-                    'silhouette_score']
+        import partition
 
         common_measures = ['adjusted_rand_score',
                            'normalized_mutual_info_score', ]
-        scores = {}
-        if use_common_measure:
-            measures = common_measures
-        for each in measures:
-            try:
-                scores[each] = getattr(metrics, each)(labels_true, labels_pred)
-            except (AttributeError, ValueError) as e:
-                print(e)
+        measures = common_measures if use_common_measure else partition.MEASURES
 
-        scores = pd.Series(scores)
-        return scores
+        batch = isinstance(labels_pred, dict) or \
+            (isinstance(labels_pred, (list, tuple)) and len(labels_pred) > 0 and
+             isinstance(labels_pred[0], (pd.DataFrame, pd.Series, np.ndarray, list))) or \
+            (isinstance(labels_pred, np.ndarray) and labels_pred.ndim == 2)
+        if batch:
+            return partition.compare_partitions(labels_true, labels_pred, measures=measures)
+
+        scores = partition.compare_partitions(labels_true, [labels_pred], measures=measures)
+        return scores.iloc[0]
 
 
 # ------------------- examples --------------------------
@@ -656,6 +795,32 @@ def main_example():
     print(nodedata_1)
 
 
+def benchmark_as_undirected_edgedata(sizes=(10**4, 10**5, 10**6, 10**7), seed=0):
+    '''
+    as_undirected_edgedata 的耗时测试，边数增加10倍，耗时也应该大致增加10倍（线性）
+
+    :param sizes: 测试的边数
+    :param seed: 随机种子
+    :return: DataFrame, [Edge, Time, TimePerMillionEdges]
+    '''
+    import time
+
+    rng = np.random.RandomState(seed)
+    records = []
+    for num_edges in sizes:
+        num_nodes = max(num_edges // 10, 2)
+        edgedata = pd.DataFrame({'Source': rng.randint(0, num_nodes, num_edges),
+                                 'Target': rng.randint(0, num_nodes, num_edges),
+                                 'Weight': rng.rand(num_edges)})
+        time_1 = time.perf_counter()
+        NetworkUnity.as_undirected_edgedata(edgedata)
+        cost = time.perf_counter() - time_1
+        records.append({'Edge': num_edges,
+                        'Time': cost,
+                        'TimePerMillionEdges': cost / num_edges * 10**6})
+        print('[as_undirected_edgedata] edges: {}, time: {:.3f}s'.format(num_edges, cost))
+    return pd.DataFrame(records, columns=['Edge', 'Time', 'TimePerMillionEdges'])
+
 
 if __name__ == '__main__':
     main_example()
@@ -0,0 +1,278 @@
+#-*- coding:utf-8 -*-
+
+'''
+目的：
+    社区划分（聚类结果）之间的比较，列联表（混淆矩阵）只计算一次，用稀疏矩阵保存
+
+方法：
+    * 两个划分结果按节点id对齐，社区整数编码 - align_partitions
+    * 稀疏列联表 - contingency_matrix
+    * 从列联表计算各种相似度（NMI, ARI, AMI, FMI, V-measure） - contingency_scores
+    * 两个划分的相似度 - compare_labels
+    * 一个参考划分与多个划分的相似度（批量） - compare_partitions
+
+数据：
+    cluster_result
+        DataFrame;
+        社区划分的结果，第一列为节点id，第二列为社区，例如['Id','modularity_class']
+
+备注：
+    * 2026.10 - 从NetworkUnity.get_confusion_matrix中分离出来，
+                列联表由(社区1, 社区2)的编码对一次生成coo_matrix，不再对每一对社区求交集
+              - 相似度都由同一个稀疏列联表计算，只使用非零元素和行列的和，
+                指标名与sklearn.metrics一致，结果与sklearn一致（NMI为算术平均的规范化）
+
+'''
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+
+def align_partitions(result_1, result_2):
+    '''
+    两个划分结果按节点id对齐（只保留两个结果中都有的节点），社区按排序后的顺序编码
+    :param result_1: DataFrame, 第一列为节点id，第二列为社区
+    :param result_2: DataFrame, 形式同result_1
+    :return: (codes_1, codes_2, clusters_1, clusters_2)
+        codes_1, codes_2: ndarray, 对齐后每个节点的社区编码
+        clusters_1, clusters_2: ndarray, 编码 -> 社区，包括没有共同节点的社区
+    '''
+    def _encode(result):
+        pairs = pd.DataFrame({'Id': result.iloc[:, 0].values,
+                              'modularity_class': result.iloc[:, 1].values}).drop_duplicates()
+        clusters = np.sort(pd.unique(pairs['modularity_class']))
+        pairs['code'] = pd.Index(clusters).get_indexer(pairs['modularity_class'])
+        return pairs[['Id', 'code']], clusters
+
+    pairs_1, clusters_1 = _encode(result_1)
+    pairs_2, clusters_2 = _encode(result_2)
+    both = pd.merge(pairs_1, pairs_2, on='Id', how='inner', suffixes=('_1', '_2'))
+    return both['code_1'].values, both['code_2'].values, clusters_1, clusters_2
+
+
+def contingency_matrix(codes_1, codes_2, shape=None):
+    '''
+    稀疏列联表，O(N)，只保存非零的元素
+    :param codes_1, codes_2: ndarray, 每个节点在两个划分中的社区编码
+    :param shape: (K1, K2)，默认为编码的最大值+1
+    :return: scipy.sparse.csr_matrix, 元素(i, j)为同时属于社区i和社区j的节点数
+    '''
+    codes_1 = np.asarray(codes_1)
+    codes_2 = np.asarray(codes_2)
+    if shape is None:
+        shape = (codes_1.max() + 1 if len(codes_1) > 0 else 0,
+                 codes_2.max() + 1 if len(codes_2) > 0 else 0)
+    matrix = sp.coo_matrix((np.ones(len(codes_1), dtype=np.int64), (codes_1, codes_2)), shape=shape)
+    return matrix.tocsr()
+
+
+# sklearn.metrics 中的名字
+MEASURES = ['adjusted_rand_score',
+            'normalized_mutual_info_score',
+            'adjusted_mutual_info_score',
+            'fowlkes_mallows_score',
+            'v_measure_score',
+            'homogeneity_score',
+            'completeness_score',
+            'mutual_info_score']
+
+
+def _entropy(counts, num):
+    '''按计数计算熵（自然对数）'''
+    counts = counts[counts > 0].astype(np.float64)
+    return -np.sum(counts / num * np.log(counts / num))
+
+
+def _mutual_info(values, row_sums, col_sums, rows, cols, num):
+    '''列联表非零元素(values, rows, cols)的互信息'''
+    values = values.astype(np.float64)
+    outer = row_sums[rows].astype(np.float64) * col_sums[cols]
+    return max(np.sum(values / num * np.log(values * num / outer)), 0.0)
+
+
+def log_factorials(num):
+    '''log(k!), k = 0..num，批量比较时只计算一次'''
+    from scipy.special import gammaln
+    return gammaln(np.arange(int(num) + 1, dtype=np.float64) + 1)
+
+
+def expected_mutual_info(row_sums, col_sums, num, log_factorial=None):
+    '''
+    随机划分（超几何分布）下互信息的期望，用于AMI
+    只与行和a_i，列和b_j有关，按不同的(a, b)取值分组计算后乘以出现次数，
+    对每一个a，所有b的n_ij取值范围拼接为一个数组向量化计算，阶乘的对数查表
+    :param log_factorial: log_factorials(num)，None时计算
+    :return: float
+    '''
+    num = int(num)
+    if log_factorial is None:
+        log_factorial = log_factorials(num)
+    values_a, counts_a = np.unique(row_sums[row_sums > 0].astype(np.int64), return_counts=True)
+    values_b, counts_b = np.unique(col_sums[col_sums > 0].astype(np.int64), return_counts=True)
+    log_b = np.log(values_b)
+    emi = 0.0
+    for a, count_a in zip(values_a, counts_a):
+        low = np.maximum(1, a + values_b - num)
+        high = np.minimum(a, values_b)
+        lengths = np.maximum(high - low + 1, 0)
+        group = np.repeat(np.arange(len(values_b)), lengths)
+        if len(group) < 1:
+            continue
+        nij = np.repeat(low - np.cumsum(lengths) + lengths, lengths) + np.arange(len(group))
+        b = values_b[group]
+
+        log_prob = (log_factorial[a] + log_factorial[b] + log_factorial[num - a] + log_factorial[num - b] -
+                    log_factorial[num] - log_factorial[nij] - log_factorial[a - nij] -
+                    log_factorial[b - nij] - log_factorial[num - a - b + nij])
+        terms = nij / num * (np.log(num * nij) - np.log(a) - log_b[group]) * np.exp(log_prob)
+        emi += count_a * np.dot(np.bincount(group, weights=terms, minlength=len(values_b)), counts_b)
+    return emi
+
+
+def contingency_scores(matrix, measures=None, log_factorial=None):
+    '''
+    :param matrix: 列联表，scipy.sparse，ndarray 或 DataFrame，行为真实划分，列为预测划分
+    :param measures: list, 计算的指标，默认为MEASURES
+    :param log_factorial: AMI使用的log_factorials(节点数)，批量比较时共用
+    :return: pd.Series
+    '''
+    if isinstance(matrix, pd.DataFrame):
+        matrix = matrix.sparse.to_coo() if hasattr(matrix, 'sparse') and \
+            all(isinstance(dtype, pd.SparseDtype) for dtype in matrix.dtypes) else matrix.values
+    matrix = sp.coo_matrix(matrix)
+    matrix.sum_duplicates()
+    nonzero = matrix.data != 0
+    values, rows, cols = matrix.data[nonzero], matrix.row[nonzero], matrix.col[nonzero]
+    row_sums = np.bincount(rows, weights=values, minlength=matrix.shape[0])
+    col_sums = np.bincount(cols, weights=values, minlength=matrix.shape[1])
+    num = values.sum()
+    measures = MEASURES if measures is None else measures
+
+    num_rows = np.count_nonzero(row_sums)
+    num_cols = np.count_nonzero(col_sums)
+    # 只有一个社区（或没有节点）时，两个划分一致
+    trivial = (num_rows == num_cols == 1) or num_rows == num_cols == 0
+    eps = np.finfo(np.float64).eps
+
+    scores = {}
+    if num > 0:
+        mutual_info = _mutual_info(values, row_sums, col_sums, rows, cols, num)
+        entropy_rows = _entropy(row_sums, num)
+        entropy_cols = _entropy(col_sums, num)
+    else:
+        mutual_info = entropy_rows = entropy_cols = 0.0
+
+    if 'mutual_info_score' in measures:
+        scores['mutual_info_score'] = mutual_info
+    if 'normalized_mutual_info_score' in measures:
+        normalizer = max((entropy_rows + entropy_cols) / 2, eps)
+        scores['normalized_mutual_info_score'] = 1.0 if trivial else mutual_info / normalizer
+    if 'adjusted_mutual_info_score' in measures:
+        if trivial:
+            scores['adjusted_mutual_info_score'] = 1.0
+        else:
+            if log_factorial is None or len(log_factorial) <= num:
+                log_factorial = log_factorials(num)
+            emi = expected_mutual_info(row_sums, col_sums, num, log_factorial=log_factorial)
+            denominator = (entropy_rows + entropy_cols) / 2 - emi
+            denominator = min(denominator, -eps) if denominator < 0 else max(denominator, eps)
+            scores['adjusted_mutual_info_score'] = (mutual_info - emi) / denominator
+
+    homogeneity = 1.0 if entropy_rows == 0 else mutual_info / entropy_rows
+    completeness = 1.0 if entropy_cols == 0 else mutual_info / entropy_cols
+    if 'homogeneity_score' in measures:
+        scores['homogeneity_score'] = homogeneity
+    if 'completeness_score' in measures:
+        scores['completeness_score'] = completeness
+    if 'v_measure_score' in measures:
+        total = homogeneity + completeness
+        scores['v_measure_score'] = 0.0 if total == 0 else 2.0 * homogeneity * completeness / total
+
+    # 节点对的计数，Python int 避免溢出
+    sum_squares = int(np.dot(values, values))
+    row_squares = int(np.dot(row_sums, row_sums))
+    col_squares = int(np.dot(col_sums, col_sums))
+    num = int(num)
+    if 'adjusted_rand_score' in measures:
+        true_positive = sum_squares - num
+        false_positive = row_squares - sum_squares
+        false_negative = col_squares - sum_squares
+        true_negative = num ** 2 - false_positive - false_negative - sum_squares
+        if false_negative == 0 and false_positive == 0:
+            scores['adjusted_rand_score'] = 1.0
+        else:
+            scores['adjusted_rand_score'] = 2.0 * (true_positive * true_negative - false_negative * false_positive) / (
+                (true_positive + false_negative) * (false_negative + true_negative) +
+                (true_positive + false_positive) * (false_positive + true_negative))
+    if 'fowlkes_mallows_score' in measures:
+        tk, pk, qk = sum_squares - num, row_squares - num, col_squares - num
+        scores['fowlkes_mallows_score'] = np.sqrt(tk / pk) * np.sqrt(tk / qk) if tk != 0 else 0.0
+
+    return pd.Series(scores).reindex([name for name in measures if name in scores])
+
+
+def _codes(labels):
+    '''标签数组（或cluster_result的第二列）转为整数编码'''
+    if isinstance(labels, pd.DataFrame):
+        labels = labels.iloc[:, 1]
+    codes, uniques = pd.factorize(np.asarray(labels))
+    return codes, len(uniques)
+
+
+def compare_labels(labels_true, labels_pred, measures=None):
+    '''
+    两个划分的相似度，标签按位置对应（与sklearn相同）
+    :param labels_true, labels_pred: 标签数组
+    :param measures: list, 默认为MEASURES
+    :return: pd.Series
+    '''
+    codes_true, num_true = _codes(labels_true)
+    codes_pred, num_pred = _codes(labels_pred)
+    if len(codes_true) != len(codes_pred):
+        raise ValueError('两个划分的节点数不同：{}, {}'.format(len(codes_true), len(codes_pred)))
+    matrix = contingency_matrix(codes_true, codes_pred, shape=(num_true, num_pred))
+    return contingency_scores(matrix, measures=measures)
+
+
+def compare_partitions(reference, candidates, measures=None):
+    '''
+    一个参考划分与多个划分的相似度，参考划分只编码一次
+    :param reference: 标签数组，或cluster_result（DataFrame，按节点id对齐）
+    :param candidates: dict(名字 -> 标签数组 或 cluster_result)，list，或二维数组（每行一个划分）
+    :param measures: list, 默认为MEASURES
+    :return: DataFrame, 每行一个候选划分，每列一个指标
+    '''
+    if isinstance(candidates, dict):
+        names, candidates = list(candidates.keys()), list(candidates.values())
+    else:
+        candidates = list(candidates)
+        names = list(range(len(candidates)))
+
+    by_id = isinstance(reference, pd.DataFrame)
+    if by_id:
+        reference = pd.DataFrame({'Id': reference.iloc[:, 0].values,
+                                  'code': pd.factorize(reference.iloc[:, 1])[0]})
+        num_reference = reference['code'].max() + 1 if len(reference) > 0 else 0
+    else:
+        codes_reference, num_reference = _codes(reference)
+
+    results = []
+    log_factorial = None
+    if measures is None or 'adjusted_mutual_info_score' in measures:
+        log_factorial = log_factorials(len(reference) if by_id else len(codes_reference))
+    for candidate in candidates:
+        if by_id:
+            codes, num = _codes(candidate)
+            candidate = pd.DataFrame({'Id': candidate.iloc[:, 0].values, 'candidate': codes})
+            both = pd.merge(reference, candidate, on='Id', how='inner')
+            matrix = contingency_matrix(both['code'].values, both['candidate'].values,
+                                        shape=(num_reference, num))
+        else:
+            codes, num = _codes(candidate)
+            if len(codes) != len(codes_reference):
+                raise ValueError('划分的节点数不同：{}, {}'.format(len(codes_reference), len(codes)))
+            matrix = contingency_matrix(codes_reference, codes, shape=(num_reference, num))
+        results.append(contingency_scores(matrix, measures=measures, log_factorial=log_factorial))
+
+    return pd.DataFrame(results, index=names)
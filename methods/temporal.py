@@ -0,0 +1,404 @@
+#-*- coding:utf-8 -*-
+
+'''
+目的：
+    按时间窗口计算网络特征（例如每小时的出行网络），窗口移动时只加入新进入窗口的边，
+    移除离开窗口的边，节点的度，加权度和边的重数增量更新，不为每个窗口重建网络
+
+数据：
+    TemporalGraph
+        time, source, target, weight: ndarray, 按时间排序的边（每一行为一次出行等记录）
+        edge_id: ndarray, 每一行对应的唯一边的编号（无向边中A-B与B-A为同一条边）
+        nodes: pd.Index, 编码 -> 节点id，见edgetable.NodeInterner
+
+    窗口中的网络为窗口内的边合并后的网络：重复的边只算一条，权重累加（与merge_edgedata一致），
+    只包含窗口内出现的节点
+
+方法：
+    * 加入新的边数据 - TemporalGraph.add
+    * 移动窗口（增量加入，移除边） - TemporalGraph.move
+    * 窗口的起止时间 - TemporalGraph.windows
+    * 逐个窗口输出网络特征 - TemporalGraph.iter_features
+    * 当前窗口的节点度 - TemporalGraph.degree
+    * 当前窗口的边表 - TemporalGraph.window_table
+    * 丢弃窗口之前的边 - TemporalGraph.discard
+
+使用：
+    tg = TemporalGraph(edgedata, time='Time', attr='Weight', directed=True)
+    for features in tg.iter_features(size='1h', step='10min'):
+        print(features)
+
+增量更新：
+    每条唯一边记录窗口内的重数和权重和，重数由0变为正数（或相反）时更新两端节点的度；
+    Node, Edge, Density, AveDegree等网络特征由计数直接得到，每个窗口的代价只与进出窗口的边数有关。
+    其他指标（例如AveClusterCoefficent）由当前窗口的边表用graph_metrics.graph_features计算。
+
+备注：
+    * 2026.10 - 新增
+'''
+
+import numpy as np
+import pandas as pd
+
+from edgetable import EdgeTable, NodeInterner, distinct
+
+
+# 由增量的计数直接得到的网络特征
+INCREMENTAL_METRICS = ['Node', 'Edge', 'Density', 'AveDegree', 'AveInDegree', 'AveOutDegree',
+                       'Directed', 'Weight', 'AveWeightedDegree']
+
+
+def _grow(values, size):
+    '''数组的长度增加到size，新增的位置为0'''
+    if len(values) >= size:
+        return values
+    return np.concatenate([values, np.zeros(size - len(values), dtype=values.dtype)])
+
+
+class TemporalGraph():
+    '''
+    按时间戳索引的边，支持滑动窗口和滚动窗口，见模块说明
+    '''
+
+    def __init__(self, edgedata=None, time='Time', attr='Weight', directed=True):
+        '''
+        :param edgedata: DataFrame, 包含[Source,Target,time,attr]，可以为None，之后用add加入
+        :param time: 时间列，数值或datetime64
+        :param attr: 权重列，None时每条边的权重为1（即窗口内的次数）
+        :param directed: 是否为有向边
+        '''
+        self.time_col = time
+        self.attr = attr
+        self.directed = directed
+        self.is_datetime = None
+
+        self.time = np.empty(0, dtype=np.int64)
+        self.source = np.empty(0, dtype=np.int64)
+        self.target = np.empty(0, dtype=np.int64)
+        self.weight = np.empty(0, dtype=np.float64)
+        self.edge_id = np.empty(0, dtype=np.int64)
+
+        self._node_interner = NodeInterner()
+        self._edge_interner = NodeInterner()
+        self._nodes = None
+        # 唯一边的两端节点
+        self.edge_source = np.empty(0, dtype=np.int64)
+        self.edge_target = np.empty(0, dtype=np.int64)
+        # distinct使用的临时空间
+        self._edge_slot = None
+        self._node_slot = None
+
+        self._reset_state()
+        if edgedata is not None:
+            self.add(edgedata)
+
+    def __len__(self):
+        return len(self.time)
+
+    def __repr__(self):
+        return 'TemporalGraph(rows={}, nodes={}, edges={}, directed={})'.format(
+            len(self), len(self._node_interner), len(self._edge_interner), self.directed)
+
+    @property
+    def nodes(self):
+        if self._nodes is None:
+            self._nodes = self._node_interner.nodes()
+        return self._nodes
+
+    def _reset_state(self):
+        '''清空窗口，窗口为按时间排序后的行[lo, hi)'''
+        num_nodes, num_edges = len(self._node_interner), len(self._edge_interner)
+        self.lo = self.hi = 0
+        self.window = None
+        self.multiplicity = np.zeros(num_edges, dtype=np.int64)
+        self.edge_weight = np.zeros(num_edges, dtype=np.float64)
+        self.in_degree = np.zeros(num_nodes, dtype=np.int64)
+        self.out_degree = np.zeros(num_nodes, dtype=np.int64)
+        self.in_weight = np.zeros(num_nodes, dtype=np.float64)
+        self.out_weight = np.zeros(num_nodes, dtype=np.float64)
+        self.num_nodes = 0
+        self.num_edges = 0
+        self.total_weight = 0.0
+
+    def _time_values(self, values):
+        values = np.asarray(values)
+        is_datetime = np.issubdtype(values.dtype, np.datetime64)
+        if self.is_datetime is None:
+            self.is_datetime = is_datetime
+        elif self.is_datetime != is_datetime:
+            raise TypeError('时间列的类型与已有的数据不一致')
+        if is_datetime:
+            return values.astype('datetime64[ns]').view(np.int64)
+        return values
+
+    def _time_delta(self, value):
+        '''窗口长度，步长转为与时间列相同的单位（datetime时为ns）'''
+        if self.is_datetime:
+            return pd.Timedelta(value).value
+        return value
+
+    def _time_point(self, value):
+        if self.is_datetime:
+            return pd.Timestamp(value).value
+        return value
+
+    def _time_output(self, value):
+        if self.is_datetime:
+            return pd.Timestamp(value)
+        return value
+
+    def add(self, edgedata):
+        '''
+        加入新的边（例如新一天的数据），节点和唯一边增量编码；
+        新数据的时间都不早于已有数据时直接追加，否则重新排序并清空当前窗口
+        :param edgedata: DataFrame, 包含[Source,Target,time,attr]
+        :return: self
+        '''
+        num_rows = len(edgedata)
+        if num_rows < 1:
+            return self
+        times = self._time_values(edgedata[self.time_col].values)
+        codes = self._node_interner.intern(np.concatenate([edgedata['Source'].to_numpy(),
+                                                           edgedata['Target'].to_numpy()]))
+        source = codes[:num_rows].astype(np.int64)
+        target = codes[num_rows:].astype(np.int64)
+        self._nodes = None
+        if self.attr is None:
+            weight = np.ones(num_rows)
+        else:
+            weight = edgedata[self.attr].to_numpy(dtype=np.float64)
+
+        if self.directed:
+            keys = (source << 32) | target
+        else:
+            keys = (np.minimum(source, target) << 32) | np.maximum(source, target)
+        num_edges = len(self._edge_interner)
+        edge_id = self._edge_interner.intern(keys).astype(np.int64)
+        new = edge_id >= num_edges
+        if new.any():
+            # 新的边按第一次出现的顺序编号，累计最大值增加的位置即为每条新边第一次出现的位置，
+            # 唯一边的方向为第一次出现的方向
+            positions = np.flatnonzero(new)
+            first = positions[np.diff(np.maximum.accumulate(edge_id[new]), prepend=num_edges - 1) > 0]
+            self.edge_source = np.concatenate([self.edge_source, source[first]])
+            self.edge_target = np.concatenate([self.edge_target, target[first]])
+
+        in_order = len(self.time) < 1 or times.min() >= self.time[-1]
+        self.time = np.concatenate([self.time, times])
+        self.source = np.concatenate([self.source, source])
+        self.target = np.concatenate([self.target, target])
+        self.weight = np.concatenate([self.weight, weight])
+        self.edge_id = np.concatenate([self.edge_id, edge_id])
+        if not in_order or np.any(np.diff(times) < 0):
+            order = np.argsort(self.time, kind='stable')
+            self.time, self.source, self.target = self.time[order], self.source[order], self.target[order]
+            self.weight, self.edge_id = self.weight[order], self.edge_id[order]
+            self._reset_state()
+            return self
+
+        num_nodes = len(self._node_interner)
+        for name in ('in_degree', 'out_degree', 'in_weight', 'out_weight'):
+            setattr(self, name, _grow(getattr(self, name), num_nodes))
+        num_edges = len(self._edge_interner)
+        self.multiplicity = _grow(self.multiplicity, num_edges)
+        self.edge_weight = _grow(self.edge_weight, num_edges)
+        return self
+
+    def _slot(self, name, size):
+        '''distinct使用的临时空间，长度不够时重新分配'''
+        slot = getattr(self, name)
+        if slot is None or len(slot) < size:
+            slot = np.empty(max(size, 1), dtype=np.int64)
+            setattr(self, name, slot)
+        return slot
+
+    def _apply(self, lo, hi, sign):
+        '''
+        加入(sign=1)或移除(sign=-1)按时间排序后的行[lo, hi)，
+        只更新这些行涉及的边和节点
+        '''
+        if hi <= lo:
+            return
+        ids = self.edge_id[lo:hi]
+        weight = sign * self.weight[lo:hi]
+        np.add.at(self.out_weight, self.source[lo:hi], weight)
+        np.add.at(self.in_weight, self.target[lo:hi], weight)
+        self.total_weight += weight.sum()
+
+        unique_ids = distinct(ids, self._slot('_edge_slot', len(self.multiplicity)))
+        before = self.multiplicity[unique_ids] > 0
+        np.add.at(self.multiplicity, ids, sign)
+        np.add.at(self.edge_weight, ids, weight)
+        changed = unique_ids[(self.multiplicity[unique_ids] > 0) != before]
+        if sign < 0:
+            # 离开窗口的边权重置为0，避免浮点误差的累积
+            self.edge_weight[changed] = 0
+        self.num_edges += sign * len(changed)
+        if self.num_edges == 0:
+            self.total_weight = 0.0
+        if len(changed) < 1:
+            return
+
+        source, target = self.edge_source[changed], self.edge_target[changed]
+        touched = distinct(np.concatenate([source, target]),
+                            self._slot('_node_slot', len(self.in_degree)))
+        before = (self.in_degree[touched] + self.out_degree[touched]) > 0
+        np.add.at(self.out_degree, source, sign)
+        np.add.at(self.in_degree, target, sign)
+        flipped = touched[((self.in_degree[touched] + self.out_degree[touched]) > 0) != before]
+        self.num_nodes += sign * len(flipped)
+        if sign < 0:
+            self.in_weight[flipped] = 0
+            self.out_weight[flipped] = 0
+
+    def _move(self, start, end):
+        '''窗口移动到[start, end)（时间列的单位），只处理进出窗口的行'''
+        lo = int(np.searchsorted(self.time, start, side='left'))
+        hi = int(np.searchsorted(self.time, max(start, end), side='left'))
+        # 离开窗口的行
+        self._apply(self.lo, min(self.hi, lo), -1)
+        self._apply(max(self.lo, hi), self.hi, -1)
+        # 进入窗口的行
+        self._apply(lo, min(hi, self.lo), 1)
+        self._apply(max(lo, self.hi), hi, 1)
+        self.lo, self.hi = lo, hi
+        self.window = (start, end)
+
+    def move(self, start, end):
+        '''
+        窗口移动到[start, end)，只加入新进入窗口的边，移除离开窗口的边
+        :param start, end: 窗口的起止时间，与时间列的类型相同（datetime时可以为str, Timestamp）
+        :return: self
+        '''
+        self._move(self._time_point(start), self._time_point(end))
+        return self
+
+    def _windows(self, size, step=None, start=None, end=None):
+        if len(self.time) < 1:
+            return
+        size = self._time_delta(size)
+        step = size if step is None else self._time_delta(step)
+        if step <= 0:
+            raise ValueError('step应大于0')
+        window_start = self.time[0] if start is None else self._time_point(start)
+        end = self.time[-1] if end is None else self._time_point(end)
+        while window_start <= end:
+            yield window_start, window_start + size
+            window_start = window_start + step
+
+    def windows(self, size, step=None, start=None, end=None):
+        '''
+        :param size: 窗口长度，datetime时为Timedelta或str，例如'1h'
+        :param step: 步长，None时等于size（滚动窗口），小于size时为滑动窗口
+        :param start: 第一个窗口的起始时间，默认为最早的时间
+        :param end: 最后一个窗口的起始时间不晚于end，默认为最晚的时间
+        :return: generator of (start, end)，窗口为[start, end)
+        '''
+        for window_start, window_end in self._windows(size, step=step, start=start, end=end):
+            yield self._time_output(window_start), self._time_output(window_end)
+
+    def incremental_features(self, metrics=None):
+        '''
+        :param metrics: list, INCREMENTAL_METRICS中的指标，None时为所有适用的指标
+        :return: dict，当前窗口的网络特征，由增量的计数直接得到
+        '''
+        if metrics is None:
+            metrics = [name for name in INCREMENTAL_METRICS
+                       if self.directed or name not in ('AveInDegree', 'AveOutDegree')]
+        num_nodes, num_edges = self.num_nodes, self.num_edges
+        density = 0
+        if num_nodes > 1:
+            density = num_edges / float(num_nodes * (num_nodes - 1))
+            density = density if self.directed else 2 * density
+        average = (lambda value: value / float(num_nodes) if num_nodes > 0 else 0)
+        values = {'Node': num_nodes,
+                  'Edge': num_edges,
+                  'Density': density,
+                  'AveDegree': average(2 * num_edges),
+                  'AveInDegree': average(num_edges),
+                  'AveOutDegree': average(num_edges),
+                  'Directed': int(self.directed),
+                  'Weight': self.total_weight,
+                  'AveWeightedDegree': average(2 * self.total_weight)}
+        return {name: values[name] for name in metrics}
+
+    def iter_features(self, size, step=None, start=None, end=None, metrics=None, **feature_kwargs):
+        '''
+        逐个窗口输出网络特征，窗口见windows
+        :param metrics: list, 需要计算的指标；INCREMENTAL_METRICS中的指标增量计算，
+                        其他指标（见graph_metrics.list_metrics('graph')）由当前窗口的边表计算
+        :param feature_kwargs: 传给graph_metrics.graph_features的参数，例如sample_size
+        :return: generator of pd.Series，name为窗口的起始时间，包括Start, End, Rows（窗口内的行数）
+        '''
+        if metrics is None:
+            metrics = self.incremental_features().keys()
+        metrics = list(metrics)
+        incremental = [name for name in metrics if name in INCREMENTAL_METRICS]
+        others = [name for name in metrics if name not in INCREMENTAL_METRICS]
+        if not self.directed and ('AveInDegree' in incremental or 'AveOutDegree' in incremental):
+            raise ValueError('AveInDegree, AveOutDegree 只适用于有向图')
+
+        for window_start, window_end in self._windows(size, step=step, start=start, end=end):
+            self._move(window_start, window_end)
+            values = {'Start': self._time_output(window_start),
+                      'End': self._time_output(window_end),
+                      'Rows': self.hi - self.lo}
+            values.update(self.incremental_features(incremental))
+            if len(others) > 0:
+                values.update(self._table_features(others, **feature_kwargs))
+            yield pd.Series(values, name=values['Start'])[['Start', 'End', 'Rows'] + metrics]
+
+    def _table_features(self, metrics, **feature_kwargs):
+        import graph_metrics
+
+        if self.num_edges < 1:
+            return {name: np.nan for name in metrics}
+        return graph_metrics.graph_features(self.window_table(), metrics=metrics,
+                                            directed=self.directed, **feature_kwargs).to_dict()
+
+    def degree(self, weighted=False, direction='all'):
+        '''
+        当前窗口的节点度
+        :param weighted: 是否为加权度（权重的和）
+        :param direction: 'all', 'in' 或 'out'，无向图只能为'all'
+        :return: pd.Series, index为窗口内的节点id
+        '''
+        if weighted:
+            values = {'in': self.in_weight, 'out': self.out_weight}
+        else:
+            values = {'in': self.in_degree, 'out': self.out_degree}
+        if direction == 'all':
+            degree = values['in'] + values['out']
+        elif self.directed and direction in values:
+            degree = values[direction]
+        else:
+            raise ValueError("direction应为'all', 'in' 或 'out'（有向图）")
+        active = (self.in_degree + self.out_degree) > 0
+        return pd.Series(degree[active], index=self.nodes[active])
+
+    def window_table(self):
+        '''
+        :return: EdgeTable, 当前窗口合并后的边（权重为窗口内的和，attr为None时为'Count'），
+                 只包含窗口内的节点
+        '''
+        edges = np.flatnonzero(self.multiplicity > 0)
+        name = 'Count' if self.attr is None else self.attr
+        table = EdgeTable(self.edge_source[edges], self.edge_target[edges], self.nodes,
+                          attrs={name: self.edge_weight[edges]}, directed=self.directed)
+        return table.node_subset((self.in_degree + self.out_degree) > 0)
+
+    def discard(self, before):
+        '''
+        丢弃时间早于before的行（例如流式处理时已经处理过的数据），节点和唯一边的编码不变
+        :param before: 时间，不能晚于当前窗口的起始时间
+        :return: self
+        '''
+        before = self._time_point(before)
+        if self.window is not None and before > self.window[0]:
+            raise ValueError('before不能晚于当前窗口的起始时间')
+        num_rows = int(np.searchsorted(self.time, before, side='left'))
+        for name in ('time', 'source', 'target', 'weight', 'edge_id'):
+            setattr(self, name, getattr(self, name)[num_rows:])
+        self.lo -= num_rows
+        self.hi -= num_rows
+        return self